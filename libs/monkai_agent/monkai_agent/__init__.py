@@ -4,23 +4,47 @@ MonkAI Agent - A flexible and powerful AI agent framework
 
 from .providers import OpenAIProvider, LLMProvider, AzureProvider
 from .base import AgentManager
-from .types import Agent, Response, Result, PromptTest, PromptOptimizer
+from .types import Agent, Response, Result, PromptTest, PromptOptimizer, StreamMetrics, TriageDecision, ToolCachePolicy
 from .memory import Memory, AgentMemory
 from .prompt_optimizer import PromptOptimizerManager
 from .monkai_agent_creator import MonkaiAgentCreator, TransferTriageAgentCreator
 from .triage_agent_creator import TriageAgentCreator
-from .mcp_agent import MCPAgent, MCPClientConfig, MCPClientConnection, create_stdio_mcp_config, create_sse_mcp_config, create_http_mcp_config
+from .triage_classifier import LocalTriageClassifier
+from .routing_cache import RoutingCache
+from .tool_cache import ToolResultCache, cached_tool
+from .tool_selector import ToolSelector
+from .resource_injection import ResourceInjector
+from .request_assembly import RequestAssembler
+from .instructions_cache import InstructionsCache
+from .retry_policy import RetryPolicy, RetryBudget
+from .mcp_capability_cache import MCPCapabilityCache
+from .mcp_read_cache import MCPReadCache
+from .mcp_agent import MCPAgent, MCPClientConfig, MCPClientConnection, MCPSessionPool, MCPServerSupervisor, MCPCallLimiter, get_shared_session_pool, create_stdio_mcp_config, create_sse_mcp_config, create_http_mcp_config
+from .mcp_resources import MCPResourcePart
 
 __all__ = [
     'AgentManager',
     'Agent',
     'Response',
+    'StreamMetrics',
+    'TriageDecision',
+    'ToolCachePolicy',
+    'ToolResultCache',
+    'cached_tool',
+    'ToolSelector',
+    'ResourceInjector',
+    'RequestAssembler',
+    'InstructionsCache',
+    'RetryPolicy',
+    'RetryBudget',
     'Result',
     'PromptTest',
     'PromptOptimizer',
     'PromptOptimizerManager',
     'MonkaiAgentCreator',
     'TriageAgentCreator',
+    'LocalTriageClassifier',
+    'RoutingCache',
     'TransferTriageAgentCreator',
     'Memory',
     'AgentMemory',
@@ -30,6 +54,13 @@ __all__ = [
     'MCPAgent',
     'MCPClientConfig',
     'MCPClientConnection',
+    'MCPSessionPool',
+    'get_shared_session_pool',
+    'MCPServerSupervisor',
+    'MCPCallLimiter',
+    'MCPResourcePart',
+    'MCPCapabilityCache',
+    'MCPReadCache',
     'create_stdio_mcp_config',
     'create_sse_mcp_config',
     'create_http_mcp_config'
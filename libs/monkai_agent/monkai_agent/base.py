@@ -6,21 +6,31 @@ It sets up the necessary environment, including logging configuration, importing
 In addition, it imports and uses utility functions and specific types that are essential for the efficient operation of the agent.
 """
 
+import asyncio
 import logging
-from .types import AgentStatus, Response
+from contextlib import aclosing
+from .types import AgentStatus, Response, TriageDecision
 from .monkai_agent_creator import MonkaiAgentCreator
 from .triage_agent_creator import TriageAgentCreator 
+from .triage_classifier import LocalTriageClassifier
+from .routing_cache import RoutingCache
+from .tool_cache import ToolResultCache, context_fingerprint, get_cache_policy
+from .tool_selector import ToolSelector
+from .resource_injection import ResourceInjector
+from .request_assembly import RequestAssembler
+from .instructions_cache import InstructionsCache
+from .retry_policy import RetryPolicy
 from .memory import Memory
 #logging.basicConfig(level=logging.INFO)
 #ogger = logging.getLogger(__name__)
 import copy
 import json
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from typing import List
 from openai import OpenAIError
 import time
 
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
 import tiktoken
 from .types import Agent
@@ -29,6 +39,7 @@ import os
 from .rate_limiter import RateLimiter
 from typing import Callable
 from .prompt_optimizer import PromptOptimizerManager
+from .streaming import stream_chunks, StreamMetricsRecorder
 
 # MCP imports for MCPAgent integration
 try:
@@ -51,12 +62,14 @@ DEFAULT_TOKEN_LIMITS = {
 class TokenUsage:
     """Class to track token usage for input and output."""
     
-    def __init__(self, input_tokens: int = 0, output_tokens: int = 0):
+    def __init__(self, input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0):
         self.input_tokens = input_tokens
         self.output_tokens = output_tokens
+        self.cached_tokens = cached_tokens
+        """Input tokens the provider served from its prompt cache."""
         
     def __str__(self) -> str:
-        return f"Input tokens: {self.input_tokens}, Output tokens: {self.output_tokens}"
+        return f"Input tokens: {self.input_tokens}, Output tokens: {self.output_tokens}, Cached tokens: {self.cached_tokens}"
 
 
 __DOCUMENT_GUARDRAIL_TEXT__ = "RESPONDER SÓ USANDO A INFORMAÇÃO DOS DOCUMENTOS: "
@@ -104,16 +117,28 @@ class AgentManager:
                  provider: LLMProvider = None, rate_limit_rpm: Optional[int] = None, 
                  max_execution_time: Optional[int] = None, context_window_size: Optional[int] = None,
                  freeze_context_window_size: bool = True, api_key: Optional[str] = None, 
-                 track_token_usage: bool = True, temperature = None):
+                 track_token_usage: bool = True, temperature = None, stream_buffer_size: int = 64,
+                 sticky_routing: bool = False, topic_change_detector: Optional[Callable[[str, Agent], bool]] = None,
+                 max_sticky_sessions: int = 10000, triage_classifier: Optional[LocalTriageClassifier] = None,
+                 routing_cache: Optional[RoutingCache] = None,
+                 triage_categories: Optional[Dict[str, List[MonkaiAgentCreator]]] = None,
+                 max_agents_per_triage_stage: Optional[int] = None, speculative_agents: int = 0,
+                 tool_cache: Optional[ToolResultCache] = None, tool_selector: Optional[ToolSelector] = None,
+                 resource_injector: Optional[ResourceInjector] = None,
+                 request_assembler: Optional[RequestAssembler] = None,
+                 instructions_cache: Optional[InstructionsCache] = None, memoize_instructions: bool = False,
+                 retry_policy: Optional[RetryPolicy] = None):
         
         self.provider = provider or OpenAIProvider(api_key)
-        self.agents_creators = agents_creators
+        self.triage_agent_criator = TriageAgentCreator(
+            agents_creators, categories=triage_categories, max_agents_per_stage=max_agents_per_triage_stage
+        )
         """
-        A list of agent creators to initialize the triage agent.
+        The creator for the triage agent. The triage agent is only built when it is first used.
         """
-        self.triage_agent_criator = TriageAgentCreator(agents_creators)
+        self.agents_creators = self.triage_agent_criator.agents_creator
         """
-        The creator for the triage agent.
+        A list of agent creators to initialize the triage agent.
         """
         self.context_variables = context_variables or {}
         """
@@ -127,12 +152,7 @@ class AgentManager:
         """
         Flag to enable debugging.
         """
-        self.agent = self.triage_agent_criator.get_agent() if current_agent == None else current_agent
-        """
-        The current agent instance.
-        """
-        self.max_retries = max_retries
-        self.retry_delay = retry_delay
+        self._current_agent = current_agent
         self.temperature = temperature
 
         self.base_prompt = base_prompt
@@ -141,6 +161,74 @@ class AgentManager:
         self.context_window_size = context_window_size
         self.track_token_usage = track_token_usage
         self.last_token_usage = None
+        self.stream_buffer_size = stream_buffer_size
+        """
+        Maximum number of stream chunks read ahead of a slow consumer.
+        """
+        self.sticky_routing = sticky_routing
+        """
+        Flag to resume follow-up turns of a session at the agent that answered the previous turn,
+        skipping the triage completion.
+        """
+        self.topic_change_detector = topic_change_detector
+        """
+        Optional callable `(user_message, sticky_agent) -> bool`. When it returns True the turn
+        starts at the triage agent again.
+        """
+        self.max_sticky_sessions = max_sticky_sessions
+        self._sticky_agents: "OrderedDict[Optional[str], Agent]" = OrderedDict()
+        self.triage_classifier = triage_classifier
+        """
+        Optional local classifier consulted before the triage agent on the first turn of a
+        conversation. Confident decisions start the run at the chosen agent without a triage completion.
+        """
+        if triage_classifier is not None:
+            if triage_classifier.resolve_agent is None:
+                triage_classifier.resolve_agent = self.triage_agent_criator.get_creator_agent
+            triage_classifier.fit(self.agents_creators)
+        self.routing_cache = routing_cache
+        """
+        Optional cache of the agent chosen by the triage agent for the first message of a conversation.
+        """
+        self.speculative_agents = speculative_agents
+        """
+        Number of likely specialists whose first completion is started in parallel with the triage
+        completion. The run adopts the one the triage agent transfers to and cancels the others,
+        trading extra tokens for the triage round trip. 0 disables speculation.
+        """
+        self.tool_cache = tool_cache if tool_cache is not None else ToolResultCache()
+        """
+        Cache of the results of the tools that opted in with `cached_tool` or a `ToolCachePolicy`.
+        """
+        self.tool_selector = tool_selector
+        """
+        Optional selector sending only the tools relevant to the conversation with each request.
+        """
+        self.resource_injector = resource_injector or ResourceInjector()
+        """
+        Stage adding the resources of MCP agents to each request, after the instructions. Set its
+        `max_tokens` to cap the resource tokens per request.
+        """
+        if self.resource_injector.count_tokens is None:
+            self.resource_injector.count_tokens = self.count_tokens
+        self.request_assembler = request_assembler or RequestAssembler()
+        """
+        Lays out each request as a stable prefix (instructions, resources, sorted tools) followed by
+        the conversation, and measures the provider prompt cache hits per agent.
+        """
+        self.instructions_cache = instructions_cache or (InstructionsCache() if memoize_instructions else None)
+        """
+        Cache of the instructions rendered by callables, reused while the context variables they
+        read keep the same values. Opt-in, since callables reading other state (time, databases)
+        would be served stale text: None unless `memoize_instructions` or a cache is given.
+        """
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries, base_delay=retry_delay)
+        """
+        Decides which failed completions are retried and how long to wait: exponential backoff with
+        jitter from `retry_delay`, the provider's `Retry-After` when given, and retry budgets.
+        """
+        self._route_counts: Dict[str, int] = defaultdict(int)
+        self.speculation_stats = {"runs": 0, "adopted": 0, "missed": 0, "cancelled": 0}
         
         # Set up rate limiting if specified
         self._rate_limiter = None
@@ -262,6 +350,10 @@ class AgentManager:
         """Get the token usage from the last request."""
         return self.last_token_usage
 
+    def get_prefix_cache_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get, per agent, the prompt tokens served from the provider cache and how often the request prefix changed."""
+        return self.request_assembler.get_stats()
+
     def _run_with_timeout(self, func: Callable, timeout: int) -> Any:
         """
         Run a function with a timeout.
@@ -300,7 +392,8 @@ class AgentManager:
         except queue.Empty:
             raise TimeoutError(f"Task execution exceeded maximum allowed time of {timeout} seconds")
 
-    def _handle_openai_error(self, error: OpenAIError, attempt: int, debug: bool) -> None:
+    def _handle_openai_error(self, error: OpenAIError, attempt: int, debug: bool, sleep: bool = True,
+                             retries: Optional[Dict[str, int]] = None) -> float:
         """
         Handle OpenAI API errors with specific error messages and retry logic.
 
@@ -308,6 +401,12 @@ class AgentManager:
             error: The OpenAI error that occurred
             attempt: Current attempt number
             debug: Flag to enable debugging
+            sleep: Whether to wait before returning. Async callers pass False and
+                await the returned delay themselves.
+            retries: The retries already made by the request, per error class
+
+        Returns:
+            float: The seconds to wait before the next attempt
 
         Raises:
             ChatCompletionError: With specific error message based on error type
@@ -331,17 +430,16 @@ class AgentManager:
         error_code = getattr(error, 'code', 'api_error')
         error_msg = error_handlers.get(error_code, f"Unknown error: {str(error)}")
         
-        # Determine if error is retryable
-        non_retryable = {'invalid_request_error', 'invalid_api_key', 'model_not_found', 
-                        'unsupported_language'}
-        
-        if error_code in non_retryable or attempt >= self.max_retries:
+        delay = self.retry_policy.next_delay(error, attempt, retries)
+        if delay is None:
             raise ChatCompletionError(error_msg, error)
         
-        debug_print(debug, f"Attempt {attempt} failed with {error_code}. Retrying in {self.retry_delay} seconds...")
-        time.sleep(self.retry_delay)
+        debug_print(debug, f"Attempt {attempt} failed with {error_code}. Retrying in {delay:.2f} seconds...")
+        if sleep:
+            time.sleep(delay)
+        return delay
 
-    def get_chat_completion(
+    def _prepare_chat_completion(
         self,
         agent: Agent,
         history: List,
@@ -349,103 +447,242 @@ class AgentManager:
         max_tokens: float,
         top_p: float,
         frequency_penalty: float,
-        presence_penalty: float,        
+        presence_penalty: float,
         stream: bool,
         debug: bool,
-    ) -> ChatCompletionMessage:
+    ) -> tuple[dict, str, dict, int]:
         """
-        Generates a chat completion with retry logic and error handling.
-
-        Args:
-            agent (Agent): The agent instance to use for completion
-            history (List): Conversation history
-            context_variables (dict): Variables for context
-            max_tokens (float): Maximum tokens to generate
-            top_p (float): Nucleus sampling parameter
-            frequency_penalty (float): Frequency penalty parameter
-            presence_penalty (float): Presence penalty parameter
-            stream (bool): Enable streaming responses
-            debug (bool): Enable debug logging
+        Builds the provider request for a chat completion.
 
         Returns:
-            ChatCompletionMessage: The generated completion
+            tuple[dict, str, dict, int]: (completion parameters, rendered instructions,
+            merged context variables, estimated input tokens)
+        """
+        messages, instructions, context_variables = self._render_chat_messages(agent, history, context_variables, debug)
+        if self.context_window_size:
+            # Summarize messages if needed
+            messages = self._summarize_messages(messages, self._max_context_tokens())
+        return self._build_chat_completion(
+            agent, messages, instructions, context_variables, max_tokens, top_p,
+            frequency_penalty, presence_penalty, stream,
+        )
 
-        Raises:
-            ChatCompletionError: If the request fails after all retries
+    async def _prepare_chat_completion_async(
+        self,
+        agent: Agent,
+        history: List,
+        context_variables: dict,
+        max_tokens: float,
+        top_p: float,
+        frequency_penalty: float,
+        presence_penalty: float,
+        stream: bool,
+        debug: bool,
+    ) -> tuple[dict, str, dict, int]:
+        """
+        Builds the provider request like `_prepare_chat_completion`, summarizing the history in a
+        worker thread since the summary is a blocking completion.
+        """
+        messages, instructions, context_variables = self._render_chat_messages(agent, history, context_variables, debug)
+        if self.context_window_size:
+            messages = await asyncio.to_thread(self._summarize_messages, messages, self._max_context_tokens())
+        return self._build_chat_completion(
+            agent, messages, instructions, context_variables, max_tokens, top_p,
+            frequency_penalty, presence_penalty, stream,
+        )
+
+    def _max_context_tokens(self) -> int:
+        """Returns the context window of the requests: `context_window_size`, within the model's limit."""
+        # Get default token limit for model
+        model_token_limit = DEFAULT_TOKEN_LIMITS.get(self.model, 4096)
+        return min(self.context_window_size, model_token_limit)
+
+    def _render_chat_messages(self, agent: Agent, history: List, context_variables: dict,
+                              debug: bool) -> tuple[List, str, dict]:
+        """
+        Renders the instructions of the agent and puts them before the history.
+
+        Returns:
+            tuple[List, str, dict]: (messages, rendered instructions, merged context variables)
         """
         # Merge agent's context variables with passed context variables
         # Agent's context variables are overridden by passed context variables
         merged_context = {**agent.context_variables, **context_variables}
         context_variables = defaultdict(str, merged_context)
         agent.status = AgentStatus.PROCESSING
-        instructions = (
-            agent.instructions(context_variables)
-            if callable(agent.instructions)
-            else agent.instructions
-        )
+        if not callable(agent.instructions):
+            instructions = agent.instructions
+        elif self.instructions_cache is not None:
+            instructions = self.instructions_cache.render(agent, context_variables)
+        else:
+            instructions = agent.instructions(context_variables)
         
 
         messages = [{"role": "system", "content": instructions}] + history
         debug_print(debug, "Getting chat completion for...:", messages)
-        if self.context_window_size:
-            # Get default token limit for model
-            model_token_limit = DEFAULT_TOKEN_LIMITS.get(self.model, 4096)
-            max_context_tokens = min(self.context_window_size, model_token_limit)
-            
-            # Summarize messages if needed
-            messages = self._summarize_messages(messages, max_context_tokens)
-        
+        return messages, instructions, context_variables
+
+    def _build_chat_completion(
+        self,
+        agent: Agent,
+        messages: List,
+        instructions: str,
+        context_variables: dict,
+        max_tokens: float,
+        top_p: float,
+        frequency_penalty: float,
+        presence_penalty: float,
+        stream: bool,
+    ) -> tuple[dict, str, dict, int]:
+        """
+        Adds the tools and resources of the agent to the rendered messages and builds the
+        completion parameters.
+
+        Returns:
+            tuple[dict, str, dict, int]: (completion parameters, rendered instructions,
+            merged context variables, estimated input tokens)
+        """
         tools = [function_to_json(f) for f in agent.functions]
+
+        # hide context_variables from model
+        for tool in tools:
+            params = tool["function"]["parameters"]
+            params.get("properties", {}).pop(__CTX_VARS_NAME__, None)
+            if "required" in params and __CTX_VARS_NAME__ in params["required"]:
+                params["required"].remove(__CTX_VARS_NAME__)
         
-        # Add MCP tools if this is an MCPAgent
+        # Add MCP tools if this is an MCPAgent (cached schemas, never modified here)
+        pinned = []
         if self._is_mcp_agent(agent):
             mcp_tools = self._get_mcp_tools_json(agent)
             tools.extend(mcp_tools)
             
             if agent.resources and isinstance(agent.resources, list):
-                for resource in agent.resources:
-                    if type(resource) is str:
-                        messages.append({"role":"assistant",
-                                        "content": resource,
-                                        })
-        
-        # hide context_variables from model
-        for tool in tools:
-            params = tool["function"]["parameters"]
-            params["properties"].pop(__CTX_VARS_NAME__, None)
-            if "required" in params and __CTX_VARS_NAME__ in params["required"]:
-                params["required"].remove(__CTX_VARS_NAME__)
+                resource_message = self.resource_injector.build_message(agent.resources)
+                if resource_message is not None:
+                    pinned.append(resource_message)
+
+        if self.tool_selector is not None and tools:
+            tools = self.tool_selector.select(tools, messages)
+
+        # Stable prefix first (instructions, resources, sorted tools), then the conversation
+        messages, tools = self.request_assembler.assemble(agent.name, messages, tools, pinned)
+        if self.triage_agent_criator.category_agents:
+            self.triage_agent_criator.record_stage_request(agent, messages)
 
         # Count input tokens
         input_tokens = self.count_message_tokens(messages) if self.track_token_usage else 0
+
+        # Set up completion parameters with agent info for instrumentation
+        create_params = {
+            "model": agent.model or self.model,
+            "messages": messages,
+            "tools": tools or [],
+            "tool_choice": agent.tool_choice,
+            "stream": stream,
+            "agent": agent,  # This will be removed by the wrapper
+        }
+        if stream and self.provider.supports_stream_usage:
+            # Ask for a final usage chunk, which carries the cached prompt tokens
+            create_params["stream_options"] = {"include_usage": True}
+        if self.temperature:
+            create_params["temperature"] = agent.temperature or self.temperature
+        if max_tokens: 
+            create_params["max_tokens"] = agent.max_tokens or max_tokens
+        if top_p:
+            create_params["top_p"] = agent.top_p or top_p
+        if frequency_penalty:
+            create_params["frequency_penalty"] = agent.frequency_penalty or frequency_penalty
+        if presence_penalty:
+            create_params["presence_penalty"] = agent.presence_penalty or presence_penalty
+        if tools:
+            create_params["parallel_tool_calls"] = agent.parallel_tool_calls
+
+        return create_params, instructions, context_variables, input_tokens
+
+    def _optimize_filtered_prompt(self, create_params: dict, instructions: str, history: List, context_variables: dict) -> str:
+        """
+        Rewrites the instructions of a request blocked by the content filter.
+
+        Returns:
+            str: The optimized instructions, also applied to `create_params`.
+        """
+        promp_otimizer = PromptOptimizerManager(self.provider.get_client(), self.model)
+        instructions = promp_otimizer.analyze_prompt(instructions, context_variables)
+        # Keep the pinned messages and the history laid out after the instructions
+        create_params["messages"] = [{"role": "system", "content": instructions}] + create_params["messages"][1:]
+        return instructions
+
+    def _track_completion_usage(self, response, input_tokens: int, stream: bool, agent: Optional[Agent] = None) -> None:
+        """
+        Records the token usage of a completion in `last_token_usage`, and the prompt cache
+        usage of the agent in the `request_assembler`.
+
+        Streams carry no usage up front, so only the input estimate is recorded and the
+        output tokens are filled in once the stream has been consumed.
+        """
+        usage = None if stream else getattr(response, 'usage', None)
+        cached_tokens = 0
+        if usage is not None and agent is not None:
+            cached_tokens = self.request_assembler.record_usage(agent.name, usage)
+        if not self.track_token_usage:
+            # Ensure last_token_usage is set even when tracking is disabled
+            self.last_token_usage = None
+        elif stream:
+            self.last_token_usage = TokenUsage(input_tokens=input_tokens, output_tokens=0)
+        elif getattr(response, 'usage', None) is not None:
+            self.last_token_usage = TokenUsage(
+                input_tokens=response.usage.prompt_tokens,
+                output_tokens=response.usage.completion_tokens,
+                cached_tokens=cached_tokens,
+            )
+        else:
+            # If response doesn't have usage info, estimate output tokens
+            output_tokens = self.count_tokens(response.choices[0].message.content) if response.choices[0].message.content else 0
+            self.last_token_usage = TokenUsage(input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def get_chat_completion(
+        self,
+        agent: Agent,
+        history: List,
+        context_variables: dict,
+        max_tokens: float,
+        top_p: float,
+        frequency_penalty: float,
+        presence_penalty: float,        
+        stream: bool,
+        debug: bool,
+    ) -> ChatCompletionMessage:
+        """
+        Generates a chat completion with retry logic and error handling.
+
+        Args:
+            agent (Agent): The agent instance to use for completion
+            history (List): Conversation history
+            context_variables (dict): Variables for context
+            max_tokens (float): Maximum tokens to generate
+            top_p (float): Nucleus sampling parameter
+            frequency_penalty (float): Frequency penalty parameter
+            presence_penalty (float): Presence penalty parameter
+            stream (bool): Enable streaming responses
+            debug (bool): Enable debug logging
+
+        Returns:
+            ChatCompletionMessage: The generated completion
+
+        Raises:
+            ChatCompletionError: If the request fails after all retries
+        """
+        create_params, instructions, context_variables, input_tokens = self._prepare_chat_completion(
+            agent, history, context_variables, max_tokens, top_p,
+            frequency_penalty, presence_penalty, stream, debug,
+        )
         
         # Apply rate limiting if configured
         if self._rate_limiter:
             self._rate_limiter.acquire()
             
         try:
-            # Set up completion parameters with agent info for instrumentation
-            create_params = {
-                "model": agent.model or self.model,
-                "messages": messages,
-                "tools": tools or [],
-                "tool_choice": agent.tool_choice,
-                "stream": stream,
-                "agent": agent,  # This will be removed by the wrapper
-            }
-            if self.temperature:
-                create_params["temperature"] = agent.temperature or self.temperature
-            if max_tokens: 
-                create_params["max_tokens"] = agent.max_tokens or max_tokens
-            if top_p:
-                create_params["top_p"] = agent.top_p or top_p
-            if frequency_penalty:
-                create_params["frequency_penalty"] = agent.frequency_penalty or frequency_penalty
-            if presence_penalty:
-                create_params["presence_penalty"] = agent.presence_penalty or presence_penalty
-            if tools:
-                create_params["parallel_tool_calls"] = agent.parallel_tool_calls
-                
             # Handle timeout
             if self.max_execution_time:
                 response = self._run_with_timeout(
@@ -453,37 +690,21 @@ class AgentManager:
                     self.max_execution_time
                 )
             else:
-                attempts = 0
+                attempts, retries = 0, {}
+                self.retry_policy.record_request()
                 while True:
                     try:
                         response = self.provider.get_completion(**create_params)
                         break
                     except OpenAIError as e:
                         attempts += 1
-                        error_code = getattr(e, 'code', 'api_error')
-                        if error_code == "content_filter":
-                            promp_otimizer = PromptOptimizerManager(self.client, self.model)
-                            instructions = promp_otimizer.analyze_prompt(instructions,context_variables)
-                            messages = [{"role": "system", "content": instructions}] + history
-                            create_params["messages"] = messages
-                        self._handle_openai_error(e, attempts, debug)
-                    
-                        
-                            
+                        delay = self._handle_openai_error(e, attempts, debug, sleep=False, retries=retries)
+                        if getattr(e, 'code', None) == "content_filter":
+                            instructions = self._optimize_filtered_prompt(create_params, instructions, history, context_variables)
+                        time.sleep(delay)
+
             # Track token usage for this specific completion
-            if self.track_token_usage and hasattr(response, 'usage'):
-                self.last_token_usage = TokenUsage(
-                    input_tokens=response.usage.prompt_tokens,
-                    output_tokens=response.usage.completion_tokens
-                )
-            elif self.track_token_usage:
-                # If response doesn't have usage info, estimate output tokens
-                output_tokens = self.count_tokens(response.choices[0].message.content) if response.choices[0].message.content else 0
-                self.last_token_usage = TokenUsage(input_tokens=input_tokens, output_tokens=output_tokens)
-            else:
-                # Ensure last_token_usage is set even when tracking is disabled
-                self.last_token_usage = None
-                
+            self._track_completion_usage(response, input_tokens, stream, agent)
             return response
                 
         finally:
@@ -491,6 +712,78 @@ class AgentManager:
             if self._rate_limiter:
                 self._rate_limiter.release()
 
+    async def get_chat_completion_async(
+        self,
+        agent: Agent,
+        history: List,
+        context_variables: dict,
+        max_tokens: float,
+        top_p: float,
+        frequency_penalty: float,
+        presence_penalty: float,
+        stream: bool,
+        debug: bool,
+        metrics_recorder: Optional[StreamMetricsRecorder] = None,
+    ):
+        """
+        Generates a chat completion through the provider's async client.
+
+        Behaves like `get_chat_completion` but never blocks the event loop. With
+        `stream=True` the returned stream should be consumed with `stream_chunks`.
+        `metrics_recorder`, when given, is started right before each attempt is sent, so
+        the time to first token leaves out the request preparation and rate limiting.
+
+        Returns:
+            ChatCompletion | AsyncStream: The generated completion or chunk stream
+
+        Raises:
+            ChatCompletionError: If the request fails after all retries
+        """
+        create_params, instructions, context_variables, input_tokens = await self._prepare_chat_completion_async(
+            agent, history, context_variables, max_tokens, top_p,
+            frequency_penalty, presence_penalty, stream, debug,
+        )
+
+        # Apply rate limiting if configured
+        if self._rate_limiter:
+            await asyncio.to_thread(self._rate_limiter.acquire)
+
+        try:
+            if self.max_execution_time:
+                try:
+                    if metrics_recorder is not None:
+                        metrics_recorder.start()
+                    response = await asyncio.wait_for(
+                        self.provider.get_completion_async(**create_params),
+                        self.max_execution_time
+                    )
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Task execution exceeded maximum allowed time of {self.max_execution_time} seconds")
+            else:
+                attempts, retries = 0, {}
+                self.retry_policy.record_request()
+                while True:
+                    try:
+                        if metrics_recorder is not None:
+                            metrics_recorder.start()
+                        response = await self.provider.get_completion_async(**create_params)
+                        break
+                    except OpenAIError as e:
+                        attempts += 1
+                        delay = self._handle_openai_error(e, attempts, debug, sleep=False, retries=retries)
+                        if getattr(e, 'code', None) == "content_filter":
+                            instructions = await asyncio.to_thread(
+                                self._optimize_filtered_prompt, create_params, instructions, history, context_variables
+                            )
+                        await asyncio.sleep(delay)
+
+            self._track_completion_usage(response, input_tokens, stream, agent)
+            return response
+
+        finally:
+            if self._rate_limiter:
+                self._rate_limiter.release()
+
     def handle_function_result(self, result, debug) -> Result:
         """
 
@@ -574,15 +867,19 @@ class AgentManager:
         context_variables: dict,
         debug: bool,
         agent: Agent = None,
+        session_id: Optional[str] = None,
     ) -> Response:
         """
         Handles tool calls by executing the corresponding functions.
 
+        Results of cacheable tools are taken from `tool_cache` when the same call was made before.
+
         Args:
             tool_calls (list): List of tool calls to handle.
             functions (list): List of functions that the agent can perform.
             context_variables (dict): Context variables for the agent.
             debug (bool): Flag to enable debugging.
+            session_id (str): Conversation the calls belong to, for session-scoped cached results.
 
         Returns:
             Response: The response after handling the tool calls.
@@ -601,7 +898,7 @@ class AgentManager:
                     debug_print(debug, f"Tool {name} not found in function map, trying MCP tools.")
                     try:
                         # Handle MCP tool call asynchronously
-                        mcp_result = await self._handle_mcp_tool_call(agent, tool_call, debug)
+                        mcp_result = await self._handle_mcp_tool_call(agent, tool_call, debug, session_id)
                         partial_response.messages.append(mcp_result)
                         continue
                     except Exception as e:
@@ -634,8 +931,25 @@ class AgentManager:
                 })
                 continue
 
+            policy = self.tool_cache.policy_for(name, get_cache_policy(func))
+            takes_context = __CTX_VARS_NAME__ in func.__code__.co_varnames
+            cache_key_args = dict(filtered_args)
+            if policy is not None and takes_context:
+                # Results depend on the context variables the function reads
+                cache_key_args[__CTX_VARS_NAME__] = context_fingerprint(context_variables, policy.context_keys)
+            hit, cached = self.tool_cache.get(name, cache_key_args, policy, session_id)
+            if hit:
+                debug_print(debug, f"Using cached result of {name}.")
+                partial_response.messages.append({
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "tool_name": name,
+                    "content": cached,
+                })
+                continue
+
             # pass context_variables to agent functions
-            if __CTX_VARS_NAME__ in func.__code__.co_varnames:
+            if takes_context:
                 filtered_args[__CTX_VARS_NAME__] = context_variables
             import inspect
             if inspect.iscoroutinefunction(func):
@@ -644,6 +958,8 @@ class AgentManager:
                 raw_result = func(**filtered_args)
 
             result: Result = self.handle_function_result(raw_result, debug)
+            if result.agent is None and not result.context_variables:
+                self.tool_cache.put(name, cache_key_args, policy, result.value, session_id)
             partial_response.messages.append(
                 {
                     "role": "tool",
@@ -665,18 +981,8 @@ class AgentManager:
 
     def _mcp_tool_to_json(self, tool, prefix: str) -> dict:
         """Convert an MCP tool to JSON format with prefix."""
-        return {
-            "type": "function",
-            "function": {
-                "name": f"{prefix}_{tool.name}",
-                "description": tool.description or "",
-                "parameters": tool.inputSchema if hasattr(tool, 'inputSchema') else {
-                    "type": "object",
-                    "properties": {},
-                    "required": []
-                },
-            },
-        }
+        from .mcp_agent import mcp_tool_to_json
+        return mcp_tool_to_json(tool, prefix)
 
     def _initialize_mcp_resources_sync(self, agent: MCPAgent) -> None:
         """Initialize MCP resources for an MCPAgent synchronously."""
@@ -690,78 +996,57 @@ class AgentManager:
                 asyncio.set_event_loop(loop)
             
             # Run the async initialization
-            connection_results = loop.run_until_complete(agent.connect_all_clients())
+            connection_results = loop.run_until_complete(agent.ensure_connected())
             debug_print(self.debug, f"MCP connection results: {connection_results}")
-            
-            # Optionally retrieve and process resources here
-            for connection in agent.mcp_clients:
-                if connection.is_connected:
-                    resources = connection.available_resources
-                    for resource in resources:
-                        try:
-                            debug_print(self.debug, f"Available resource: {resource.uri}")
-                        except Exception as e:
-                            debug_print(self.debug, f"Error accessing resource {resource.uri}: {e}")
         except Exception as e:
             debug_print(self.debug, f"Error initializing MCP resources: {e}")
 
     async def _initialize_mcp_resources(self, agent: MCPAgent) -> None:
-        """Initialize MCP resources for an MCPAgent."""
+        """
+        Makes sure the MCP servers of an MCPAgent are connected. Servers are connected once and
+        kept open; healthy connections used recently cost nothing here, idle ones are pinged and
+        failed ones reconnected (see `MCPAgent.ensure_connected`).
+        """
         try:
-            # Connect to all MCP clients if not already connected
-            connection_results = await agent.connect_all_clients()
+            connection_results = await agent.ensure_connected()
             debug_print(self.debug, f"MCP connection results: {connection_results}")
-            
-            # Optionally retrieve and process resources here
-            # This could include reading important resources before completion
-            for connection in agent.mcp_clients:
-                if connection.is_connected:
-                    resources = connection.available_resources
-                    for resource in resources:
-                        try:
-                            # You can add logic here to pre-fetch important resources
-                            # For now, we just log their availability
-                            debug_print(self.debug, f"Available resource: {resource.uri}")
-                        except Exception as e:
-                            debug_print(self.debug, f"Error accessing resource {resource.uri}: {e}")
         except Exception as e:
             debug_print(self.debug, f"Error initializing MCP resources: {e}")
 
     def _get_mcp_tools_json(self, agent: MCPAgent) -> list:
-        """Get all MCP tools as JSON format with prefixes."""
-        mcp_tools = []
-        for connection in agent.mcp_clients:
-            if connection.is_connected:
-                prefix = connection.config.name
-                for tool in connection.available_tools:
-                    mcp_tools.append(self._mcp_tool_to_json(tool, prefix))
-        return mcp_tools
-
-    async def _handle_mcp_tool_call(self, agent: MCPAgent, tool_call: ChatCompletionMessageToolCall, debug: bool) -> dict:
-        """Handle an MCP tool call."""
+        """Get all MCP tools as JSON format with prefixes, from the schemas cached by each connection."""
+        return agent.get_tools_json()
+
+    async def _handle_mcp_tool_call(self, agent: MCPAgent, tool_call: ChatCompletionMessageToolCall, debug: bool,
+                                    session_id: Optional[str] = None) -> dict:
+        """Handle an MCP tool call, reusing the cached result when the tool has a caching policy."""
         try:
             name = tool_call.function.name
             args = json.loads(tool_call.function.arguments)
-            function_name = name
-            for clients in agent.mcp_clients:
-                if name.startswith(clients.config.name + "_"):
-                    # If the tool name starts with the MCP client name, we can use it directly
-                    prefix = clients.config.name
-                    function_name = name[len(prefix) + 1:]  # Remove prefix
-            # Extract prefix and actual tool name
-        
-            # Call the MCP tool
-            result = await agent.call_mcp_tool(
-                tool_name=function_name,
-                arguments=args,
-                server_name=prefix
-            )
+            resolved = agent.resolve_tool(name)
+            if resolved is None:
+                raise ValueError(f"Tool '{name}' not found in any connected MCP server")
+            connection, tool = resolved
+
+            policy = self.tool_cache.policy_for(name, connection.config.cache_policies.get(tool.name))
+            hit, content = self.tool_cache.get(name, args, policy, session_id)
+            if hit:
+                debug_print(debug, f"Using cached result of MCP tool {name}.")
+            else:
+                # Call the MCP tool
+                result = await agent.call_mcp_tool(
+                    tool_name=tool.name,
+                    arguments=args,
+                    server_name=connection.config.name
+                )
+                content = MCPAgent.extract_tool_result_content(result)
+                self.tool_cache.put(name, args, policy, content, session_id)
             
             return {
                 "role": "tool",
                 "tool_call_id": tool_call.id,
                 "tool_name": name,
-                "content": MCPAgent.extract_tool_result_content(result),
+                "content": content,
             }
         except Exception as e:
             debug_print(debug, f"Error calling MCP tool {tool_call.function.name}: {e}")
@@ -772,6 +1057,19 @@ class AgentManager:
                 "content": f"Error: {str(e)}",
             }
 
+    def _get_last_user_message(self, messages: Memory | List) -> str:
+        """Returns the content of the last user message, or an empty string."""
+        if isinstance(messages, list):
+            candidates = messages
+        elif hasattr(messages, 'messages') and messages.messages:
+            candidates = messages.messages
+        else:
+            return ""
+        for msg in reversed(candidates):
+            if isinstance(msg, dict) and msg.get("role") == "user":
+                return msg.get("content", "")
+        return ""
+
     async def __run_and_stream(
         self,
         agent: Agent,
@@ -784,20 +1082,28 @@ class AgentManager:
         top_p: float = None,
         frequency_penalty: float = None,
         presence_penalty: float = None,
+        session_id: Optional[str] = None,
     ):
         active_agent = agent
         context_variables = copy.deepcopy(context_variables)
         
-        filtered_messages = messages.filter_memory(agent)
-        history = copy.deepcopy(filtered_messages)
-        init_len = len(filtered_messages)
+        if isinstance(messages, Memory):
+            history = copy.deepcopy(messages.filter_memory(agent))
+        else:
+            history = copy.deepcopy(messages)
+        # Remove 'agent' field from each element in history if it exists
+        for elem in history:
+            elem.pop('agent', None)
+        init_len = len(history)
         
         # Initialize token tracking
         first_completion_input_tokens = 0
         first_completion_memory_tokens = 0
         last_completion_output_tokens = 0
-        processing_tokens = 0
+        total_process_tokens = 0
         completion_count = 0
+        stream_metrics = []
+        mcp_ready = set()
 
         while len(history) - init_len < max_turns and active_agent:
 
@@ -805,9 +1111,13 @@ class AgentManager:
                 active_agent.status = AgentStatus.IDLE
                 break
 
+            if self._is_mcp_agent(active_agent) and id(active_agent) not in mcp_ready:
+                await self._initialize_mcp_resources(active_agent)
+                mcp_ready.add(id(active_agent))
+
             message = {
                 "content": "",
-                "sender": agent.name,
+                "sender": active_agent.name,
                 "role": "assistant",
                 "function_call": None,
                 "tool_calls": defaultdict(
@@ -820,7 +1130,8 @@ class AgentManager:
             }
 
             # get completion with current history, agent
-            completion = self.get_chat_completion(
+            metrics_recorder = StreamMetricsRecorder()
+            completion = await self.get_chat_completion_async(
                 agent=active_agent,
                 history=history,
                 context_variables=context_variables,
@@ -830,52 +1141,57 @@ class AgentManager:
                 top_p=top_p,
                 frequency_penalty=frequency_penalty,
                 presence_penalty=presence_penalty,
+                metrics_recorder=metrics_recorder,
             )
-            
-            # Track token usage from this completion
             completion_count += 1
-            if self.last_token_usage:
+            token_usage = self.last_token_usage
+
+            yield {"delim": "start"}
+            async with aclosing(stream_chunks(completion, self.stream_buffer_size)) as chunks:
+                async for chunk in chunks:
+                    metrics_recorder.record_chunk(chunk)
+                    if getattr(chunk, "usage", None) is not None:
+                        # Providers asked to include usage report it in a final chunk
+                        cached_tokens = self.request_assembler.record_usage(active_agent.name, chunk.usage)
+                        if token_usage:
+                            token_usage.cached_tokens = cached_tokens
+                    if not chunk.choices:
+                        continue
+                    raw_delta = chunk.choices[0].delta.model_dump_json()
+                    delta = json.loads(raw_delta)
+                    if delta["role"] == "assistant":
+                        delta["sender"] = active_agent.name
+                    yield delta
+                    # merge a separate copy so the yielded delta is never mutated
+                    merge_chunk(message, json.loads(raw_delta))
+            yield {"delim": "end"}
+
+            # Track token usage from this completion
+            if token_usage:
+                token_usage.output_tokens = self.count_tokens(message["content"])
+
+            metrics = metrics_recorder.finish(token_usage.output_tokens if token_usage else None)
+            stream_metrics.append(metrics)
+            debug_print(debug, f"Streaming completion {completion_count} latency - TTFT: {metrics.time_to_first_token}, Duration: {metrics.duration}, Tokens/s: {metrics.tokens_per_second}")
+
+            if token_usage:
                 # First completion: capture input tokens separated
                 if completion_count == 1:
-                    # Extract user message (last message with role 'user')
-                    user_msg = ""
-                    if isinstance(messages, list):
-                        for msg in reversed(messages):
-                            if isinstance(msg, dict) and msg.get("role") == "user":
-                                user_msg = msg.get("content", "")
-                                break
-                    elif hasattr(messages, 'messages') and messages.messages:
-                        for msg in reversed(messages.messages):
-                            if isinstance(msg, dict) and msg.get("role") == "user":
-                                user_msg = msg.get("content", "")
-                                break
-                    
+                    user_msg = self._get_last_user_message(messages)
                     user_tokens, memory_tokens = self.count_tokens_separated(user_msg, history)
                     first_completion_input_tokens = user_tokens
                     first_completion_memory_tokens = memory_tokens
-                    processing_tokens = self.last_token_usage.input_tokens + self.last_token_usage.output_tokens - first_completion_input_tokens - first_completion_memory_tokens
-                else:
-                    processing_tokens += self.last_token_usage.input_tokens + self.last_token_usage.output_tokens
                 
                 # Always update last output tokens (will be the final one)
-                last_completion_output_tokens = self.last_token_usage.output_tokens
+                last_completion_output_tokens = token_usage.output_tokens
                 
                 # Accumulate total process tokens
+                completion_total = token_usage.input_tokens + token_usage.output_tokens
+                total_process_tokens += completion_total
                 
-                debug_print(debug, f"Streaming completion {completion_count} tokens - Input: {self.last_token_usage.input_tokens}, Output: {self.last_token_usage.output_tokens}, Total: {completion_total}")
+                debug_print(debug, f"Streaming completion {completion_count} tokens - Input: {token_usage.input_tokens}, Output: {token_usage.output_tokens}, Total: {completion_total}")
                 debug_print(debug, f"Streaming accumulated process tokens: {total_process_tokens}")
 
-            yield {"delim": "start"}
-            for chunk in completion:
-                delta = json.loads(chunk.choices[0].delta.json())
-                if delta["role"] == "assistant":
-                    delta["sender"] = active_agent.name
-                yield delta
-                delta.pop("role", None)
-                delta.pop("sender", None)
-                merge_chunk(message, delta)
-            yield {"delim": "end"}
-
             message["tool_calls"] = list(
                 message.get("tool_calls", {}).values())
             if not message["tool_calls"]:
@@ -901,7 +1217,7 @@ class AgentManager:
 
             # handle function calls, updating context_variables, and switching agents
             partial_response = await self.handle_tool_calls(
-                tool_calls, active_agent.functions, context_variables, debug, active_agent
+                tool_calls, active_agent.functions, context_variables, debug, active_agent, session_id
             )
             history.extend(partial_response.messages)
             context_variables.update(partial_response.context_variables)
@@ -916,7 +1232,8 @@ class AgentManager:
                 input_tokens=first_completion_input_tokens,
                 memory_tokens=first_completion_memory_tokens,
                 output_tokens=last_completion_output_tokens,
-                process_tokens=processing_tokens - last_completion_output_tokens,
+                process_tokens=total_process_tokens,
+                stream_metrics=stream_metrics,
             )
         }
 
@@ -933,6 +1250,7 @@ class AgentManager:
         debug: bool = False,
         max_turns: int = float("inf"),
         execute_tools: bool = True,
+        session_id: Optional[str] = None,
     ) -> Response:
         if stream:
             return self.__run_and_stream(
@@ -946,6 +1264,7 @@ class AgentManager:
                 top_p=top_p,
                 frequency_penalty=frequency_penalty,
                 presence_penalty=presence_penalty,
+                session_id=session_id,
             )
         try:
             active_agent = agent
@@ -960,6 +1279,7 @@ class AgentManager:
             first_completion_memory_tokens = 0
             last_completion_output_tokens = 0
             total_process_tokens = 0
+            mcp_ready = set()
 
             while i < max_turns and active_agent:
                 try:
@@ -980,12 +1300,12 @@ class AgentManager:
                     if active_agent.external_content:
                         history[-1]["content"] = __DOCUMENT_GUARDRAIL_TEXT__ + history[-1]["content"]
                     
-                    # Initialize MCP resources if this is an MCPAgent
-                    if self._is_mcp_agent(active_agent):
+                    # Check the MCP connections once per agent and run, not on every completion
+                    if self._is_mcp_agent(active_agent) and id(active_agent) not in mcp_ready:
                         await self._initialize_mcp_resources(active_agent)
-                        
+                        mcp_ready.add(id(active_agent))
                     
-                    completion = self.get_chat_completion(
+                    completion = await self.get_chat_completion_async(
                         agent=active_agent,
                         history=history,
                         context_variables=context_variables,
@@ -1002,18 +1322,7 @@ class AgentManager:
                         # First completion: capture input tokens separated
                         if i == 1:
                             # Extract user message (last message with role 'user')
-                            user_msg = ""
-                            if isinstance(messages, list):
-                                for msg in reversed(messages):
-                                    if isinstance(msg, dict) and msg.get("role") == "user":
-                                        user_msg = msg.get("content", "")
-                                        break
-                            elif hasattr(messages, 'messages') and messages.messages:
-                                for msg in reversed(messages.messages):
-                                    if isinstance(msg, dict) and msg.get("role") == "user":
-                                        user_msg = msg.get("content", "")
-                                        break
-                            
+                            user_msg = self._get_last_user_message(messages)
                             user_tokens, memory_tokens = self.count_tokens_separated(user_msg, history)
                             first_completion_input_tokens = user_tokens
                             first_completion_memory_tokens = memory_tokens
@@ -1038,7 +1347,7 @@ class AgentManager:
                         break
 
                     partial_response = await self.handle_tool_calls(
-                        message.tool_calls, active_agent.functions, context_variables, debug, active_agent
+                        message.tool_calls, active_agent.functions, context_variables, debug, active_agent, session_id
                     )
                     messages.extend(partial_response.messages)
                     response_history.extend(partial_response.messages)
@@ -1085,6 +1394,63 @@ class AgentManager:
                 process_tokens=0,
             )
 
+    @property
+    def agent(self) -> Agent:
+        """
+        The current agent instance: the agent given to the manager or, without one, the triage agent.
+        """
+        return self._current_agent if self._current_agent is not None else self.triage_agent_criator.get_agent()
+
+    @agent.setter
+    def agent(self, agent: Agent):
+        self._current_agent = agent
+
+    @property
+    def max_retries(self) -> int:
+        """
+        Maximum attempts of a request, read from and written to `retry_policy.max_attempts`.
+        """
+        return self.retry_policy.max_attempts
+
+    @max_retries.setter
+    def max_retries(self, value: int) -> None:
+        self.retry_policy.max_attempts = value
+
+    @property
+    def retry_delay(self) -> float:
+        """
+        Backoff in seconds before the first retry, read from and written to `retry_policy.base_delay`.
+        """
+        return self.retry_policy.base_delay
+
+    @retry_delay.setter
+    def retry_delay(self, value: float) -> None:
+        self.retry_policy.base_delay = value
+
+    @property
+    def _uses_triage(self) -> bool:
+        return self._current_agent is None
+
+    def add_agent_creator(self, agent_creator: MonkaiAgentCreator, category: Optional[str] = None) -> None:
+        """
+        Adds an agent creator to the triage without rebuilding the agents of the other creators.
+
+        Args:
+            agent_creator: The creator to add.
+            category: The category of the creator when triage categories are declared.
+        """
+        self.triage_agent_criator.add_creator(agent_creator, category)
+        if self.triage_classifier is not None:
+            self.triage_classifier.fit(self.agents_creators)
+
+    def remove_agent_creator(self, agent_creator: MonkaiAgentCreator) -> None:
+        """
+        Removes an agent creator from the triage.
+        """
+        self.triage_agent_criator.remove_creator(agent_creator)
+        if self.triage_classifier is not None:
+            self.triage_classifier.fit(self.agents_creators)
+
     def get_triage_agent(self):
         """
         Returns the triage agent.
@@ -1094,9 +1460,238 @@ class AgentManager:
         """
         return self.triage_agent_criator.get_agent()
 
+    def _is_triage_agent(self, agent: Agent) -> bool:
+        """Check if an agent is the entry agent of this manager or one of its triage agents."""
+        if agent is self.agent or agent.name == self.agent.name:
+            return True
+        return self._uses_triage and self.triage_agent_criator.is_triage_agent(agent)
+
+    def _find_agent_by_name(self, name: str) -> Optional[Agent]:
+        """Returns the agent of the registered creator with the given name, if any."""
+        return self.triage_agent_criator.find_agent(name)
+
+    def _get_sticky_agent(self, user_message: str, user_history: Memory | List, session_id: Optional[str]) -> Optional[Agent]:
+        """
+        Returns the agent a sticky session should resume at, or None to start at the triage agent.
+
+        The agent is taken from the last turn of the session or, for sessions not seen by this
+        manager and for turns without a session id, from the last agent recorded in the history.
+        """
+        sticky_agent = self._sticky_agents.get(session_id) if session_id is not None else None
+        if sticky_agent is None and user_history:
+            history = user_history.get_messages() if isinstance(user_history, Memory) else user_history
+            for msg in reversed(history):
+                name = msg.get('agent') or msg.get('sender') if isinstance(msg, dict) else None
+                if name:
+                    sticky_agent = self._find_agent_by_name(name)
+                    break
+        if sticky_agent is None or self._is_triage_agent(sticky_agent):
+            return None
+        if self.topic_change_detector and self.topic_change_detector(user_message, sticky_agent):
+            debug_print(self.debug, f"Topic change detected, leaving sticky agent {sticky_agent.name}.")
+            return None
+        return sticky_agent
+
+    def _remember_agent(self, session_id: Optional[str], agent: Optional[Agent]) -> None:
+        """
+        Records the agent that ended a turn for sticky routing. Ending at the triage agent (e.g.
+        through `transfer_to_triage`) releases the session. Turns without a session id are not
+        recorded, so callers that pass none never share a session.
+        """
+        if session_id is None:
+            return
+        if agent is None or self._is_triage_agent(agent):
+            self._sticky_agents.pop(session_id, None)
+            return
+        self._sticky_agents[session_id] = agent
+        self._sticky_agents.move_to_end(session_id)
+        while len(self._sticky_agents) > self.max_sticky_sessions:
+            self._sticky_agents.popitem(last=False)
+
+    def _is_first_turn(self, user_history: Memory | List) -> bool:
+        """Check if the history holds no user message yet."""
+        if not user_history:
+            return True
+        history = user_history.get_messages() if isinstance(user_history, Memory) else user_history
+        return not any(isinstance(msg, dict) and msg.get('role') == 'user' for msg in history)
+
+    def _get_cached_route(self, user_message: str) -> Optional[Agent]:
+        """Returns the agent the routing cache recorded for the message, if any."""
+        self.routing_cache.ensure_signature(self.triage_agent_criator.get_routing_signature())
+        agent_name = self.routing_cache.get(user_message)
+        return self._find_agent_by_name(agent_name) if agent_name else None
+
+    def _select_start_agent(self, user_message: str, user_history: Memory | List,
+                            session_id: Optional[str]) -> tuple[Agent, Optional[TriageDecision]]:
+        """
+        Determines the agent a turn starts at when the caller does not provide one.
+
+        Returns:
+            tuple: The agent and the decision of the local triage classifier, if it was consulted.
+        """
+        if self.sticky_routing:
+            sticky_agent = self._get_sticky_agent(user_message, user_history, session_id)
+            if sticky_agent is not None:
+                debug_print(self.debug, f"Resuming sticky session at {sticky_agent.name}.")
+                return sticky_agent, None
+        if not self._uses_triage:
+            return self.agent, None
+        if self.routing_cache is not None and self._is_first_turn(user_history):
+            cached_agent = self._get_cached_route(user_message)
+            if cached_agent is not None:
+                debug_print(self.debug, f"Routing cache hit for {cached_agent.name}.")
+                return cached_agent, None
+        if self.triage_classifier is not None and self._is_first_turn(user_history):
+            routed_agent, decision = self.triage_classifier.route(user_message)
+            if routed_agent is not None:
+                debug_print(self.debug, f"Triage classifier routed to {routed_agent.name} ({decision.confidence:.2f}).")
+                return routed_agent, decision
+            return self.agent, decision
+        return self.agent, None
+
+    def _first_transfer_target(self, messages: List[dict]) -> Optional[Agent]:
+        """
+        Returns the first specialist a turn was transferred to, skipping the category agents of a
+        hierarchical triage, so later transfers between specialists are not taken as triage decisions.
+        """
+        for message in messages:
+            if message.get('role') != 'tool' or not str(message.get('tool_name', '')).startswith('transfer_to_'):
+                continue
+            try:
+                agent_name = json.loads(message.get('content') or '').get('assistant')
+            except (ValueError, AttributeError):
+                continue
+            agent = self._find_agent_by_name(agent_name) if agent_name else None
+            if agent is not None:
+                return agent
+        return None
+
+    def _resolve_start_agent(self, agent: Optional[Agent], user_message: str, user_history: Memory | List,
+                             session_id: Optional[str]) -> tuple[Agent, Optional[TriageDecision]]:
+        """
+        Returns the agent given by the caller or the one selected for the turn. Runs starting at a
+        specialist build the triage agent first, so the specialist can transfer back to it.
+        """
+        agent_to_use, decision = (agent, None) if agent is not None else self._select_start_agent(user_message, user_history, session_id)
+        if self._uses_triage:
+            self.get_triage_agent()
+        return agent_to_use, decision
+
+    def _finish_turn(self, user_message: str, user_history: Memory | List, session_id: Optional[str],
+                     start_agent: Agent, decision: Optional[TriageDecision], response: Response) -> None:
+        """Updates the routing state with the agent that ended a turn and the one triage chose."""
+        agent = response.agent
+        if self.sticky_routing:
+            self._remember_agent(session_id, agent)
+        if agent is None or self._is_triage_agent(agent):
+            return
+        if decision is not None:
+            self.triage_classifier.record_outcome(decision, agent.name)
+        if self._uses_triage and self._is_triage_agent(start_agent):
+            routed_agent = self._first_transfer_target(response.messages) or agent
+            self._route_counts[routed_agent.name] += 1
+            if self.routing_cache is not None and self._is_first_turn(user_history):
+                self.routing_cache.put(user_message, routed_agent.name)
+
+    def _speculative_candidates(self, decision: Optional[TriageDecision]) -> List[Agent]:
+        """
+        Returns the specialists most likely to be chosen by the triage agent: the best scores of
+        the local classifier when it was consulted, otherwise the most frequent past routes.
+        """
+        if decision is not None:
+            ranking = sorted(decision.scores, key=decision.scores.get, reverse=True)
+        else:
+            ranking = sorted(self._route_counts, key=self._route_counts.get, reverse=True)
+        candidates = []
+        for name in ranking[:self.speculative_agents]:
+            agent = self._find_agent_by_name(name)
+            if agent is not None:
+                candidates.append(agent)
+        return candidates
+
+    @staticmethod
+    def _merge_responses(*responses: Response) -> Response:
+        """Concatenates the responses of consecutive stages of a run."""
+        context_variables = {}
+        for response in responses:
+            context_variables.update(response.context_variables)
+        return Response(
+            messages=[message for response in responses for message in response.messages],
+            agent=responses[-1].agent,
+            context_variables=context_variables,
+            input_tokens=responses[0].input_tokens,
+            memory_tokens=responses[0].memory_tokens,
+            output_tokens=responses[-1].output_tokens,
+            process_tokens=sum(response.process_tokens or 0 for response in responses),
+        )
+
+    async def _run_speculative(self, triage_agent: Agent, messages: List, decision: Optional[TriageDecision],
+                               max_turns: int, **options) -> Response:
+        """
+        Runs the triage completion and the first completion of the likely specialists concurrently.
+
+        Speculative completions do not execute tools. When the triage agent transfers to one of the
+        candidates its completion is adopted (and its tool calls, if any, executed) and the run goes
+        on from there; the other candidates are cancelled. On a miss the run continues from the
+        agent chosen by the triage agent as usual.
+        """
+        candidates = self._speculative_candidates(decision)
+        if not candidates:
+            return await self.__run(agent=triage_agent, messages=messages, max_turns=max_turns, **options)
+
+        self.speculation_stats["runs"] += 1
+        speculative = {
+            candidate.name: asyncio.create_task(self.__run(
+                agent=candidate, messages=copy.deepcopy(messages), max_turns=1, execute_tools=False, **options
+            ))
+            for candidate in candidates
+        }
+        adopted = None
+        try:
+            routed = await self.__run(agent=triage_agent, messages=copy.deepcopy(messages), max_turns=1, **options)
+            if routed.agent is not None and not self._is_triage_agent(routed.agent):
+                adopted = speculative.pop(routed.agent.name, None)
+        finally:
+            for task in speculative.values():
+                task.cancel()
+            self.speculation_stats["cancelled"] += len(speculative)
+
+        history = messages + routed.messages
+        if adopted is None:
+            self.speculation_stats["missed"] += 1
+        if routed.agent is None or self._is_triage_agent(routed.agent):
+            return routed
+        if adopted is None:
+            debug_print(self.debug, f"Speculation missed, continuing with {routed.agent.name}.")
+            rest = await self.__run(agent=routed.agent, messages=history, max_turns=max_turns - 1, **options)
+            return self._merge_responses(routed, rest)
+
+        self.speculation_stats["adopted"] += 1
+        debug_print(self.debug, f"Adopting speculative run of {routed.agent.name}.")
+        specialist = await adopted
+        responses = [routed, specialist]
+        history += specialist.messages
+        last_message = specialist.messages[-1] if specialist.messages else {}
+        if last_message.get("tool_calls"):
+            # Like `__run`, always answer the tool calls of a completion, even on its last turn
+            context_variables = {**options["context_variables"], **routed.context_variables}
+            tool_calls = [ChatCompletionMessageToolCall.model_validate(call) for call in last_message["tool_calls"]]
+            partial = await self.handle_tool_calls(
+                tool_calls, specialist.agent.functions, context_variables, self.debug, specialist.agent,
+                options.get("session_id")
+            )
+            partial.agent = partial.agent or specialist.agent
+            responses.append(partial)
+            if max_turns > 2:
+                options["context_variables"] = {**context_variables, **partial.context_variables}
+                responses.append(await self.__run(
+                    agent=partial.agent, messages=history + partial.messages, max_turns=max_turns - 2, **options
+                ))
+        return self._merge_responses(*responses)
+
     async def run(self,user_message:str, user_history:Memory|List = None, agent=None, 
                   max_tokens=None, top_p=None, frequency_penalty=None, presence_penalty=None,
-                    max_turn: int = float("inf") )->Response:
+                    max_turn: int = float("inf"), session_id: Optional[str] = None)->Response:
 
         """
         Executes the main workflow:
@@ -1104,6 +1699,10 @@ class AgentManager:
             - Manages the interaction with the agent.
             - Processes tool calls and updates context variables.
 
+        Args:
+            session_id: Identifies the conversation for sticky routing and session-scoped cached
+                tool results. Managers shared between users should always pass it.
+
         Returns:
             Response: The response from the agent after processing the user message.
         """
@@ -1113,19 +1712,70 @@ class AgentManager:
         messages.append({"role": "user", "content": user_message})
         
         #Determined the agent to use
-        agent_to_use = agent if agent is not None else self.agent
+        agent_to_use, decision = self._resolve_start_agent(agent, user_message, user_history, session_id)
         # Run the conversation asynchronously
-        response:Response = await self.__run(
+        if (self.speculative_agents > 0 and not self.stream and agent is None and isinstance(messages, list)
+                and self._uses_triage and self._is_triage_agent(agent_to_use)):
+            response = await self._run_speculative(
+                agent_to_use, messages, decision, max_turn,
+                context_variables=self.context_variables,
+                max_tokens=max_tokens,
+                top_p=top_p,
+                frequency_penalty=frequency_penalty,
+                presence_penalty=presence_penalty,
+                debug=self.debug,
+                session_id=session_id,
+            )
+        else:
+            response:Response = await self.__run(
+                agent=agent_to_use,
+                messages= messages,
+                context_variables=self.context_variables,
+                max_tokens=max_tokens,
+                top_p=top_p,
+                frequency_penalty=frequency_penalty,
+                presence_penalty=presence_penalty,
+                stream=self.stream,
+                debug=self.debug,
+                max_turns=max_turn,
+                session_id=session_id,
+            )
+        assert(response is not None)
+        if isinstance(response, Response):
+            self._finish_turn(user_message, user_history, session_id, agent_to_use, decision, response)
+        return response
+
+    async def run_stream(self, user_message:str, user_history:Memory|List = None, agent=None,
+                         max_tokens=None, top_p=None, frequency_penalty=None, presence_penalty=None,
+                         max_turn: int = float("inf"), session_id: Optional[str] = None):
+        """
+        Executes the same workflow as `run`, streaming the completions as they are generated.
+
+        Chunks are read through the provider's async client, so the event loop is never blocked,
+        and slow consumers apply backpressure to the provider stream. Closing the generator
+        (e.g. when the client disconnects) closes the upstream HTTP stream.
+
+        Yields:
+            dict: `{"delim": "start"}` and `{"delim": "end"}` around each completion, the
+            completion deltas in between and finally `{"response": Response}`.
+        """
+        messages=copy.deepcopy(user_history) if user_history is not  None else []
+        messages.append({"role": "user", "content": user_message})
+
+        agent_to_use, decision = self._resolve_start_agent(agent, user_message, user_history, session_id)
+        async with aclosing(self.__run_and_stream(
             agent=agent_to_use,
-            messages= messages,
+            messages=messages,
             context_variables=self.context_variables,
+            debug=self.debug,
+            max_turns=max_turn,
             max_tokens=max_tokens,
             top_p=top_p,
             frequency_penalty=frequency_penalty,
             presence_penalty=presence_penalty,
-            stream=self.stream,
-            debug=self.debug,
-            max_turns=max_turn,
-        )
-        assert(response is not None)
-        return response
+            session_id=session_id,
+        )) as events:
+            async for event in events:
+                if "response" in event:
+                    self._finish_turn(user_message, user_history, session_id, agent_to_use, decision, event["response"])
+                yield event
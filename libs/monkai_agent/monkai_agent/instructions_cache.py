@@ -0,0 +1,167 @@
+"""
+This module provides memoization of the instructions of agents built by a callable.
+
+When `Agent.instructions` is a callable, it is called with the context variables before every completion,
+including each iteration of the tool loop of a run. `InstructionsCache` records which context variables the
+callable reads and reuses its result while those variables keep the same values, so expensive instruction
+builders (templates, lookups) run once per distinct context. Callables that depend on anything else than the
+context variables, such as the current time, are rendered again once their entries expire.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = "\x00missing"
+
+
+class _RecordingContext(defaultdict):
+    """The context variables given to an instructions callable, recording the keys it reads."""
+
+    def __init__(self, values: Dict[str, Any]):
+        super().__init__(str, values)
+        self.read_keys = set()
+        self.reads_all = False
+
+    def __getitem__(self, key):
+        self.read_keys.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.read_keys.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self.read_keys.add(key)
+        return super().__contains__(key)
+
+    def _read_all(self):
+        self.reads_all = True
+
+    def __iter__(self):
+        self._read_all()
+        return super().__iter__()
+
+    def __len__(self):
+        self._read_all()
+        return super().__len__()
+
+    def keys(self):
+        self._read_all()
+        return super().keys()
+
+    def values(self):
+        self._read_all()
+        return super().values()
+
+    def items(self):
+        self._read_all()
+        return super().items()
+
+    def copy(self):
+        self._read_all()
+        return dict(super().items())
+
+    def __repr__(self):
+        self._read_all()
+        return super().__repr__()
+
+
+class InstructionsCache:
+    """
+    LRU cache of rendered instructions, keyed by the agent, its instructions callable and the
+    values of the context variables the callable read.
+    """
+
+    def __init__(self, ttl: Optional[float] = 300.0, max_entries: int = 1024):
+        """
+        Args:
+            ttl: Seconds a rendered instruction stays valid. None keeps it until it is evicted.
+            max_entries: Maximum number of rendered instructions kept; the least recently used are evicted first.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[Any, Optional[float]]]" = OrderedDict()
+        # (agent name, callable) -> the sets of keys its renders read; None when a render read every key
+        self._read_sets: "OrderedDict[Tuple[str, Any], List[Optional[Tuple]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _fingerprint(context: Dict[str, Any], keys: Optional[Tuple]) -> str:
+        if keys is None:
+            values = sorted(([repr(key), value] for key, value in dict.items(context)), key=lambda item: item[0])
+        else:
+            values = [[repr(key), dict.get(context, key, _MISSING)] for key in keys]
+        payload = json.dumps(values, sort_keys=True, ensure_ascii=False, default=repr)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def render(self, agent: Any, context_variables: Dict[str, Any]) -> Any:
+        """
+        Returns the instructions of an agent for the given context variables, calling its
+        instructions callable only when no valid render matches the variables it reads.
+        Changes the callable makes to the context variables are applied to `context_variables`.
+        """
+        instructions = agent.instructions
+        owner = (agent.name, instructions)
+        try:
+            read_sets = self._read_sets.get(owner)
+        except TypeError:
+            # Unhashable callable: nothing to key the cache with
+            return instructions(context_variables)
+
+        now = time.monotonic()
+        for keys in read_sets or ():
+            key = (owner, keys, self._fingerprint(context_variables, keys))
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry[1] is not None and entry[1] <= now:
+                del self._entries[key]
+                continue
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        recording = _RecordingContext(context_variables)
+        rendered = instructions(recording)
+        keys = None if recording.reads_all else tuple(sorted(recording.read_keys, key=repr))
+        if read_sets is None:
+            read_sets = self._read_sets[owner] = []
+            while len(self._read_sets) > self.max_entries:
+                self._read_sets.popitem(last=False)
+        else:
+            self._read_sets.move_to_end(owner)
+        if keys not in read_sets:
+            read_sets.append(keys)
+
+        expires_at = now + self.ttl if self.ttl is not None else None
+        self._entries[(owner, keys, self._fingerprint(context_variables, keys))] = (rendered, expires_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        context_variables.update(dict.items(recording))
+        return rendered
+
+    def invalidate(self) -> None:
+        """Removes every rendered instruction."""
+        self._entries.clear()
+        self._read_sets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns the size of the cache and its hit and eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,173 @@
+"""
+This module provides the local lexical similarity primitives used by the MonkAI agent to route and select
+without calling the LLM.
+
+Texts are normalized, split into word and character n-grams and hashed into a fixed number of features
+(the hashing trick), so no vocabulary has to be stored and unseen words still share character n-grams with
+known ones. `LexicalIndex` weights the hashed features with TF-IDF and ranks documents by cosine similarity.
+
+The index requires NumPy (`pip install monkai-agent[routing]`). Everything runs locally, without network access.
+"""
+
+import re
+import unicodedata
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes a text for lexical comparison: lowercases it, removes accents and folds
+    punctuation and whitespace runs into single spaces.
+
+    Args:
+        text: The text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _require_numpy() -> None:
+    if not NUMPY_AVAILABLE:
+        raise ImportError("Local lexical routing requires numpy. Install it with `pip install monkai-agent[routing]`.")
+
+
+class HashedNgramVectorizer:
+    """
+    Maps texts to term-frequency vectors of hashed word and character n-grams.
+
+    Hashing uses CRC32, so vectors are stable across processes and can be persisted or compared
+    between runs.
+    """
+
+    def __init__(self, n_features: int = 2 ** 14, word_ngrams: Tuple[int, int] = (1, 2),
+                 char_ngrams: Optional[Tuple[int, int]] = (3, 5)):
+        """
+        Args:
+            n_features: Dimension of the vectors.
+            word_ngrams: Minimum and maximum length of the word n-grams.
+            char_ngrams: Minimum and maximum length of the character n-grams, taken inside each word.
+                None disables character n-grams.
+        """
+        _require_numpy()
+        self.n_features = n_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = char_ngrams
+
+    def terms(self, text: str) -> List[str]:
+        """Returns the n-grams of a text."""
+        words = normalize_text(text).split()
+        terms = []
+        low, high = self.word_ngrams
+        for n in range(low, high + 1):
+            terms.extend("w:" + " ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+        if self.char_ngrams:
+            low, high = self.char_ngrams
+            for word in words:
+                padded = f"<{word}>"
+                for n in range(low, high + 1):
+                    terms.extend("c:" + padded[i:i + n] for i in range(len(padded) - n + 1))
+        return terms
+
+    def transform(self, texts: Sequence[str]) -> "np.ndarray":
+        """
+        Vectorizes texts.
+
+        Returns:
+            np.ndarray: A `(len(texts), n_features)` matrix of term counts.
+        """
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in self.terms(text):
+                matrix[row, zlib.crc32(term.encode("utf-8")) % self.n_features] += 1.0
+        return matrix
+
+
+class LexicalIndex:
+    """
+    TF-IDF index over a fixed set of documents, ranked by cosine similarity.
+    """
+
+    def __init__(self, documents: Sequence[str], vectorizer: Optional[HashedNgramVectorizer] = None):
+        """
+        Args:
+            documents: The indexed texts. Results refer to documents by their position.
+            vectorizer: The vectorizer to use. Defaults to a `HashedNgramVectorizer`.
+        """
+        _require_numpy()
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        self.size = len(documents)
+        counts = self.vectorizer.transform(documents)
+        document_frequency = (counts > 0).sum(axis=0)
+        self.idf = (np.log((1.0 + self.size) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        self.matrix = self._weight(counts)
+
+    def _weight(self, counts: "np.ndarray") -> "np.ndarray":
+        weighted = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return weighted / norms
+
+    def scores(self, query: str) -> "np.ndarray":
+        """
+        Returns the cosine similarity between the query and every document.
+        """
+        if self.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self.matrix @ self._weight(self.vectorizer.transform([query]))[0]
+
+    def top_k(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Returns the `k` documents most similar to the query.
+
+        Returns:
+            List[Tuple[int, float]]: `(document position, score)` pairs, best first.
+        """
+        scores = self.scores(query)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(i), float(scores[i])) for i in order]
+
+    def cluster(self, k: int, iterations: int = 20) -> List[int]:
+        """
+        Groups the documents into `k` clusters with spherical k-means. Initialization picks the
+        first document and then, repeatedly, the document least similar to the chosen centers,
+        so the result is deterministic.
+
+        Returns:
+            List[int]: The cluster of each document, numbered from 0.
+        """
+        k = max(1, min(k, self.size))
+        if self.size == 0:
+            return []
+        centers = [0]
+        similarity = self.matrix @ self.matrix[0]
+        while len(centers) < k:
+            candidate = int(np.argmin(similarity))
+            centers.append(candidate)
+            similarity = np.maximum(similarity, self.matrix @ self.matrix[candidate])
+        centroids = self.matrix[centers]
+        labels = np.zeros(self.size, dtype=np.int64)
+        for iteration in range(iterations):
+            new_labels = np.argmax(self.matrix @ centroids.T, axis=1)
+            if iteration and np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+            for cluster in range(k):
+                members = self.matrix[labels == cluster]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    centroids[cluster] = centroid / norm if norm else centroid
+        return [int(label) for label in labels]
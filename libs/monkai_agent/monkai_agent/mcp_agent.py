@@ -12,11 +12,13 @@ a unified interface for accessing their capabilities.
 import asyncio
 import json
 import logging
-from contextlib import asynccontextmanager
+import time
+import weakref
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext
 from typing import Any, Dict, List, Literal, Optional, Union, AsyncGenerator
 from pathlib import Path
 from datetime import timedelta
-from pydantic import BaseModel, Field
+from pydantic import AnyUrl, BaseModel, Field, PrivateAttr
 from httpx import Auth
 # MCP imports
 from mcp.client.stdio import stdio_client, StdioServerParameters
@@ -30,10 +32,19 @@ from mcp.types import (
     CallToolRequest,
     GetPromptRequest,
     CallToolResult,
-    GetPromptRequestParams
+    GetPromptRequestParams,
+    InitializeResult,
+    PromptListChangedNotification,
+    ResourceListChangedNotification,
+    ResourceUpdatedNotification,
+    ServerNotification,
+    ToolListChangedNotification,
 )
 
-from .types import Agent
+from .types import Agent, ToolCachePolicy
+from .mcp_capability_cache import MCPCapabilityCache
+from .mcp_read_cache import MCPReadCache
+from .mcp_resources import MCPResourcePart, resource_parts
 
 logger = logging.getLogger(__name__)
 
@@ -74,6 +85,677 @@ class MCPClientConfig(BaseModel):
 
     auth: Optional[Auth] = None
 
+    cache_policies: Dict[str, ToolCachePolicy] = Field(default_factory=dict)
+    """Caching policies of the tools of this server whose results can be reused, by tool name."""
+
+    max_concurrent_calls: Optional[int] = None
+    """Maximum number of tool calls in flight to this server, shared by every connection to it in the
+    process. Further calls wait for a slot. None means unbounded."""
+
+    call_timeout: Optional[float] = None
+    """Deadline in seconds of a tool call, including the time spent waiting for a slot. None means no deadline."""
+
+    tool_timeouts: Dict[str, float] = Field(default_factory=dict)
+    """Deadlines in seconds of specific tools, by tool name. They take precedence over `call_timeout`."""
+
+
+@asynccontextmanager
+async def open_mcp_transport(config: MCPClientConfig) -> AsyncGenerator[tuple, None]:
+    """
+    Opens the transport described by a configuration.
+
+    Args:
+        config: Configuration of the MCP server
+
+    Yields:
+        tuple: The read and write streams of the transport
+
+    Raises:
+        ValueError: If the configuration is incomplete or the connection type is unsupported
+    """
+    if config.connection_type == "stdio":
+        if not config.command:
+            raise ValueError(f"Command required for stdio connection: {config.name}")
+        server_params = StdioServerParameters(
+            command=config.command,
+            args=config.args or [],
+            env=config.env,
+            cwd=config.cwd
+        )
+        async with stdio_client(server_params) as (read_stream, write_stream):
+            yield read_stream, write_stream
+
+    elif config.connection_type == "sse":
+        if not config.url:
+            raise ValueError(f"URL required for SSE connection: {config.name}")
+        async with sse_client(url=config.url, headers=config.headers, timeout=config.timeout or 30.0) as (read_stream, write_stream):
+            yield read_stream, write_stream
+
+    elif config.connection_type == "http":
+        if not config.url:
+            raise ValueError(f"URL required for HTTP connection: {config.name}")
+        timeout = config.timeout
+        if config.timeout and type(config.timeout) is not timedelta:
+            timeout = timedelta(seconds=config.timeout)
+        async with streamablehttp_client(
+            url=config.url,
+            headers=config.headers,
+            auth=config.auth,
+            timeout=timeout or timedelta(seconds=30)  # Default to 30 seconds if not specified
+        ) as (read_stream, write_stream, _):
+            yield read_stream, write_stream
+
+    else:
+        raise ValueError(f"Unsupported connection type: {config.connection_type}")
+
+
+class MCPSessionRunner:
+    """
+    Owns the transport and the session of one MCP connection in a dedicated task.
+
+    The MCP transports are built on anyio task groups, whose contexts must be entered and exited by
+    the same task. Running each connection in its own task allows connections to be opened
+    concurrently and closed later from any task.
+    """
+
+    def __init__(self, config: MCPClientConfig, message_handler: Optional[Any] = None,
+                 max_concurrent_requests: Optional[int] = None):
+        """
+        Args:
+            config: Configuration of the MCP server
+            message_handler: Optional handler for the requests and notifications sent by the server. It can
+                be replaced while the session runs.
+            max_concurrent_requests: Maximum number of requests in flight on the session. None means unbounded.
+        """
+        self.config = config
+        self.message_handler = message_handler
+        self._request_slots = asyncio.Semaphore(max_concurrent_requests) if max_concurrent_requests else None
+        self.session: Optional[ClientSession] = None
+        self.init_result: Optional[InitializeResult] = None
+        self.error: Optional[BaseException] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the session is open and its task is alive."""
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    @asynccontextmanager
+    async def request_slot(self) -> AsyncGenerator[None, None]:
+        """Holds one of the request slots of the session while a request is in flight."""
+        if self._request_slots is None:
+            yield
+            return
+        async with self._request_slots:
+            yield
+
+    async def _dispatch(self, message: Any) -> None:
+        if self.message_handler is not None:
+            await self.message_handler(message)
+
+    async def _run(self) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                read_stream, write_stream = await stack.enter_async_context(open_mcp_transport(self.config))
+                session = await stack.enter_async_context(
+                    ClientSession(read_stream, write_stream, message_handler=self._dispatch)
+                )
+                self.init_result = await session.initialize()
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def start(self, timeout: Optional[float] = None) -> ClientSession:
+        """
+        Opens the transport and initializes the session.
+
+        Args:
+            timeout: Maximum time in seconds to wait for the session to be ready
+
+        Returns:
+            ClientSession: The initialized session
+
+        Raises:
+            asyncio.TimeoutError: If the session is not ready in time
+            ConnectionError: If the connection failed
+        """
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session:{self.config.name}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            await self.close(timeout=0)
+            raise
+        if self.session is None:
+            await self.close()
+            raise ConnectionError(str(self.error or f"Connection to '{self.config.name}' closed during initialization"))
+        return self.session
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Closes the session and the transport."""
+        self._closing.set()
+        if self._task is None or self._task.done():
+            return
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.CancelledError:
+            # Closed concurrently by someone else; propagate only if the caller itself was cancelled
+            if not self._task.done():
+                raise
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def mcp_tool_to_json(tool: Tool, prefix: str) -> dict:
+    """
+    Converts an MCP tool to the function-calling format, named `<prefix>_<tool name>`.
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": f"{prefix}_{tool.name}",
+            "description": tool.description or "",
+            "parameters": tool.inputSchema if hasattr(tool, 'inputSchema') else {
+                "type": "object",
+                "properties": {},
+                "required": []
+            },
+        },
+    }
+
+
+def _config_key(config: MCPClientConfig) -> tuple:
+    """Identifies the server a configuration connects to, ignoring its name and timeout."""
+    return (
+        config.connection_type,
+        config.command,
+        tuple(config.args or ()),
+        tuple(sorted((config.env or {}).items())),
+        str(config.cwd) if config.cwd else None,
+        config.url,
+        json.dumps(config.headers or {}, sort_keys=True, default=str),
+        id(config.auth) if config.auth is not None else None,
+    )
+
+
+class MCPCallLimiter:
+    """
+    Bounds the tool calls in flight to one server and measures the calls waiting for a slot.
+
+    Limiters are shared by every connection to the same server in the process (see
+    `get_call_limiter`). The counters are kept across event loops; the semaphore is per loop.
+    """
+
+    def __init__(self, max_concurrent_calls: Optional[int] = None):
+        """
+        Args:
+            max_concurrent_calls: Maximum number of calls in flight. None means unbounded.
+        """
+        self.max_concurrent_calls = max_concurrent_calls
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _semaphore(self) -> Optional[asyncio.Semaphore]:
+        if not self.max_concurrent_calls:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrent_calls)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncGenerator[None, None]:
+        """Waits for a free slot and holds it while the call is in flight."""
+        semaphore = self._semaphore()
+        started = time.perf_counter()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        wait = time.perf_counter() - started
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.active += 1
+        self.calls += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if semaphore is not None:
+                semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns the calls in flight and waiting, the longest queue, the waiting times and the timeouts."""
+        return {
+            "max_concurrent_calls": self.max_concurrent_calls,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "average_wait": self.total_wait / self.calls if self.calls else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+_call_limiters: Dict[tuple, MCPCallLimiter] = {}
+
+
+def get_call_limiter(config: MCPClientConfig) -> MCPCallLimiter:
+    """Returns the limiter of the tool calls to the server a configuration connects to."""
+    key = (_config_key(config), config.max_concurrent_calls)
+    limiter = _call_limiters.get(key)
+    if limiter is None:
+        limiter = _call_limiters[key] = MCPCallLimiter(config.max_concurrent_calls)
+    return limiter
+
+
+class _PooledSession:
+    """A session of the pool, the number of connections using it and their message handlers."""
+
+    def __init__(self, config: MCPClientConfig, loop: asyncio.AbstractEventLoop,
+                 max_concurrent_requests: Optional[int] = None):
+        self.runner = MCPSessionRunner(config, message_handler=self.dispatch,
+                                       max_concurrent_requests=max_concurrent_requests)
+        self.loop = loop
+        self.refs = 0
+        self.handlers: List[Any] = []
+        self.idle_since: Optional[float] = None
+        self.eviction: Optional[asyncio.Task] = None
+
+    async def dispatch(self, message: Any) -> None:
+        """Forwards a message of the server to the handler of every connection using the session."""
+        for handler in list(self.handlers):
+            await handler(message)
+
+
+class MCPSessionLease:
+    """
+    A connection's share of a pooled session. It exposes the same interface as `MCPSessionRunner`,
+    and closing it only releases the reference.
+    """
+
+    def __init__(self, pool: "MCPSessionPool", key: tuple, entry: _PooledSession, message_handler: Optional[Any] = None):
+        self._pool = pool
+        self._key = key
+        self._entry = entry
+        self._message_handler = message_handler
+        self._released = False
+        if message_handler is not None:
+            entry.handlers.append(message_handler)
+
+    @property
+    def session(self) -> Optional[ClientSession]:
+        return self._entry.runner.session
+
+    @property
+    def init_result(self) -> Optional[InitializeResult]:
+        return self._entry.runner.init_result
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the lease is held and the pooled session is alive."""
+        return not self._released and self._entry.runner.is_running
+
+    def request_slot(self):
+        """Holds one of the request slots of the pooled session while a request is in flight."""
+        return self._entry.runner.request_slot()
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Releases the pooled session."""
+        if not self._released:
+            self._released = True
+            if self._message_handler in self._entry.handlers:
+                self._entry.handlers.remove(self._message_handler)
+            await self._pool.release(self._key, self._entry, timeout)
+
+
+class MCPSessionPool:
+    """
+    Shares MCP sessions between connections to the same server.
+
+    Connections whose configurations differ only by name or timeout are served by the same sessions,
+    so many agents talk to a server through a bounded number of subprocesses or HTTP sessions. New
+    connections are given the least used session, and a new session is opened only while all of them
+    are in use and `max_sessions_per_server` is not reached. Sessions nobody uses are closed after
+    `idle_timeout` seconds.
+
+    Sessions belong to the event loop they were opened in; connections from another loop get their
+    own sessions.
+    """
+
+    def __init__(self, max_sessions_per_server: int = 1, max_concurrent_requests: Optional[int] = None,
+                 idle_timeout: Optional[float] = 300.0):
+        """
+        Args:
+            max_sessions_per_server: Maximum number of sessions opened to the same server.
+            max_concurrent_requests: Maximum number of requests in flight on each session. None means unbounded.
+            idle_timeout: Seconds an unused session is kept open. None keeps it until `close_all`.
+        """
+        self.max_sessions_per_server = max(1, max_sessions_per_server)
+        self.max_concurrent_requests = max_concurrent_requests
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[tuple, List[_PooledSession]] = {}
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def _live_sessions(self, key: tuple) -> List[_PooledSession]:
+        entries = [
+            entry for entry in self._sessions.get(key, [])
+            if entry.runner.is_running and not entry.loop.is_closed()
+        ]
+        if entries:
+            self._sessions[key] = entries
+        else:
+            self._sessions.pop(key, None)
+        return entries
+
+    def _purge_closed_loops(self) -> None:
+        for key in [key for key in self._locks if key[0].is_closed()]:
+            del self._locks[key]
+            self._sessions.pop(key, None)
+
+    async def acquire(self, config: MCPClientConfig, timeout: Optional[float] = None,
+                      message_handler: Optional[Any] = None) -> MCPSessionLease:
+        """
+        Takes a session to the server of the configuration, opening one if needed.
+
+        Args:
+            config: Configuration of the MCP server
+            timeout: Maximum time in seconds to open a new session. Defaults to the configuration timeout.
+            message_handler: Optional handler for the requests and notifications sent by the server, called
+                until the lease is released
+
+        Returns:
+            MCPSessionLease: The lease to release with `close` once the session is no longer needed
+
+        Raises:
+            asyncio.TimeoutError: If a new session is not ready in time
+            ConnectionError: If a new session failed to connect
+        """
+        loop = asyncio.get_running_loop()
+        self._purge_closed_loops()
+        key = (loop, _config_key(config))
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entries = self._live_sessions(key)
+            entry = min(entries, key=lambda entry: entry.refs, default=None)
+            if entry is None or (entry.refs > 0 and len(entries) < self.max_sessions_per_server):
+                entry = _PooledSession(config, loop, self.max_concurrent_requests)
+                await entry.runner.start(timeout or config.timeout)
+                self._sessions.setdefault(key, []).append(entry)
+                self.created += 1
+            else:
+                self.reused += 1
+            if entry.eviction is not None:
+                entry.eviction.cancel()
+                entry.eviction = None
+            entry.refs += 1
+            entry.idle_since = None
+            return MCPSessionLease(self, key, entry, message_handler)
+
+    async def release(self, key: tuple, entry: _PooledSession, timeout: float = 5.0) -> None:
+        """Drops a reference to a pooled session and schedules its eviction once it is unused."""
+        entry.refs -= 1
+        if entry.refs > 0:
+            return
+        entry.idle_since = time.monotonic()
+        if not entry.runner.is_running or self.idle_timeout is not None and self.idle_timeout <= 0:
+            await self._evict(key, entry, timeout)
+        elif self.idle_timeout is not None:
+            entry.eviction = asyncio.create_task(self._evict_when_idle(key, entry))
+
+    async def _evict_when_idle(self, key: tuple, entry: _PooledSession) -> None:
+        await asyncio.sleep(self.idle_timeout)
+        entry.eviction = None
+        if entry.refs == 0:
+            await self._evict(key, entry)
+
+    async def _evict(self, key: tuple, entry: _PooledSession, timeout: float = 5.0) -> None:
+        entries = self._sessions.get(key, [])
+        if entry in entries:
+            entries.remove(entry)
+            if not entries:
+                self._sessions.pop(key, None)
+        if entry.runner.is_running:
+            self.evicted += 1
+        await entry.runner.close(timeout)
+
+    async def close_all(self) -> None:
+        """Closes every session of the current event loop, including the ones still in use."""
+        loop = asyncio.get_running_loop()
+        entries = [
+            (key, entry) for key, sessions in list(self._sessions.items()) if key[0] is loop for entry in list(sessions)
+        ]
+        for key, entry in entries:
+            if entry.eviction is not None:
+                entry.eviction.cancel()
+                entry.eviction = None
+        await asyncio.gather(*(self._evict(key, entry) for key, entry in entries))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the number of open sessions, the references to them and the pool counters."""
+        entries = [entry for sessions in self._sessions.values() for entry in sessions]
+        return {
+            "sessions": len(entries),
+            "references": sum(entry.refs for entry in entries),
+            "idle_sessions": sum(1 for entry in entries if entry.refs == 0),
+            "created": self.created,
+            "reused": self.reused,
+            "evicted": self.evicted,
+        }
+
+
+_shared_session_pool: Optional[MCPSessionPool] = None
+
+
+def get_shared_session_pool() -> MCPSessionPool:
+    """
+    Returns the process-wide session pool. Pass it as `session_pool` to every `MCPAgent` that
+    should share its MCP sessions with the others.
+    """
+    global _shared_session_pool
+    if _shared_session_pool is None:
+        _shared_session_pool = MCPSessionPool()
+    return _shared_session_pool
+
+
+class MCPServerSupervisor:
+    """
+    Keeps warm sessions to MCP servers ready to be handed to agents.
+
+    For every registered configuration a supervision task keeps `warm_sessions` initialized
+    sessions (for stdio servers, running subprocesses) in reserve, replaces the ones that exit,
+    pings them every `health_check_interval` seconds and retries failed starts with exponential
+    backoff. Connecting an agent then takes a ready session instead of spawning and initializing
+    a server. Handed-out sessions belong to the agent, which closes them when it disconnects.
+
+    The supervisor works in the event loop it was first used in.
+    """
+
+    def __init__(self, warm_sessions: int = 1, health_check_interval: Optional[float] = 30.0,
+                 ping_timeout: float = 5.0, restart_delay: float = 0.5, max_restart_delay: float = 30.0):
+        """
+        Args:
+            warm_sessions: Number of ready sessions kept per server.
+            health_check_interval: Seconds between two pings of the warm sessions. None disables pings.
+            ping_timeout: Maximum time in seconds to wait for a ping answer.
+            restart_delay: Delay in seconds before retrying a failed start; doubled after each consecutive failure.
+            max_restart_delay: Maximum delay in seconds between two start attempts.
+        """
+        self.warm_sessions = warm_sessions
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._configs: Dict[tuple, MCPClientConfig] = {}
+        self._targets: Dict[tuple, int] = {}
+        self._warm: Dict[tuple, List[MCPSessionRunner]] = {}
+        self._tasks: Dict[tuple, asyncio.Task] = {}
+        self._wakeups: Dict[tuple, asyncio.Event] = {}
+        self._failures: Dict[tuple, int] = {}
+        self.started = 0
+        self.restarts = 0
+        self.failed_starts = 0
+        self.failed_health_checks = 0
+        self.warm_hits = 0
+        self.cold_starts = 0
+
+    def _check_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # The sessions of a previous event loop cannot be used anymore
+            self._loop = loop
+            self._warm.clear()
+            self._tasks.clear()
+            self._wakeups.clear()
+
+    def register(self, config: MCPClientConfig, warm_sessions: Optional[int] = None) -> None:
+        """
+        Starts supervising a server: warm sessions are opened in the background.
+
+        Args:
+            config: Configuration of the MCP server
+            warm_sessions: Number of ready sessions kept for this server. Defaults to `warm_sessions`.
+        """
+        self._check_loop()
+        key = _config_key(config)
+        self._configs[key] = config
+        self._targets[key] = self.warm_sessions if warm_sessions is None else warm_sessions
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            self._wakeups[key] = asyncio.Event()
+            self._tasks[key] = asyncio.create_task(self._supervise(key), name=f"mcp-supervisor:{config.name}")
+        else:
+            self._wakeups[key].set()
+
+    async def _supervise(self, key: tuple) -> None:
+        config = self._configs[key]
+        warm = self._warm.setdefault(key, [])
+        wakeup = self._wakeups[key]
+        while True:
+            for runner in [runner for runner in warm if not runner.is_running]:
+                warm.remove(runner)
+                self.restarts += 1
+                logger.warning(f"Warm session to MCP server '{config.name}' exited, replacing it")
+            if len(warm) < self._targets[key]:
+                runner = MCPSessionRunner(config)
+                try:
+                    await runner.start(config.timeout)
+                except Exception as e:
+                    self.failed_starts += 1
+                    failures = self._failures[key] = self._failures.get(key, 0) + 1
+                    delay = min(self.max_restart_delay, self.restart_delay * 2 ** (failures - 1))
+                    logger.warning(f"Failed to start MCP server '{config.name}' ({e or type(e).__name__}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+                self._failures[key] = 0
+                self.started += 1
+                warm.append(runner)
+                continue
+            try:
+                await asyncio.wait_for(wakeup.wait(), self.health_check_interval)
+            except asyncio.TimeoutError:
+                await self._health_check(config, warm)
+            wakeup.clear()
+
+    async def _health_check(self, config: MCPClientConfig, warm: List[MCPSessionRunner]) -> None:
+        for runner in list(warm):
+            try:
+                await asyncio.wait_for(runner.session.send_ping(), self.ping_timeout)
+            except Exception as e:
+                self.failed_health_checks += 1
+                logger.warning(f"Warm session to MCP server '{config.name}' failed its health check: {e or type(e).__name__}")
+                if runner in warm:
+                    warm.remove(runner)
+                    self.restarts += 1
+                await runner.close(timeout=0)
+
+    async def acquire(self, config: MCPClientConfig, timeout: Optional[float] = None) -> MCPSessionRunner:
+        """
+        Takes a ready session to a server, or opens one if none is warm. The server is registered
+        if it was not, and the warm reserve is replenished in the background.
+
+        Args:
+            config: Configuration of the MCP server
+            timeout: Maximum time in seconds to open a session when none is warm. Defaults to the configuration timeout.
+
+        Returns:
+            MCPSessionRunner: The running session, owned by the caller from now on
+
+        Raises:
+            asyncio.TimeoutError: If a new session is not ready in time
+            ConnectionError: If a new session failed to connect
+        """
+        self._check_loop()
+        key = _config_key(config)
+        if key not in self._tasks:
+            self.register(config)
+        warm = self._warm.get(key, [])
+        self._wakeups[key].set()
+        while warm:
+            runner = warm.pop(0)
+            if runner.is_running:
+                self.warm_hits += 1
+                return runner
+        self.cold_starts += 1
+        runner = MCPSessionRunner(config)
+        await runner.start(timeout or config.timeout)
+        return runner
+
+    async def close(self) -> None:
+        """Stops supervising and closes the warm sessions."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        runners = [runner for warm in self._warm.values() for runner in warm]
+        self._tasks.clear()
+        self._warm.clear()
+        self._wakeups.clear()
+        await asyncio.gather(*(runner.close() for runner in runners))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns the warm sessions of each server and the supervision counters."""
+        return {
+            "servers": {
+                config.name: sum(runner.is_running for runner in self._warm.get(key, []))
+                for key, config in self._configs.items()
+            },
+            "started": self.started,
+            "restarts": self.restarts,
+            "failed_starts": self.failed_starts,
+            "failed_health_checks": self.failed_health_checks,
+            "warm_hits": self.warm_hits,
+            "cold_starts": self.cold_starts,
+        }
+
 
 class MCPClientConnection(BaseModel):
     """Represents an active MCP client connection."""
@@ -86,10 +768,8 @@ class MCPClientConnection(BaseModel):
     session: Optional[ClientSession] = None
     """Active client session."""
     
-    # Store the context managers to keep connections alive
-    _stdio_streams: Optional[Any] = None
-    _sse_streams: Optional[Any] = None
-    _http_streams: Optional[Any] = None
+    # Keeps the transport and session alive: an MCPSessionRunner, or an MCPSessionLease when pooled
+    _runner: Optional[Union[MCPSessionRunner, MCPSessionLease]] = None
     
     is_connected: bool = False
     """Whether the connection is currently active."""
@@ -102,6 +782,64 @@ class MCPClientConnection(BaseModel):
 
     available_prompts: List[Prompt] = Field(default_factory=list)
     """Prompts available from this MCP server."""
+
+    connect_time: Optional[float] = None
+    """Seconds taken by the last connection and initialization handshake."""
+
+    discovery_time: Optional[float] = None
+    """Seconds taken by the last capability discovery."""
+
+    last_error: Optional[str] = None
+    """Error of the last failed connection attempt."""
+
+    capabilities_from_cache: bool = False
+    """Whether the capabilities were served from the capability cache, pending a background refresh."""
+
+    last_activity: Optional[float] = None
+    """`time.monotonic()` of the last successful exchange with the server."""
+
+    reconnect_count: int = 0
+    """Number of times the connection was re-established after a failure."""
+
+    _next_attempt_at: float = 0.0
+
+    _refresh_task: Optional[asyncio.Task] = None
+
+    # URIs of the resources subscribed to on the current session
+    _subscriptions: Optional[set] = None
+
+    # (available_tools, server name, schemas) of the last conversion
+    _tool_schemas: Optional[tuple] = None
+
+    @property
+    def is_alive(self) -> bool:
+        """Whether the connection is marked as connected and its session task is running."""
+        return self.is_connected and self._runner is not None and self._runner.is_running
+
+    def request_slot(self):
+        """Holds a request slot of the session while a request is in flight."""
+        return self._runner.request_slot() if self._runner is not None else nullcontext()
+
+    @property
+    def call_limiter(self) -> MCPCallLimiter:
+        """The limiter of the tool calls to this server."""
+        return get_call_limiter(self.config)
+
+    def _converted_tools(self) -> tuple:
+        cache = self._tool_schemas
+        if cache is None or cache[0] is not self.available_tools or cache[1] != self.config.name:
+            schemas = [mcp_tool_to_json(tool, self.config.name) for tool in self.available_tools]
+            cache = self._tool_schemas = (self.available_tools, self.config.name, schemas)
+        return cache
+
+    def get_tool_schemas(self) -> List[dict]:
+        """
+        Returns the tools of the server in the function-calling format, named `<server>_<tool>`.
+
+        The schemas are converted once and reused until the discovered tools change, so they must
+        not be modified.
+        """
+        return self._converted_tools()[2]
     
 
 class MCPAgent(Agent):
@@ -111,6 +849,8 @@ class MCPAgent(Agent):
     This agent extends the base Agent class with the ability to connect to
     multiple MCP servers and access their tools, resources, and prompts.
     """
+
+    model_config = {"arbitrary_types_allowed": True}
     
     mcp_clients: List[MCPClientConnection] = Field(default_factory=list)
     """List of MCP client connections."""
@@ -119,6 +859,50 @@ class MCPAgent(Agent):
     """Whether to automatically discover server capabilities on connection."""
     
     resources: Optional[list] = []
+
+    health_check_interval: Optional[float] = 60.0
+    """Seconds of inactivity after which a connection is pinged before it is used again. None disables pings."""
+
+    ping_timeout: float = 5.0
+    """Maximum time in seconds to wait for a ping answer."""
+
+    reconnect_delay: float = 5.0
+    """Minimum time in seconds between two connection attempts to a failed server."""
+
+    session_pool: Optional[MCPSessionPool] = None
+    """Pool the sessions are taken from, e.g. `get_shared_session_pool()`. None gives each connection its own session."""
+
+    supervisor: Optional[MCPServerSupervisor] = None
+    """Supervisor handing out warm sessions, so connecting does not wait for the server to start. Unused with a `session_pool`."""
+
+    capability_cache: Optional[MCPCapabilityCache] = None
+    """Persistent cache of discovered capabilities. Cached servers are usable right after the handshake and refreshed in the background."""
+
+    read_cache: Optional[MCPReadCache] = None
+    """Cache of the resources and prompts read, refreshed on the servers' update notifications or after its TTL. None reads them on every call."""
+
+    resource_spill_threshold: Optional[int] = 1024 * 1024
+    """Size in bytes above which a content part of a resource is written to a temporary file instead of kept in memory. None keeps every part in memory."""
+
+    resource_spill_dir: Optional[str] = None
+    """Directory of the temporary files of spilled resources. Defaults to the system temporary directory."""
+
+    resource_preview_chars: int = 2000
+    """Characters of a spilled text resource shown to the model after its reference."""
+
+    _lifecycle_lock: Optional[asyncio.Lock] = None
+
+    # Exposed tool name (`<server>_<tool>`) -> (connection, tool), rebuilt when tools are discovered
+    _tool_index: Dict[str, tuple] = PrivateAttr(default_factory=dict)
+
+    # Tool name -> (connection, tool) of the first server offering it
+    _bare_tool_index: Dict[str, tuple] = PrivateAttr(default_factory=dict)
+
+    # Server name -> connection
+    _server_index: Dict[str, MCPClientConnection] = PrivateAttr(default_factory=dict)
+
+    # Resource URI -> parts read by `extract_resource`, kept until `release_resources`
+    _resource_parts: Dict[str, List[MCPResourcePart]] = PrivateAttr(default_factory=dict)
     
     async def add_mcp_client(self, config: MCPClientConfig, prompt_name:str=None,arguments:dict={}) -> MCPClientConnection:
         """
@@ -134,149 +918,221 @@ class MCPAgent(Agent):
         """
         connection = MCPClientConnection(config=config)
         self.mcp_clients.append(connection)
+        self._rebuild_tool_index()
         
       
         if self.auto_discover_capabilities:
             await self._connect_client(connection)
+        elif self.supervisor is not None and self.session_pool is None:
+            # Warm the server up for the first connection
+            self.supervisor.register(config)
             
         return connection
     
-    async def _connect_client(self, connection: MCPClientConnection) -> bool:
+    async def _connect_client(self, connection: MCPClientConnection, timeout: Optional[float] = None) -> bool:
         """
         Establish connection to an MCP server.
         
         Args:
             connection: The client connection to establish
+            timeout: Maximum time in seconds for the handshake and for the discovery. Defaults to the
+                timeout of the connection configuration.
             
         Returns:
             bool: True if connection successful, False otherwise
         """
+        config = connection.config
+        timeout = timeout or config.timeout
+        if connection._runner is not None:
+            await self._disconnect_client(connection)
+        started_at = time.perf_counter()
         try:
-            config = connection.config
-            
-            if config.connection_type == "stdio":
-                if not config.command:
-                    raise ValueError(f"Command required for stdio connection: {config.name}")
-                    
-                server_params = StdioServerParameters(
-                    command=config.command,
-                    args=config.args or [],
-                    env=config.env,
-                    cwd=config.cwd
-                )
-                
-                # Keep the context manager alive by storing it
-                connection._stdio_streams = stdio_client(server_params)
-                streams = await connection._stdio_streams.__aenter__()
-                read_stream, write_stream = streams
-                
-                # Create and store session
-                connection.session = ClientSession(read_stream, write_stream)
-                await connection.session.__aenter__()
-                connection.is_connected = True
-                
-                # Initialize the session
-                init_result = await connection.session.initialize()
-                logger.info(f"Connected to MCP server '{config.name}': {init_result}")
-                
-                # Discover capabilities
-                if self.auto_discover_capabilities:
-                    await self._discover_capabilities(connection)
-                    
-                return True
-                        
-            elif config.connection_type == "sse":
-                if not config.url:
-                    raise ValueError(f"URL required for SSE connection: {config.name}")
-                    
-                connection._sse_streams = sse_client(
-                    url=config.url,
-                    headers=config.headers,
-                    timeout=config.timeout or 30.0
-                )
-                streams = await connection._sse_streams.__aenter__()
-                read_stream, write_stream = streams
-                
-                connection.session = ClientSession(read_stream, write_stream)
-                await connection.session.__aenter__()
-                connection.is_connected = True
-                
-                # Initialize the session
-                init_result = await connection.session.initialize()
-                logger.info(f"Connected to MCP server '{config.name}': {init_result}")
-                
-                # Discover capabilities
-                if self.auto_discover_capabilities:
-                    await self._discover_capabilities(connection)
-                    
-                return True
-            
-            elif config.connection_type == "http":
-                if not config.url:
-                    raise ValueError(f"URL required for HTTP connection: {config.name}")
-                
-                timeout= config.timeout
-                if config.timeout and type(config.timeout) is not timedelta:
-                    timeout = timedelta(seconds=config.timeout)
-                    
-                connection._http_streams = streamablehttp_client(
-                    url=config.url,
-                    headers=config.headers, 
-                    auth=config.auth, 
-                    timeout=timeout or timedelta(seconds=30)  # Default to 30 seconds if not specified
-                )
-                streams = await connection._http_streams.__aenter__()
-                read_stream, write_stream, _ = streams  
-                
-                connection.session = ClientSession(read_stream, write_stream)
-                await connection.session.__aenter__()
-                connection.is_connected = True              
-                
-                # Initialize the session
-                init_result = await connection.session.initialize()
-                logger.info(f"Connected to MCP server '{config.name}': {init_result}")
-                
-                # Discover capabilities
-                if self.auto_discover_capabilities:
-                    await self._discover_capabilities(connection)
-                    
-                return True
+            message_handler = self._message_handler_for(connection)
+            if self.session_pool is not None:
+                runner = await self.session_pool.acquire(config, timeout, message_handler)
+                connection.session = runner.session
+            elif self.supervisor is not None:
+                runner = await self.supervisor.acquire(config, timeout)
+                runner.message_handler = message_handler
+                connection.session = runner.session
             else:
-                raise ValueError(f"Unsupported connection type: {config.connection_type}")
-                
+                runner = MCPSessionRunner(config, message_handler)
+                connection.session = await runner.start(timeout)
+            connection._runner = runner
+            connection.is_connected = True
+            # Subscriptions do not survive the session: forget them and what they kept fresh
+            connection._subscriptions = None
+            if self.read_cache is not None:
+                self.read_cache.invalidate(config.name)
+            connection.last_error = None
+            connection.last_activity = time.monotonic()
+            connection.connect_time = time.perf_counter() - started_at
+            logger.info(f"Connected to MCP server '{config.name}' in {connection.connect_time:.3f}s: {runner.init_result}")
         except Exception as e:
-            logger.error(f"Failed to connect to MCP server '{config.name}': {e}")
             connection.is_connected = False
+            connection.connect_time = time.perf_counter() - started_at
+            connection.last_error = str(e) or type(e).__name__
+            connection._next_attempt_at = time.monotonic() + self.reconnect_delay
+            logger.error(f"Failed to connect to MCP server '{config.name}': {connection.last_error}")
+            return False
+
+        # Discover capabilities, or serve them from the cache and refresh them in the background
+        if self.auto_discover_capabilities:
+            started_at = time.perf_counter()
+            connection.capabilities_from_cache = self._load_cached_capabilities(connection)
+            if connection.capabilities_from_cache:
+                connection._refresh_task = asyncio.create_task(self._refresh_capabilities(connection))
+            else:
+                try:
+                    if await asyncio.wait_for(self._discover_capabilities(connection), timeout):
+                        self._store_capabilities(connection)
+                except asyncio.TimeoutError:
+                    logger.error(f"Capability discovery of '{config.name}' timed out after {timeout}s")
+            connection.discovery_time = time.perf_counter() - started_at
+        self._rebuild_tool_index()
+        return True
+
+    def _capability_cache_key(self, connection: MCPClientConnection) -> Optional[str]:
+        if self.capability_cache is None or connection._runner is None:
+            return None
+        return self.capability_cache.make_key(connection.config, connection._runner.init_result)
+
+    def _load_cached_capabilities(self, connection: MCPClientConnection) -> bool:
+        """Fills the capabilities of a connection from the capability cache. Returns True on a hit."""
+        key = self._capability_cache_key(connection)
+        cached = self.capability_cache.get(key) if key is not None else None
+        if cached is None:
             return False
+        connection.available_tools = cached["tools"]
+        connection.available_resources = cached["resources"]
+        connection.available_prompts = cached["prompts"]
+        logger.debug(f"Serving the capabilities of '{connection.config.name}' from the cache")
+        return True
+
+    def _store_capabilities(self, connection: MCPClientConnection) -> None:
+        """Records the capabilities of a connection in the capability cache."""
+        key = self._capability_cache_key(connection)
+        if key is not None:
+            self.capability_cache.put(
+                key, connection.config.name, connection.available_tools,
+                connection.available_resources, connection.available_prompts,
+            )
+
+    def _rebuild_tool_index(self) -> None:
+        """Rebuilds the lookup tables used to dispatch tool calls from the connected servers."""
+        tools, bare_tools = {}, {}
+        for connection in self.mcp_clients:
+            if not connection.is_connected:
+                continue
+            for tool in connection.available_tools:
+                tools.setdefault(f"{connection.config.name}_{tool.name}", (connection, tool))
+                bare_tools.setdefault(tool.name, (connection, tool))
+        self._tool_index = tools
+        self._bare_tool_index = bare_tools
+        self._server_index = {}
+        for connection in self.mcp_clients:
+            self._server_index.setdefault(connection.config.name, connection)
+
+    def get_tools_json(self) -> List[dict]:
+        """
+        Returns the tools of every connected server in the function-calling format. The schemas are
+        cached per connection and must not be modified.
+        """
+        tools = []
+        for connection in self.mcp_clients:
+            if connection.is_connected:
+                tools.extend(connection.get_tool_schemas())
+        return tools
+
+    def resolve_tool(self, name: str) -> Optional[tuple]:
+        """
+        Finds the server and the tool behind a tool name.
+
+        Args:
+            name: The name exposed to the model (`<server>_<tool>`) or the name of the tool on its server
+
+        Returns:
+            The `(connection, tool)` pair, or None if no connected server offers the tool
+        """
+        return self._tool_index.get(name) or self._bare_tool_index.get(name)
+
+    def _message_handler_for(self, connection: MCPClientConnection):
+        """Creates the handler of the notifications a server sends on a connection."""
+        changes = {
+            ToolListChangedNotification: "tools",
+            ResourceListChangedNotification: "resources",
+            PromptListChangedNotification: "prompts",
+        }
+
+        async def handle(message: Any) -> None:
+            if not isinstance(message, ServerNotification):
+                return
+            notification = message.root
+            if isinstance(notification, ResourceUpdatedNotification):
+                if self.read_cache is not None:
+                    self.read_cache.invalidate(connection.config.name, "resource", notification.params.uri)
+            elif type(notification) in changes:
+                kind = changes[type(notification)]
+                if self.read_cache is not None and kind != "tools":
+                    self.read_cache.invalidate(connection.config.name, kind[:-1])
+                # Requests cannot be awaited from the session's receive loop
+                connection._refresh_task = asyncio.create_task(self._refresh_capabilities(connection, [kind]))
+        return handle
+
+    async def _refresh_capabilities(self, connection: MCPClientConnection, kinds: Optional[List[str]] = None) -> None:
+        """
+        Lists capabilities of a server again, after it announced a change or after they were served
+        from the cache, and updates the tool index and the capability cache.
+        """
+        try:
+            if await self._discover_capabilities(connection, kinds):
+                self._store_capabilities(connection)
+            connection.capabilities_from_cache = False
+            self._rebuild_tool_index()
+            logger.debug(f"Refreshed the {', '.join(kinds or ['capabilities'])} of '{connection.config.name}'")
+        except Exception as e:
+            logger.error(f"Failed to refresh the capabilities of '{connection.config.name}': {e}")
     
-    async def _discover_capabilities(self, connection: MCPClientConnection) -> None:
+    async def _discover_capabilities(self, connection: MCPClientConnection, kinds: Optional[List[str]] = None) -> bool:
         """
         Discover available tools, resources, and prompts from an MCP server.
+
+        The three lists are requested concurrently, and lists the server did not announce in its
+        capabilities are skipped.
         
         Args:
             connection: The client connection to query
+            kinds: The lists to request among "tools", "resources" and "prompts". Defaults to all of them.
+
+        Returns:
+            bool: True if every requested list was received
         """
         if not connection.session or not connection.is_connected:
-            return
-            
-        try:
-            # List available tools
-            tools_response = await connection.session.list_tools()
-            connection.available_tools = tools_response.tools
-            logger.debug(f"Discovered {len(connection.available_tools)} tools from '{connection.config.name}'")
-            
-            # List available resources
-            resources_response = await connection.session.list_resources()
-            connection.available_resources = resources_response.resources
-            logger.debug(f"Discovered {len(connection.available_resources)} resources from '{connection.config.name}'")
-            
-            # List available prompts
-            prompts_response = await connection.session.list_prompts()
-            connection.available_prompts = prompts_response.prompts
-            logger.debug(f"Discovered {len(connection.available_prompts)} prompts from '{connection.config.name}'")
-            
-        except Exception as e:
-            logger.error(f"Failed to discover capabilities from '{connection.config.name}': {e}")
+            return False
+
+        capabilities = None
+        if connection._runner is not None and connection._runner.init_result is not None:
+            capabilities = connection._runner.init_result.capabilities
+        session = connection.session
+        requests = {
+            "tools": (session.list_tools, getattr(capabilities, "tools", True)),
+            "resources": (session.list_resources, getattr(capabilities, "resources", True)),
+            "prompts": (session.list_prompts, getattr(capabilities, "prompts", True)),
+        }
+        kinds = [
+            kind for kind, (_, supported) in requests.items()
+            if supported is not None and (kinds is None or kind in kinds)
+        ]
+        results = await asyncio.gather(*(requests[kind][0]() for kind in kinds), return_exceptions=True)
+        complete = True
+        for kind, result in zip(kinds, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to discover {kind} from '{connection.config.name}': {result}")
+                complete = False
+                continue
+            setattr(connection, f"available_{kind}", getattr(result, kind))
+            logger.debug(f"Discovered {len(getattr(result, kind))} {kind} from '{connection.config.name}'")
+        return complete
     
     @staticmethod
     def extract_tool_result_content(result_content) -> str:
@@ -327,91 +1183,235 @@ class MCPAgent(Agent):
             
         Raises:
             ValueError: If tool not found or server not connected
+            TimeoutError: If the call did not complete within the deadline of the tool or server
         """
-        target_connection = None
-        
         if server_name:
             # Look for specific server
-            target_connection = next(
-                (conn for conn in self.mcp_clients if conn.config.name == server_name),
-                None
-            )
+            if server_name not in self._server_index:
+                self._rebuild_tool_index()
+            target_connection = self._server_index.get(server_name)
             if not target_connection:
                 raise ValueError(f"MCP server '{server_name}' not found")
         else:
-            # Search all connected servers for the tool
-            for connection in self.mcp_clients:
-                if connection.is_connected:
-                    tool_exists = any(tool.name == tool_name for tool in connection.available_tools)
-                    if tool_exists:
-                        target_connection = connection
-                        break
+            # Look the tool up among the connected servers
+            target_connection, _ = self._bare_tool_index.get(tool_name, (None, None))
         
         if not target_connection or not target_connection.is_connected:
             raise ValueError(f"Tool '{tool_name}' not found in any connected MCP server")
         
-        # Add connection health check
-        if not target_connection.session:
-            logger.warning(f"Session is None for server '{target_connection.config.name}', attempting to reconnect")
-            success = await self._connect_client(target_connection)
-            if not success:
-                raise ValueError(f"Failed to reconnect to MCP server '{target_connection.config.name}'")
-        
+        config = target_connection.config
+        deadline = config.tool_timeouts.get(tool_name, config.call_timeout)
+        limiter = target_connection.call_limiter
         try:
-            # Check if session is still valid before calling
-            if hasattr(target_connection.session, '_closed') and target_connection.session._closed:
-                logger.warning(f"Session is closed for server '{target_connection.config.name}', attempting to reconnect")
-                success = await self._connect_client(target_connection)
-                if not success:
-                    raise ValueError(f"Failed to reconnect to MCP server '{target_connection.config.name}'")
-            
-            result = await target_connection.session.call_tool(name=tool_name, arguments=arguments)
-            return result.content
-        except Exception as e:
-            logger.error(f"Failed to call tool '{tool_name}': {e}")
-            # Mark connection as closed and attempt to reconnect      
-            raise e
+            return await asyncio.wait_for(self._call_tool(target_connection, limiter, tool_name, arguments), deadline)
+        except asyncio.TimeoutError:
+            limiter.timeouts += 1
+            raise TimeoutError(
+                f"MCP tool '{tool_name}' on server '{config.name}' did not complete within {deadline} seconds"
+            ) from None
+
+    async def _call_tool(self, target_connection: MCPClientConnection, limiter: MCPCallLimiter,
+                         tool_name: str, arguments: Dict[str, Any]) -> Any:
+        async with limiter.slot():
+            # Reconnect if the session died since the last call
+            if not await self._check_connection(target_connection, ping=False):
+                raise ValueError(f"Failed to reconnect to MCP server '{target_connection.config.name}'")
 
-    async def extract_resource(self,target_connection: MCPClientConnection, resource_uri: str):
+            try:
+                async with target_connection.request_slot():
+                    result = await target_connection.session.call_tool(name=tool_name, arguments=arguments)
+            except Exception as e:
+                if target_connection.is_alive:
+                    logger.error(f"Failed to call tool '{tool_name}': {e}")
+                    raise
+                # The transport failed: reconnect for the next calls. The server may already have run
+                # this one, so it is only sent again when running it twice is harmless.
+                logger.warning(f"Connection to '{target_connection.config.name}' lost while calling '{tool_name}', reconnecting")
+                if not await self._check_connection(target_connection, ping=False):
+                    raise
+                if not self._is_idempotent_tool(target_connection, tool_name):
+                    raise
+                async with target_connection.request_slot():
+                    result = await target_connection.session.call_tool(name=tool_name, arguments=arguments)
+        target_connection.last_activity = time.monotonic()
+        return result.content
+
+    @staticmethod
+    def _is_idempotent_tool(connection: MCPClientConnection, tool_name: str) -> bool:
+        """
+        Whether a tool can be called again after a call whose outcome is unknown: tools with a
+        cache policy in the server configuration, and tools the server annotates as read-only or
+        idempotent.
+        """
+        if tool_name in connection.config.cache_policies:
+            return True
+        tool = next((tool for tool in connection.available_tools if tool.name == tool_name), None)
+        annotations = getattr(tool, "annotations", None)
+        return bool(annotations and (annotations.readOnlyHint or annotations.idempotentHint))
+
+    async def read_mcp_resource(self, resource_uri: str, server_name: Optional[str] = None,
+                                target_connection: Optional[MCPClientConnection] = None) -> List[MCPResourcePart]:
+        """
+        Reads every content part of a resource. Parts larger than `resource_spill_threshold` are
+        written to temporary files and read back through memory maps.
+
+        Args:
+            resource_uri: URI of the resource
+            server_name: Optional server name to target. If None, searches all servers.
+            target_connection: Optional connection to read from, instead of looking the resource up
+
+        Returns:
+            List[MCPResourcePart]: The parts of the resource. The caller owns them and closes them
+            to delete their temporary files.
+
+        Raises:
+            ValueError: If resource not found or server not connected
+        """
+        if target_connection is None:
+            target_connection = self._find_resource_connection(resource_uri, server_name)
+        async with target_connection.request_slot():
             result = await target_connection.session.read_resource(resource_uri)
+        target_connection.last_activity = time.monotonic()
+        return resource_parts(result, self.resource_spill_threshold, self.resource_spill_dir)
 
-            # Handle different MIME types
-            content = result.contents[0]
-            mime_type = content.mimeType or "text/plain"  # Default to text/plain if None
-            
-            if mime_type.startswith("text/"):
-                # Handle all text-based content
-                resource_content = content.text
-            elif mime_type == "application/json":
-                # Handle JSON content
-                resource_content = content.model_config if hasattr(content, 'model_config') else content.text
-                
-                self.temperature = resource_content.get("temperature")
-                self.max_tokens = resource_content.get("max_tokens")
-                self.top_p = resource_content.get("top_p")
-                self.frequency_penalty = resource_content.get("frequency_penalty")
-                self.presence_penalty = resource_content.get("presence_penalty")
-
-            elif mime_type.startswith("image/"):
-                # Handle image content - might be base64 encoded
-                resource_content = f"[Image content of type: {mime_type}]"
-                if hasattr(content, 'blob'):
-                    resource_content += " (Base64 encoded)"
-            elif mime_type.startswith("audio/"):
-                # Handle audio content
-                resource_content = f"[Audio content of type: {mime_type}]"
-            elif mime_type.startswith("video/"):
-                # Handle video content
-                resource_content = f"[Video content of type: {mime_type}]"
-            elif mime_type == "application/octet-stream":
-                # Handle binary content
-                resource_content = f"[Binary content: {len(content.blob) if hasattr(content, 'blob') else 'unknown'} bytes]"
-            else:
-                # Handle unknown types
-                resource_content = f"[Content of unknown type: {mime_type}]"
+    async def stream_mcp_resource(self, resource_uri: str, server_name: Optional[str] = None,
+                                  chunk_size: int = 64 * 1024) -> AsyncGenerator[Union[str, bytes], None]:
+        """
+        Yields the content of a resource in chunks: text for text parts, bytes for binary parts.
+        The temporary files are deleted once the resource has been consumed.
 
+        Args:
+            resource_uri: URI of the resource
+            server_name: Optional server name to target. If None, searches all servers.
+            chunk_size: Approximate size of the chunks, in characters for text and bytes for binary parts
+        """
+        parts = await self.read_mcp_resource(resource_uri, server_name)
+        try:
+            for part in parts:
+                chunks = part.iter_text(chunk_size) if part.is_text else part.iter_bytes(chunk_size)
+                for chunk in chunks:
+                    yield chunk
+        finally:
+            for part in parts:
+                part.close()
+
+    def _find_resource_connection(self, resource_uri: str, server_name: Optional[str] = None) -> MCPClientConnection:
+        if server_name:
+            if server_name not in self._server_index:
+                self._rebuild_tool_index()
+            target_connection = self._server_index.get(server_name)
+            if not target_connection:
+                raise ValueError(f"MCP server '{server_name}' not found")
+        else:
+            target_connection = next((
+                connection for connection in self.mcp_clients
+                if connection.is_connected and any(str(resource.uri) == str(resource_uri) for resource in connection.available_resources)
+            ), None)
+        if not target_connection or not target_connection.is_connected:
+            raise ValueError(f"Resource '{resource_uri}' not found in any connected MCP server")
+        return target_connection
+
+    def _resource_part_content(self, part: MCPResourcePart) -> Any:
+        """Returns what the model is given for a resource part: its text, its settings, or a reference."""
+        mime_type = part.mime_type or "text/plain"  # Default to text/plain if None
+        if part.spilled:
+            return part.reference(self.resource_preview_chars)
+
+        if part.is_text and mime_type == "application/json":
+            # JSON resources carry generation settings for the agent
+            try:
+                resource_content = json.loads(part.text)
+            except ValueError:
+                return part.text
+            if isinstance(resource_content, dict):
+                for setting in ("temperature", "max_tokens", "top_p", "frequency_penalty", "presence_penalty"):
+                    if setting in resource_content:
+                        setattr(self, setting, resource_content[setting])
             return resource_content
-        
+        if part.is_text:
+            return part.text
+
+        if mime_type.startswith("image/"):
+            return f"[Image content of type: {mime_type}] (Base64 encoded)"
+        if mime_type.startswith("audio/"):
+            return f"[Audio content of type: {mime_type}]"
+        if mime_type.startswith("video/"):
+            return f"[Video content of type: {mime_type}]"
+        if mime_type == "application/octet-stream":
+            return f"[Binary content: {part.size} bytes]"
+        return f"[Content of unknown type: {mime_type}]"
+
+    async def extract_resource(self, target_connection: MCPClientConnection, resource_uri: str):
+        """
+        Reads a resource and returns what the model is given for it. Small text parts are
+        returned inline; parts spilled to temporary files are returned as a reference followed by
+        the beginning of their text, and the files are kept until `release_resources`.
+
+        With a `read_cache`, the content is served from the cache while it is valid. The agent
+        subscribes to the resource first if the server supports subscriptions, so the entry is
+        dropped when the server reports the resource updated. Resources with spilled parts are not
+        cached, since their files are deleted when the resource is read again or released.
+
+        Returns:
+            The content of a single-part resource, or the contents of the parts joined by blank lines
+        """
+        cache_key, subscribed = None, False
+        if self.read_cache is not None:
+            cache_key = MCPReadCache.resource_key(target_connection.config.name, resource_uri)
+            found, content = self.read_cache.get(cache_key)
+            if found:
+                return content
+            subscribed = await self._subscribe_resource(target_connection, resource_uri)
+
+        parts = await self.read_mcp_resource(resource_uri, target_connection=target_connection)
+        for previous in self._resource_parts.pop(str(resource_uri), []):
+            previous.close()
+        self._resource_parts[str(resource_uri)] = parts
+
+        contents = [self._resource_part_content(part) for part in parts]
+        if len(contents) == 1:
+            content = contents[0]
+        else:
+            content = "\n\n".join(content if isinstance(content, str) else json.dumps(content) for content in contents)
+        if cache_key is not None and not any(part.spilled for part in parts):
+            self.read_cache.put(cache_key, content, subscribed=subscribed)
+        return content
+
+    async def _subscribe_resource(self, connection: MCPClientConnection, resource_uri: str) -> bool:
+        """
+        Subscribes to the updates of a resource if the server supports it.
+
+        Returns:
+            bool: Whether the server will notify the updates of the resource.
+        """
+        init_result = connection._runner.init_result if connection._runner is not None else None
+        resources = getattr(getattr(init_result, "capabilities", None), "resources", None)
+        if not getattr(resources, "subscribe", False):
+            return False
+        if connection._subscriptions is None:
+            connection._subscriptions = set()
+        if str(resource_uri) in connection._subscriptions:
+            return True
+        try:
+            async with connection.request_slot():
+                await connection.session.subscribe_resource(AnyUrl(str(resource_uri)))
+        except Exception as e:
+            logger.warning(f"Could not subscribe to '{resource_uri}' on '{connection.config.name}': {e}")
+            return False
+        connection._subscriptions.add(str(resource_uri))
+        return True
+
+    def get_resource_parts(self, resource_uri: str) -> List[MCPResourcePart]:
+        """Returns the parts of a resource read by `get_mcp_resource` or `get_all_mcp_resources`."""
+        return list(self._resource_parts.get(str(resource_uri), []))
+
+    def release_resources(self) -> None:
+        """Deletes the temporary files of the resources read by the agent."""
+        for parts in self._resource_parts.values():
+            for part in parts:
+                part.close()
+        self._resource_parts.clear()
+
     async def get_all_mcp_resources(self, server_name: Optional[str] = None):
         """
         Retrieves all the available resources of an MCP server.
@@ -433,6 +1433,7 @@ class MCPAgent(Agent):
             )
             if not target_connection:
                 raise ValueError(f"MCP server '{server_name}' not found")
+            resource_uris = [resource.uri for resource in target_connection.available_resources]
         else:
             # Search all connected servers for the resource
             for connection in self.mcp_clients:
@@ -492,11 +1493,11 @@ class MCPAgent(Agent):
                 if connection.is_connected:
 
                     if search_by == "name":
-                        resource_exists = any(resource.name == resource_str for resource in connection.available_resources)
-                        resource_uri = next(resource.uri for resource in connection.available_resources if resource.name == resource_str)
+                        resource_uri = next((resource.uri for resource in connection.available_resources if resource.name == resource_str), None)
+                        resource_exists = resource_uri is not None
                         
                     if search_by == "uri":
-                        resource_exists = any(resource.uri == resource_str for resource in connection.available_resources)
+                        resource_exists = any(str(resource.uri) == str(resource_str) for resource in connection.available_resources)
                         resource_uri = resource_str
                         
                     if resource_exists:
@@ -520,7 +1521,8 @@ class MCPAgent(Agent):
     
     async def get_mcp_prompt(self, prompt_name: str, arguments: Optional[Dict[str, Any]] = None, server_name: Optional[str] = None) -> Any:
         """
-        Get a prompt from an MCP server.
+        Get a prompt from an MCP server. With a `read_cache`, the rendered prompt is served from
+        the cache while it is valid.
         
         Args:
             prompt_name: Name of the prompt to retrieve
@@ -557,10 +1559,19 @@ class MCPAgent(Agent):
             raise ValueError(f"Prompt '{prompt_name}' not found in any connected MCP server")
         
         try:
-            result = await target_connection.session.get_prompt(
-                name=prompt_name,
-                arguments=arguments or {}
-            )
+            cache_key = None
+            found = False
+            if self.read_cache is not None:
+                cache_key = MCPReadCache.prompt_key(target_connection.config.name, prompt_name, arguments)
+                found, result = self.read_cache.get(cache_key)
+            if not found:
+                async with target_connection.request_slot():
+                    result = await target_connection.session.get_prompt(
+                        name=prompt_name,
+                        arguments=arguments or {}
+                    )
+                if cache_key is not None:
+                    self.read_cache.put(cache_key, result)
             
             text = json.loads(result.messages[0].content.text)
             self.instructions = text["description"]
@@ -623,51 +1634,103 @@ class MCPAgent(Agent):
                 
         return prompts
     
-    async def connect_all_clients(self) -> Dict[str, bool]:
+    async def connect_all_clients(self, timeout: Optional[float] = None) -> Dict[str, bool]:
         """
         Connect to all configured MCP servers.
+
+        Servers are connected and discovered concurrently, so the startup cost is that of the
+        slowest server. The time taken by each server is reported by `get_connection_status`.
+
+        Args:
+            timeout: Maximum time in seconds per server. Defaults to the timeout of each configuration.
         
         Returns:
             Dict mapping server names to connection success status
         """
-        results = {}
-        for connection in self.mcp_clients:
-            if not connection.is_connected:
-                success = await self._connect_client(connection)
-                results[connection.config.name] = success
-            else:
-                results[connection.config.name] = True
+        pending = [connection for connection in self.mcp_clients if not connection.is_connected]
+        outcomes = await asyncio.gather(*(self._connect_client(connection, timeout) for connection in pending))
+        results = {connection.config.name: True for connection in self.mcp_clients if connection.is_connected}
+        results.update({connection.config.name: success for connection, success in zip(pending, outcomes)})
         return results
     
+    async def _check_connection(self, connection: MCPClientConnection, ping: bool = True) -> bool:
+        """
+        Makes sure a connection is usable, reconnecting only when it failed.
+
+        A live connection idle for longer than `health_check_interval` is pinged first. Connections
+        whose session died or whose ping failed are re-established, at most once every
+        `reconnect_delay` seconds.
+
+        Args:
+            connection: The connection to check
+            ping: Whether idle connections are pinged
+
+        Returns:
+            bool: True if the connection is usable
+        """
+        if connection.is_alive:
+            idle = time.monotonic() - (connection.last_activity or 0.0)
+            if not ping or self.health_check_interval is None or idle < self.health_check_interval:
+                return True
+            try:
+                await asyncio.wait_for(connection.session.send_ping(), self.ping_timeout)
+                connection.last_activity = time.monotonic()
+                return True
+            except Exception as e:
+                logger.warning(f"Ping to MCP server '{connection.config.name}' failed: {e or type(e).__name__}")
+        if time.monotonic() < connection._next_attempt_at:
+            return False
+        was_connected = connection.is_connected or connection._runner is not None
+        connected = await self._connect_client(connection)
+        if connected and was_connected:
+            connection.reconnect_count += 1
+        return connected
+
+    async def ensure_connected(self) -> Dict[str, bool]:
+        """
+        Connects the servers that are not connected yet and checks the health of the others.
+
+        This is cheap when every connection is alive and was used recently: no request is sent
+        to the servers. Otherwise idle connections are pinged and failed ones re-established,
+        concurrently.
+
+        Returns:
+            Dict mapping server names to whether the server is usable
+        """
+        now = time.monotonic()
+        interval = self.health_check_interval
+        stale = [
+            connection for connection in self.mcp_clients
+            if not connection.is_alive
+            or (interval is not None and now - (connection.last_activity or 0.0) >= interval)
+        ]
+        if stale:
+            if self._lifecycle_lock is None:
+                self._lifecycle_lock = asyncio.Lock()
+            async with self._lifecycle_lock:
+                await asyncio.gather(*(self._check_connection(connection) for connection in stale))
+        return {connection.config.name: connection.is_alive for connection in self.mcp_clients}
+
+    async def _disconnect_client(self, connection: MCPClientConnection) -> None:
+        """Closes the session and the transport of a connection."""
+        try:
+            if connection._runner is not None:
+                await connection._runner.close()
+            logger.info(f"Disconnected from MCP server '{connection.config.name}'")
+        except Exception as e:
+            logger.error(f"Error disconnecting from '{connection.config.name}': {e}")
+        finally:
+            connection._runner = None
+            connection.session = None
+            connection.is_connected = False
+            self._rebuild_tool_index()
+
     async def disconnect_all_clients(self) -> None:
-        """Disconnect from all MCP servers."""
-        for connection in self.mcp_clients:
-            if connection.is_connected:
-                try:
-                    # Close the session first
-                    if connection.session:
-                        await connection.session.__aexit__(None, None, None)
-                        connection.session = None
-                    
-                    # Close the stream context managers
-                    if connection._stdio_streams:
-                        await connection._stdio_streams.__aexit__(None, None, None)
-                        connection._stdio_streams = None
-                    
-                    if connection._sse_streams:
-                        await connection._sse_streams.__aexit__(None, None, None)
-                        connection._sse_streams = None
-                        
-                    if connection._http_streams:
-                        await connection._http_streams.__aexit__(None, None, None)
-                        connection._http_streams = None
-                    
-                    connection.is_connected = False
-                    logger.info(f"Disconnected from MCP server '{connection.config.name}'")
-                    
-                except Exception as e:
-                    logger.error(f"Error disconnecting from '{connection.config.name}': {e}")
-                    connection.is_connected = False
+        """Disconnect from all MCP servers and delete the temporary files of the resources read."""
+        await asyncio.gather(*(
+            self._disconnect_client(connection) for connection in self.mcp_clients if connection.is_connected
+        ))
+        self.release_resources()
     
     def get_connection_status(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -683,7 +1746,12 @@ class MCPAgent(Agent):
                 "connection_type": connection.config.connection_type,
                 "tools_count": len(connection.available_tools),
                 "resources_count": len(connection.available_resources),
-                "prompts_count": len(connection.available_prompts)
+                "prompts_count": len(connection.available_prompts),
+                "connect_time": connection.connect_time,
+                "discovery_time": connection.discovery_time,
+                "last_error": connection.last_error,
+                "reconnect_count": connection.reconnect_count,
+                "calls": connection.call_limiter.get_stats(),
             }
         return status
 
@@ -0,0 +1,163 @@
+"""
+This module provides a persistent cache of the capabilities discovered from MCP servers.
+
+Capabilities rarely change between deployments of a server, yet every connection lists its tools, resources and
+prompts before the agent can use them. `MCPCapabilityCache` stores the discovered lists in a local JSON file,
+keyed by the connection settings and by the name and version the server reports during the handshake. An
+`MCPAgent` with a cache serves the stored lists as soon as the handshake completes and refreshes them in the
+background.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from mcp.types import InitializeResult, Prompt, Resource, Tool
+
+logger = logging.getLogger(__name__)
+
+_KINDS = {"tools": Tool, "resources": Resource, "prompts": Prompt}
+
+
+def _default_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "monkai_agent" / "mcp_capabilities.json"
+
+
+class MCPCapabilityCache:
+    """
+    Stores the tools, resources and prompts of MCP servers in a JSON file.
+
+    Entries are keyed by a hash of the connection settings (transport, command, arguments,
+    environment, URL and headers) and by the server name and version from the handshake, so
+    deploying a new server version never serves stale capabilities. Secrets in the settings are
+    only stored hashed.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, max_age: Optional[float] = None):
+        """
+        Args:
+            path: The cache file. Defaults to `mcp_capabilities.json` in the user cache directory.
+            max_age: Seconds after which an entry is no longer served. None serves entries of any age.
+        """
+        self.path = Path(path) if path is not None else _default_path()
+        self.max_age = max_age
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    @staticmethod
+    def make_key(config: Any, init_result: Optional[InitializeResult]) -> str:
+        """
+        Builds the key of a server from its connection configuration and its handshake result.
+        """
+        settings = json.dumps([
+            config.connection_type,
+            config.command,
+            list(config.args or []),
+            sorted((config.env or {}).items()),
+            str(config.cwd) if config.cwd else None,
+            config.url,
+            config.headers or {},
+        ], sort_keys=True, default=str)
+        server_info = getattr(init_result, "serverInfo", None)
+        version = f"{getattr(server_info, 'name', '')}@{getattr(server_info, 'version', '')}"
+        return hashlib.sha256(f"{settings}|{version}".encode("utf-8")).hexdigest()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, encoding="utf-8") as file:
+                    self._entries = json.load(file).get("entries", {})
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable MCP capability cache '{self.path}': {e}")
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                json.dump({"version": 1, "entries": self._entries}, file)
+            os.replace(temporary, self.path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def get(self, key: str) -> Optional[Dict[str, list]]:
+        """
+        Returns the capabilities stored for a server.
+
+        Returns:
+            dict: The `tools`, `resources` and `prompts` lists, or None if the server is not cached.
+        """
+        entry = self._load().get(key)
+        if entry is not None and self.max_age is not None and time.time() - entry.get("updated_at", 0) > self.max_age:
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        try:
+            capabilities = {
+                kind: [model.model_validate(item) for item in entry.get(kind, [])] for kind, model in _KINDS.items()
+            }
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid MCP capability cache entry: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return capabilities
+
+    def put(self, key: str, server_name: str, tools: list, resources: list, prompts: list) -> bool:
+        """
+        Stores the capabilities of a server.
+
+        Returns:
+            bool: True if the stored capabilities changed.
+        """
+        entries = self._load()
+        serialized = {
+            kind: [item.model_dump(mode="json", exclude_none=True) for item in items]
+            for kind, items in (("tools", tools), ("resources", resources), ("prompts", prompts))
+        }
+        previous = entries.get(key)
+        changed = previous is None or any(previous.get(kind) != serialized[kind] for kind in _KINDS)
+        entries[key] = {"server": server_name, "updated_at": time.time(), **serialized}
+        if changed:
+            self.updates += 1
+        try:
+            self._save()
+        except OSError as e:
+            logger.warning(f"Could not write the MCP capability cache '{self.path}': {e}")
+        return changed
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Removes the entry of a server, or every entry."""
+        entries = self._load()
+        if key is None:
+            entries.clear()
+        else:
+            entries.pop(key, None)
+        try:
+            self._save()
+        except OSError as e:
+            logger.warning(f"Could not write the MCP capability cache '{self.path}': {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the number of cached servers and the hit, miss and update counters."""
+        return {
+            "entries": len(self._load()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "updates": self.updates,
+        }
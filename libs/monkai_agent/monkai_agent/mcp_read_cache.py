@@ -0,0 +1,106 @@
+"""
+This module provides a client-side cache of the resources and prompts read from MCP servers.
+
+Agents often read the same resources and render the same prompts on every run, and each read is a round trip
+to the server. `MCPReadCache` keeps what an `MCPAgent` obtained for a resource URI or for a prompt name and
+its arguments. When a server supports resource subscriptions, the agent subscribes to the resources it caches
+and drops them when the server reports them updated; other entries expire after a TTL. Entries of a server are
+also dropped when it announces that its resource or prompt list changed, and when the agent reconnects to it.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .tool_cache import canonical_arguments
+
+
+class MCPReadCache:
+    """
+    LRU cache of resource contents and rendered prompts, keyed by server name.
+    """
+
+    def __init__(self, ttl: Optional[float] = 300.0, max_entries: int = 256):
+        """
+        Args:
+            ttl: Seconds an entry stays valid when the server cannot notify its updates. None keeps
+                such entries until they are evicted or invalidated.
+            max_entries: Maximum number of entries; the least recently used are evicted first.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[Any, Optional[float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def resource_key(server_name: str, uri: Any) -> Tuple[Hashable, ...]:
+        """Builds the key of a resource."""
+        return ("resource", server_name, str(uri))
+
+    @staticmethod
+    def prompt_key(server_name: str, prompt_name: str, arguments: Optional[Dict[str, Any]]) -> Tuple[Hashable, ...]:
+        """Builds the key of a prompt rendered with the given arguments."""
+        return ("prompt", server_name, prompt_name, canonical_arguments(arguments or {}))
+
+    def get(self, key: Tuple[Hashable, ...]) -> Tuple[bool, Any]:
+        """
+        Looks up an entry.
+
+        Returns:
+            Tuple[bool, Any]: Whether the entry was found, and its value.
+        """
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def put(self, key: Tuple[Hashable, ...], value: Any, subscribed: bool = False) -> None:
+        """
+        Stores an entry.
+
+        Args:
+            key: The key from `resource_key` or `prompt_key`.
+            value: The value to store.
+            subscribed: Whether the server will notify updates of the entry, in which case it does not expire.
+        """
+        expires_at = None if subscribed or self.ttl is None else time.monotonic() + self.ttl
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, server_name: Optional[str] = None, kind: Optional[str] = None, uri: Optional[Any] = None) -> None:
+        """
+        Removes entries: those of a server, of one kind (`"resource"` or `"prompt"`), of a resource
+        URI, any combination of them, or all of them.
+        """
+        for key in list(self._entries):
+            if ((server_name is None or key[1] == server_name) and (kind is None or key[0] == kind)
+                    and (uri is None or (key[0] == "resource" and key[2] == str(uri)))):
+                del self._entries[key]
+                self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns the size of the cache and its hit, eviction and invalidation counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
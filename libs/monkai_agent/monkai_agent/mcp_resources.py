@@ -0,0 +1,189 @@
+"""
+This module provides the representation of the contents of MCP resources read by an agent.
+
+A `resources/read` answer can hold several content parts, text or base64-encoded binary blobs, of any size.
+`MCPResourcePart` keeps small parts in memory and spills large ones to temporary files, which are read back
+through memory maps, in chunks, so a large resource does not stay in the memory of the worker. Spilled parts
+are handed to the model as a reference to their file and the beginning of their text, instead of inline.
+"""
+
+import base64
+import codecs
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from mcp.types import ReadResourceResult, TextResourceContents
+
+# Base64 characters decoded per write when a blob is spilled; a multiple of 4
+_BASE64_CHUNK = 4 * 256 * 1024
+# Characters encoded per write when a text is spilled
+_TEXT_CHUNK = 1024 * 1024
+
+
+class MCPResourcePart:
+    """
+    One content part of an MCP resource, held in memory or in a temporary file.
+    """
+
+    def __init__(self, uri: str, mime_type: Optional[str], is_text: bool, data: Optional[bytes] = None,
+                 text: Optional[str] = None, path: Optional[str] = None, size: int = 0):
+        self.uri = uri
+        self.mime_type = mime_type
+        self.is_text = is_text
+        self.size = size
+        self.path = path
+        self._data = data
+        self._text = text
+        self._closed = False
+
+    @classmethod
+    def from_contents(cls, contents, spill_threshold: Optional[int] = None,
+                      spill_dir: Optional[str] = None) -> "MCPResourcePart":
+        """
+        Builds a part from a text or blob content of a `resources/read` result.
+
+        Args:
+            contents: A `TextResourceContents` or `BlobResourceContents`.
+            spill_threshold: Size in bytes (characters for texts) above which the part is written to a
+                temporary file. None keeps every part in memory.
+            spill_dir: Directory of the temporary files. Defaults to the system temporary directory.
+        """
+        uri = str(contents.uri)
+        if isinstance(contents, TextResourceContents):
+            text = contents.text
+            if spill_threshold is None or len(text) <= spill_threshold:
+                return cls(uri, contents.mimeType, True, text=text, size=len(text.encode("utf-8")))
+            with cls._spill_file(spill_dir) as (file, path):
+                size = 0
+                for start in range(0, len(text), _TEXT_CHUNK):
+                    size += file.write(text[start:start + _TEXT_CHUNK].encode("utf-8"))
+            return cls(uri, contents.mimeType, True, path=path, size=size)
+
+        blob = contents.blob
+        if any(c.isspace() for c in blob[:80]):
+            blob = "".join(blob.split())
+        if spill_threshold is None or len(blob) * 3 // 4 <= spill_threshold:
+            data = base64.b64decode(blob)
+            return cls(uri, contents.mimeType, False, data=data, size=len(data))
+        with cls._spill_file(spill_dir) as (file, path):
+            size = 0
+            for start in range(0, len(blob), _BASE64_CHUNK):
+                size += file.write(base64.b64decode(blob[start:start + _BASE64_CHUNK]))
+        return cls(uri, contents.mimeType, False, path=path, size=size)
+
+    @staticmethod
+    @contextmanager
+    def _spill_file(spill_dir: Optional[str]):
+        descriptor, path = tempfile.mkstemp(prefix="monkai-mcp-", suffix=".part", dir=spill_dir)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                yield file, path
+        except BaseException:
+            os.remove(path)
+            raise
+
+    @property
+    def spilled(self) -> bool:
+        """Whether the part is stored in a temporary file."""
+        return self.path is not None
+
+    @property
+    def text(self) -> Optional[str]:
+        """The text of an in-memory text part. None for blobs and spilled parts, read with `iter_text`."""
+        return self._text
+
+    @contextmanager
+    def open(self) -> Iterator[memoryview]:
+        """
+        Gives the bytes of the part to a `with` block: a view of a read-only memory map for spilled
+        parts. The view and the memory map are closed when the block exits.
+        """
+        if self._closed:
+            raise ValueError(f"Resource part '{self.uri}' was closed")
+        if self.path is None or self.size == 0:
+            data = b"" if self.path is not None else self._text.encode("utf-8") if self.is_text else self._data
+            with memoryview(data) as view:
+                yield view
+            return
+        with open(self.path, "rb") as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with memoryview(mapping) as view:
+                yield view
+        finally:
+            mapping.close()
+
+    def iter_bytes(self, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Yields the bytes of the part in chunks."""
+        with self.open() as view:
+            for start in range(0, len(view), chunk_size):
+                yield bytes(view[start:start + chunk_size])
+
+    def iter_text(self, chunk_size: int = 64 * 1024) -> Iterator[str]:
+        """
+        Yields the text of a text part in chunks of about `chunk_size` characters, decoded
+        incrementally so multi-byte characters are never split.
+        """
+        if not self.is_text:
+            raise ValueError(f"Resource part '{self.uri}' is binary")
+        if self._text is not None:
+            for start in range(0, len(self._text), chunk_size):
+                yield self._text[start:start + chunk_size]
+            return
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for chunk in self.iter_bytes(chunk_size):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def reference(self, preview_chars: int = 0) -> str:
+        """
+        Describes the part for the model without including its content, optionally followed by
+        the beginning of its text.
+        """
+        location = f"; stored at {self.path}" if self.path else ""
+        description = f"[Resource {self.uri} ({self.mime_type or 'unknown type'}, {self.size} bytes){location}]"
+        if preview_chars and self.is_text:
+            chunks = self.iter_text(preview_chars)
+            try:
+                preview = next(chunks, "")
+            finally:
+                chunks.close()
+            if preview:
+                description += f"\nBeginning of the resource:\n{preview}"
+        return description
+
+    def close(self) -> None:
+        """Deletes the temporary file of a spilled part."""
+        self._closed = True
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    def __repr__(self) -> str:
+        return f"MCPResourcePart(uri={self.uri!r}, mime_type={self.mime_type!r}, size={self.size}, spilled={self.spilled})"
+
+
+def resource_parts(result: ReadResourceResult, spill_threshold: Optional[int] = None,
+                   spill_dir: Optional[str] = None) -> List[MCPResourcePart]:
+    """
+    Converts every content part of a `resources/read` result, spilling the large ones.
+    """
+    parts = []
+    try:
+        for contents in result.contents:
+            parts.append(MCPResourcePart.from_contents(contents, spill_threshold, spill_dir))
+    except BaseException:
+        for part in parts:
+            part.close()
+        raise
+    return parts
@@ -75,6 +75,12 @@ class TransferTriageAgentCreator(MonkaiAgentCreator):
     """
     The triage agent instance.
     
+    """
+    triage_agent_creator = None
+    """
+    The triage creator the agent is registered with. While `triage_agent` is not set, its
+    triage agent is built on demand by `transfer_to_triage`.
+
     """
     def __init__(self):
         super().__init__()
@@ -96,6 +102,8 @@ class TransferTriageAgentCreator(MonkaiAgentCreator):
         Args:
             agent (Agent): The agent to transfer the conversation to.
         """
+        if self.triage_agent is None and self.triage_agent_creator is not None:
+            return self.triage_agent_creator.get_agent()
         return self.triage_agent
 
 
@@ -1,9 +1,17 @@
+import asyncio
+import weakref
 from abc import ABC, abstractmethod
-from openai import OpenAI, AzureOpenAI
+from openai import OpenAI, AzureOpenAI, AsyncOpenAI, AsyncAzureOpenAI
 
 
 class LLMProvider(ABC):
     """Base class for LLM providers"""
+
+    supports_stream_usage = False
+    """
+    Whether streamed completions accept `stream_options={"include_usage": True}`, which ends the
+    stream with a usage chunk carrying the cached prompt tokens.
+    """
     
     @abstractmethod
     def get_client(self):
@@ -17,8 +25,48 @@ class LLMProvider(ABC):
         """Get chat completion from the LLM"""
         pass
 
+    async def get_completion_async(self, messages: list, **kwargs):
+        """
+        Get chat completion from the LLM without blocking the event loop.
+
+        Providers without a native async client run `get_completion` in a
+        worker thread. When `stream=True` the returned object may then be a
+        synchronous iterator, which callers must consume off the event loop.
+        """
+        return await asyncio.to_thread(self.get_completion, messages, **kwargs)
+
+    def _shared_async_client(self, create):
+        """
+        Returns the async client of the provider, calling `create` to build it on first use.
+
+        The client is reused by every completion so they share its connection pool. Connection
+        pools are bound to an event loop, so a new client is built when called from another loop.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        client = getattr(self, "_async_client", None)
+        client_loop = getattr(self, "_async_client_loop", None)
+        if client is None or (client_loop() if client_loop is not None else None) is not loop:
+            client = self._async_client = create()
+            self._async_client_loop = weakref.ref(loop) if loop is not None else None
+        return client
+
+    async def aclose(self):
+        """
+        Close the async client of the provider and its connections, if one was created.
+        """
+        client = getattr(self, "_async_client", None)
+        self._async_client = None
+        self._async_client_loop = None
+        if client is not None:
+            await client.close()
+
 class OpenAIProvider(LLMProvider):
     """OpenAI LLM provider"""
+    supports_stream_usage = True
+
     def __init__(self, api_key: str):
         """
         Initialize OpenAIProvider with API key.
@@ -36,6 +84,16 @@ class OpenAIProvider(LLMProvider):
             OpenAI client instance.
         """
         return OpenAI(api_key=self.api_key)
+
+    def get_async_client(self):
+        """
+        Get the async OpenAI client of the provider, created on first use and shared by
+        all completions. Close it with `aclose`.
+
+        Returns:
+            AsyncOpenAI client instance.
+        """
+        return self._shared_async_client(lambda: AsyncOpenAI(api_key=self.api_key))
     
     def get_completion(self, messages: list, **kwargs):
         """
@@ -252,6 +310,24 @@ class OpenAIProvider(LLMProvider):
             messages=messages,
             **kwargs
         )
+
+    async def get_completion_async(self, messages: list, **kwargs):
+        """
+        Get chat completion from OpenAI API using the async client.
+
+        Accepts the same arguments as `get_completion`. With `stream=True` the
+        result is an `AsyncStream` of chunks.
+
+        Returns:
+            ChatCompletion | AsyncStream[ChatCompletionChunk]: openAI chat completions response.
+        """
+        client = self.get_async_client()
+        if 'agent' in kwargs:
+            kwargs.pop('agent')
+        return await client.chat.completions.create(
+            messages=messages,
+            **kwargs
+        )
     
 
 # Available Azure OpenAI models
@@ -266,18 +342,22 @@ AZURE_MODELS = [
 class AzureProvider(LLMProvider):
     """Azure OpenAI Service provider"""
     
-    def __init__(self, api_key: str, endpoint: str, api_version: str = "2024-02-15-preview"):
+    def __init__(self, api_key: str, endpoint: str, api_version: str = "2024-02-15-preview",
+                 stream_usage: bool = None):
         """
         Initialize AzureProvider with API key, endpoint, and API version.
         Args:
             api_key (str): Azure OpenAI API key.
             endpoint (str): Azure OpenAI endpoint.
             api_version (str): Azure OpenAI API version.
+            stream_usage (bool): Whether streamed completions ask for a final usage chunk. Defaults
+                to True for API versions from 2024-09-01 on, which accept `stream_options`.
         """
         super().__init__()
         self.api_key = api_key
         self.endpoint = endpoint
         self.api_version = api_version
+        self.supports_stream_usage = stream_usage if stream_usage is not None else api_version[:10] >= "2024-09-01"
     
     def get_client(self):
         """
@@ -290,6 +370,19 @@ class AzureProvider(LLMProvider):
             api_version=self.api_version,
             azure_endpoint=self.endpoint
         )
+
+    def get_async_client(self):
+        """
+        Get the async Azure OpenAI client of the provider, created on first use and shared by
+        all completions. Close it with `aclose`.
+        Returns:
+            AsyncAzureOpenAI client instance.
+        """
+        return self._shared_async_client(lambda: AsyncAzureOpenAI(
+            api_key=self.api_key,
+            api_version=self.api_version,
+            azure_endpoint=self.endpoint
+        ))
     
     def get_completion(self, messages: list, **kwargs):
         """
@@ -503,3 +596,18 @@ class AzureProvider(LLMProvider):
         if 'agent' in kwargs:
             kwargs.pop('agent')
         return client.chat.completions.create(messages=messages, **kwargs)
+
+    async def get_completion_async(self, messages: list, **kwargs):
+        """
+        Get chat completion from Azure OpenAI API using the async client.
+
+        Accepts the same arguments as `get_completion`. With `stream=True` the
+        result is an `AsyncStream` of chunks.
+
+        Returns:
+            ChatCompletion | AsyncStream[ChatCompletionChunk]: Azure OpenAI chat completions response.
+        """
+        client = self.get_async_client()
+        if 'agent' in kwargs:
+            kwargs.pop('agent')
+        return await client.chat.completions.create(messages=messages, **kwargs)
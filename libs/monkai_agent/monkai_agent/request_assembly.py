@@ -0,0 +1,117 @@
+"""
+This module provides the assembly of completion requests in a layout that provider prompt caches can reuse.
+
+Providers cache the processing of the beginning of a request and reuse it only for requests that start with
+exactly the same tokens. `RequestAssembler` lays every request out as a canonical prefix, made of the
+instructions, the pinned messages (such as the resources of an MCP agent) and the tools sorted by name,
+followed by the conversation. It fingerprints the prefix of each agent to count the requests whose prefix
+changed, and records the cached prompt tokens reported by the provider, so the cache hit rate of each agent
+can be measured.
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _usage_value(usage: Any, name: str) -> Any:
+    return usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """
+    Returns the prompt tokens served from the provider cache according to a usage report: the
+    `prompt_tokens_details.cached_tokens` of OpenAI-compatible APIs, or the `cache_read_input_tokens`
+    of Anthropic-style APIs. 0 when the report has neither.
+    """
+    if usage is None:
+        return 0
+    details = _usage_value(usage, "prompt_tokens_details")
+    cached = _usage_value(details, "cached_tokens") if details is not None else None
+    if cached is None:
+        cached = _usage_value(usage, "cache_read_input_tokens")
+    return int(cached or 0)
+
+
+def _tool_name(tool: dict) -> str:
+    return tool.get("function", {}).get("name", "")
+
+
+class RequestAssembler:
+    """
+    Orders the messages and tools of completion requests so their prefix stays byte-stable.
+    """
+
+    def __init__(self, sort_tools: bool = True):
+        """
+        Args:
+            sort_tools: Send the tools sorted by name, so the tool list does not depend on the order
+                in which functions and MCP servers were registered or discovered.
+        """
+        self.sort_tools = sort_tools
+        self._fingerprints: Dict[str, str] = {}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "prefix_changes": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        )
+
+    @staticmethod
+    def fingerprint(prefix: List[dict], tools: List[dict]) -> str:
+        """Returns a hash of the prefix messages and the tools of a request."""
+        payload = json.dumps([prefix, tools], sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def assemble(self, agent_name: str, messages: List[dict], tools: List[dict],
+                 pinned: Optional[List[dict]] = None) -> Tuple[List[dict], List[dict]]:
+        """
+        Lays out a request: the instructions, then the pinned messages, then the rest of the
+        conversation, with the tools in canonical order.
+
+        Args:
+            agent_name: The agent the request is made for; prefixes are compared per agent.
+            messages: The messages of the request, starting with the instructions as a system message.
+            tools: The tools of the request, in the function-calling format.
+            pinned: Messages that belong to the stable prefix, placed right after the instructions.
+
+        Returns:
+            Tuple[List[dict], List[dict]]: The messages and the tools to send.
+        """
+        position = 1 if messages and messages[0].get("role") == "system" else 0
+        prefix = messages[:position] + list(pinned or [])
+        if self.sort_tools:
+            tools = sorted(tools, key=_tool_name)
+
+        fingerprint = self.fingerprint(prefix, tools)
+        stats = self._stats[agent_name]
+        stats["requests"] += 1
+        previous = self._fingerprints.get(agent_name)
+        if previous is not None and previous != fingerprint:
+            stats["prefix_changes"] += 1
+        self._fingerprints[agent_name] = fingerprint
+        return prefix + messages[position:], tools
+
+    def record_usage(self, agent_name: str, usage: Any) -> int:
+        """
+        Records the prompt tokens and cached prompt tokens reported for a request of an agent.
+
+        Returns:
+            int: The cached prompt tokens.
+        """
+        cached = cached_prompt_tokens(usage)
+        stats = self._stats[agent_name]
+        stats["prompt_tokens"] += int(_usage_value(usage, "prompt_tokens") or _usage_value(usage, "input_tokens") or 0)
+        stats["cached_tokens"] += cached
+        return cached
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns, per agent, the requests, the requests whose prefix differed from the previous
+        one, the prompt and cached prompt tokens, and the share of prompt tokens served from cache.
+        """
+        return {
+            agent_name: {
+                **stats,
+                "cache_hit_rate": stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0,
+            }
+            for agent_name, stats in self._stats.items()
+        }
@@ -0,0 +1,106 @@
+"""
+This module provides the stage that adds the resources of an MCP agent to its completion requests.
+
+Resources read from MCP servers (`MCPAgent.resources`) are context for every turn. `ResourceInjector` sends
+them once per request, as a single system message right after the instructions, so they are part of the
+stable prefix of the conversation that providers can cache instead of trailing the history. Identical
+resources are sent once, their tokens are counted once per content, and the total can be capped.
+"""
+
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used when no tokenizer is given."""
+    return max(1, len(text) // 4)
+
+
+class ResourceInjector:
+    """
+    Places the text resources of an agent in a system message after its instructions.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, count_tokens: Optional[Callable[[str], int]] = None,
+                 separator: str = "\n\n"):
+        """
+        Args:
+            max_tokens: Maximum number of resource tokens per request. Resources are taken in the
+                order they were read, and those that no longer fit are left out. None means no limit.
+            count_tokens: Function counting the tokens of a text. The `AgentManager` sets its own
+                tokenizer when none is given; otherwise four characters count as one token.
+            separator: Text placed between two resources in the message.
+        """
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens
+        self.separator = separator
+        self._tokens: Dict[str, int] = {}
+        self.requests = 0
+        self.injected = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.injected_tokens = 0
+        self.last_tokens = 0
+
+    def _token_count(self, digest: str, text: str) -> int:
+        tokens = self._tokens.get(digest)
+        if tokens is None:
+            if len(self._tokens) >= 4096:
+                self._tokens.clear()
+            tokens = self._tokens[digest] = (self.count_tokens or _estimate_tokens)(text)
+        return tokens
+
+    def select(self, resources: List[Any]) -> List[str]:
+        """
+        Returns the text resources to send: deduplicated by content hash and within `max_tokens`.
+        """
+        selected, seen, total = [], set(), 0
+        for resource in resources or []:
+            if type(resource) is not str:
+                continue
+            digest = hashlib.sha256(resource.encode("utf-8")).hexdigest()
+            if digest in seen:
+                self.duplicates += 1
+                continue
+            seen.add(digest)
+            tokens = self._token_count(digest, resource)
+            if self.max_tokens is not None and total + tokens > self.max_tokens:
+                self.dropped += 1
+                continue
+            selected.append(resource)
+            total += tokens
+        self.last_tokens = total
+        return selected
+
+    def build_message(self, resources: List[Any]) -> Optional[dict]:
+        """
+        Returns the system message carrying the resources of a request, or None if there are none to send.
+        """
+        self.requests += 1
+        selected = self.select(resources)
+        if not selected:
+            return None
+        self.injected += len(selected)
+        self.injected_tokens += self.last_tokens
+        return {"role": "system", "content": self.separator.join(selected)}
+
+    def inject(self, messages: List[dict], resources: List[Any]) -> List[dict]:
+        """
+        Returns the messages with the resources inserted right after the instructions.
+        """
+        resource_message = self.build_message(resources)
+        if resource_message is None:
+            return messages
+        position = 1 if messages and messages[0].get("role") == "system" else 0
+        return messages[:position] + [resource_message] + messages[position:]
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the resources sent, left out as duplicates or over the limit, and their tokens."""
+        return {
+            "requests": self.requests,
+            "injected": self.injected,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "injected_tokens": self.injected_tokens,
+            "last_tokens": self.last_tokens,
+        }
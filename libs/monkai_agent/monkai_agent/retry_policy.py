@@ -0,0 +1,207 @@
+"""
+This module provides the retry policy applied to failed provider requests.
+
+`RetryPolicy` decides whether a failed completion is retried and how long to wait first. Transient errors
+(rate limits, timeouts, connection and server errors) are retried with exponential backoff and full jitter,
+unless the provider asked for a specific delay with a `Retry-After` header. Each error class can be given its
+own retry limit per request, and a `RetryBudget` shared by every request limits retries to a share of the
+traffic, so a degraded provider is not flooded with retries.
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+NON_RETRYABLE_CODES = frozenset({
+    'invalid_request_error', 'invalid_api_key', 'authentication_error', 'model_not_found',
+    'unsupported_language', 'context_length_exceeded', 'insufficient_quota', 'quota_exceeded',
+})
+
+
+class RetryBudget:
+    """
+    Limits the retries of all requests over a sliding window: at most `min_retries_per_second`
+    times the window, plus `ratio` times the requests made in the window.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries_per_second: float = 1.0, window: float = 10.0):
+        """
+        Args:
+            ratio: Retries allowed per request made in the window.
+            min_retries_per_second: Retries always allowed, so low traffic can still retry.
+            window: Length of the window in seconds.
+        """
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.window = window
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and events[0] <= now - self.window:
+                events.popleft()
+
+    def record_request(self) -> None:
+        """Records a request, which earns `ratio` retries."""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_acquire(self) -> bool:
+        """Takes one retry from the budget. Returns False when the budget is spent."""
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            allowed = self.min_retries_per_second * self.window + self.ratio * len(self._requests)
+            if len(self._retries) + 1 > allowed:
+                return False
+            self._retries.append(now)
+            return True
+
+
+class RetryPolicy:
+    """
+    Decides which provider errors are retried and how long to wait before each retry.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0,
+                 multiplier: float = 2.0, jitter: bool = True, respect_retry_after: bool = True,
+                 max_retry_after: float = 60.0, class_limits: Optional[Dict[str, int]] = None,
+                 budget: Optional[RetryBudget] = None,
+                 non_retryable_codes: Optional[Iterable[str]] = None):
+        """
+        Args:
+            max_attempts: Maximum number of attempts of a request, the first one included.
+            base_delay: Backoff ceiling in seconds before the first retry. It is multiplied by
+                `multiplier` for each further retry, up to `max_delay`.
+            max_delay: Maximum backoff in seconds.
+            multiplier: Growth factor of the backoff.
+            jitter: Wait a random time between 0 and the backoff ceiling ("full jitter"), so clients
+                that failed together do not retry together. False waits the ceiling itself.
+            respect_retry_after: Wait the delay requested by the provider's `Retry-After` (or
+                `retry-after-ms`) header instead of the backoff.
+            max_retry_after: Longest requested delay honored; requests asking for more are not retried.
+            class_limits: Maximum retries per request for each error class (`rate_limit`, `timeout`,
+                `connection`, `server`, `content_filter`). Defaults to one retry for `content_filter`.
+            budget: Budget shared by every request. Defaults to a `RetryBudget()`.
+            non_retryable_codes: Error codes that are never retried. Defaults to `NON_RETRYABLE_CODES`.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = max_retry_after
+        self.class_limits = dict(class_limits) if class_limits is not None else {"content_filter": 1}
+        self.budget = budget if budget is not None else RetryBudget()
+        self.non_retryable_codes = frozenset(non_retryable_codes if non_retryable_codes is not None else NON_RETRYABLE_CODES)
+        self.retries: Dict[str, int] = defaultdict(int)
+        self.given_up = 0
+        self.budget_exhausted = 0
+        self.total_delay = 0.0
+
+    def classify(self, error: Exception) -> Optional[str]:
+        """
+        Returns the class of a retryable error, or None if the error is not retryable.
+        """
+        code = getattr(error, 'code', None)
+        if code == 'content_filter':
+            return 'content_filter'
+        if code in self.non_retryable_codes:
+            return None
+        name = type(error).__name__
+        status = getattr(error, 'status_code', None)
+        if name == 'APITimeoutError' or isinstance(error, TimeoutError):
+            return 'timeout'
+        if name == 'APIConnectionError':
+            return 'connection'
+        if status == 429 or code == 'rate_limit_exceeded':
+            return 'rate_limit'
+        if status is not None and 400 <= status < 500 and status not in (408, 409):
+            return None
+        return 'server'
+
+    @staticmethod
+    def retry_after(error: Exception) -> Optional[float]:
+        """Returns the delay in seconds requested by the provider, if any."""
+        headers = getattr(getattr(error, 'response', None), 'headers', None)
+        if not headers:
+            return None
+        value = headers.get('retry-after-ms')
+        if value is not None:
+            try:
+                return max(0.0, float(value) / 1000)
+            except ValueError:
+                pass
+        value = headers.get('retry-after')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def backoff(self, attempt: int) -> float:
+        """Returns the wait before the retry following the given failed attempt (1 for the first)."""
+        ceiling = min(self.max_delay, self.base_delay * self.multiplier ** max(0, attempt - 1))
+        return random.uniform(0, ceiling) if self.jitter else ceiling
+
+    def record_request(self) -> None:
+        """Records a new request in the retry budget."""
+        if self.budget is not None:
+            self.budget.record_request()
+
+    def next_delay(self, error: Exception, attempt: int, retries: Optional[Dict[str, int]] = None) -> Optional[float]:
+        """
+        Decides whether to retry after a failed attempt.
+
+        Args:
+            error: The error of the attempt.
+            attempt: The number of the failed attempt, starting at 1.
+            retries: The retries already made by the request, per error class. Updated in place.
+
+        Returns:
+            Optional[float]: Seconds to wait before retrying, or None to give up.
+        """
+        error_class = self.classify(error)
+        retries = retries if retries is not None else {}
+        limit = self.class_limits.get(error_class)
+        if (error_class is None or attempt >= self.max_attempts
+                or (limit is not None and retries.get(error_class, 0) >= limit)):
+            self.given_up += 1
+            return None
+
+        delay = self.retry_after(error) if self.respect_retry_after else None
+        if delay is not None and delay > self.max_retry_after:
+            self.given_up += 1
+            return None
+        if delay is None:
+            delay = self.backoff(attempt)
+
+        if self.budget is not None and not self.budget.try_acquire():
+            self.budget_exhausted += 1
+            return None
+        retries[error_class] = retries.get(error_class, 0) + 1
+        self.retries[error_class] += 1
+        self.total_delay += delay
+        return delay
+
+    def get_stats(self) -> Dict[str, object]:
+        """Returns the retries per error class, the requests given up, those refused by the budget and the time waited."""
+        return {
+            "retries": dict(self.retries),
+            "given_up": self.given_up,
+            "budget_exhausted": self.budget_exhausted,
+            "total_delay": self.total_delay,
+        }
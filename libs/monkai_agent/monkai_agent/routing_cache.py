@@ -0,0 +1,175 @@
+"""
+This module provides a cache of triage decisions.
+
+Conversations often open with near-identical messages, and each of them would otherwise pay for a triage
+completion that picks the same `transfer_to_*` target. `RoutingCache` memoizes the agent chosen for the first
+user message of a conversation, keyed by its normalized text, and optionally matches near-duplicate messages
+with MinHash locality-sensitive hashing. Entries expire after a TTL, the cache is bounded in size, and it is
+cleared when the set of agent creators changes.
+"""
+
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from .lexical_index import normalize_text
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+class RoutingCache:
+    """
+    Maps normalized first user messages to the name of the agent the triage agent chose.
+    """
+
+    def __init__(self, ttl: Optional[float] = 3600.0, max_entries: int = 10000, near_duplicates: bool = False,
+                 similarity_threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 4):
+        """
+        Args:
+            ttl: Seconds an entry stays valid. None keeps entries until they are evicted.
+            max_entries: Maximum number of entries; the least recently used are evicted first.
+            near_duplicates: Match messages whose estimated Jaccard similarity with a cached message is
+                at least `similarity_threshold`, not only identical normalized messages.
+            similarity_threshold: Minimum estimated similarity of a near-duplicate match.
+            num_perm: Number of MinHash permutations. Must be a multiple of `bands`.
+            bands: Number of LSH bands used to find near-duplicate candidates.
+            shingle_size: Length of the character shingles compared between messages.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.near_duplicates = near_duplicates
+        self.similarity_threshold = similarity_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self._permutations = [
+            (zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode())) for i in range(num_perm)
+        ]
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self._signature: Optional[Hashable] = None
+        self.hits = 0
+        self.near_duplicate_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _minhash(self, key: str) -> Tuple[int, ...]:
+        size = self.shingle_size
+        shingles = {key[i:i + size] for i in range(max(1, len(key) - size + 1))}
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles]
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._permutations
+        )
+
+    def _bands(self, minhash: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        rows = self.num_perm // self.bands
+        return [(band, minhash[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for band in entry.get("bands", ()):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def _lookup(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires_at"] is not None and entry["expires_at"] <= now:
+            self._remove(key)
+            entry = None
+        return entry
+
+    def _find_near_duplicate(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        minhash = self._minhash(key)
+        candidates = set()
+        for band in self._bands(minhash):
+            candidates.update(self._buckets.get(band, ()))
+        best, best_similarity = None, self.similarity_threshold
+        for candidate in candidates:
+            entry = self._lookup(candidate, now)
+            if entry is None:
+                continue
+            similarity = sum(x == y for x, y in zip(minhash, entry["minhash"])) / self.num_perm
+            if similarity >= best_similarity:
+                best, best_similarity = entry, similarity
+        return best
+
+    def ensure_signature(self, signature: Hashable) -> None:
+        """
+        Clears the cache when the signature of the agent creators differs from the one the entries
+        were recorded with.
+        """
+        if signature != self._signature:
+            if self._entries:
+                self.invalidate()
+            self._signature = signature
+
+    def get(self, message: str) -> Optional[str]:
+        """
+        Returns the agent name recorded for the message, or None.
+        """
+        now = time.monotonic()
+        key = normalize_text(message)
+        entry = self._lookup(key, now)
+        if entry is None and self.near_duplicates and key:
+            entry = self._find_near_duplicate(key, now)
+            if entry is not None:
+                self.near_duplicate_hits += 1
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(entry["key"])
+        return entry["agent_name"]
+
+    def put(self, message: str, agent_name: str) -> None:
+        """
+        Records the agent chosen for the message.
+        """
+        key = normalize_text(message)
+        if not key:
+            return
+        if key in self._entries:
+            self._remove(key)
+        entry = {
+            "key": key,
+            "agent_name": agent_name,
+            "expires_at": time.monotonic() + self.ttl if self.ttl is not None else None,
+        }
+        if self.near_duplicates:
+            entry["minhash"] = self._minhash(key)
+            entry["bands"] = self._bands(entry["minhash"])
+            for band in entry["bands"]:
+                self._buckets.setdefault(band, set()).add(key)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Removes every entry."""
+        self._entries.clear()
+        self._buckets.clear()
+        self.invalidations += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns the size of the cache and its hit, eviction and invalidation counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_duplicate_hits": self.near_duplicate_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
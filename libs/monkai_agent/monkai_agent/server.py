@@ -0,0 +1,365 @@
+"""
+This module provides an optional ASGI application that serves `AgentManager` instances over HTTP.
+
+Sessions are mapped onto a small set of shared managers, so serving many users does not require one manager per
+conversation. Runs are exposed as JSON and streaming runs as server-sent events, and an admission controller bounds
+the number of concurrent and queued runs so the process sheds load with `503` responses instead of stalling.
+
+The application requires Starlette (`pip install monkai-agent[server]`) and runs on any ASGI server, e.g.
+`uvicorn module:app`.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .base import AgentManager
+from .types import Response
+
+try:
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+    STARLETTE_AVAILABLE = True
+except ImportError:
+    STARLETTE_AVAILABLE = False
+
+if STARLETTE_AVAILABLE:
+    class _AdmittedStreamingResponse(StreamingResponse):
+        """
+        A streaming response that calls `release` however it ends: completed, cancelled, or
+        interrupted by a client disconnect before or while its body is sent.
+        """
+
+        def __init__(self, content, release: Callable[[], None], **kwargs):
+            super().__init__(content, **kwargs)
+            self._release = release
+
+        async def __call__(self, scope, receive, send) -> None:
+            try:
+                await super().__call__(scope, receive, send)
+            finally:
+                self._release()
+
+
+class AdmissionController:
+    """
+    Bounds the number of runs executing concurrently and the number of runs waiting for a slot.
+
+    Requests beyond the queue bound, or that wait longer than `queue_timeout`, are rejected so
+    the caller can answer them with a retryable error.
+    """
+
+    def __init__(self, max_concurrent_runs: int = 32, max_queued_runs: int = 64, queue_timeout: float = 10.0):
+        """
+        Args:
+            max_concurrent_runs: Maximum number of runs executing at the same time.
+            max_queued_runs: Maximum number of runs waiting for a free slot.
+            queue_timeout: Maximum time in seconds a run waits for a free slot.
+        """
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_queued_runs = max_queued_runs
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent_runs)
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self) -> bool:
+        """
+        Waits for a run slot.
+
+        Returns:
+            bool: True if the run was admitted, False if it was rejected.
+        """
+        if self._semaphore.locked() and self.queued >= self.max_queued_runs:
+            self.rejected += 1
+            return False
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.queued -= 1
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        """Frees the slot of a finished run."""
+        self.active -= 1
+        self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the current load and the admission counters."""
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "max_concurrent_runs": self.max_concurrent_runs,
+            "max_queued_runs": self.max_queued_runs,
+        }
+
+
+class SessionStore:
+    """
+    Keeps the conversation history of each session in memory.
+
+    Sessions idle for longer than `session_ttl` seconds are dropped, and the least recently used
+    sessions are evicted once `max_sessions` is reached. Each history keeps at most `max_turns`
+    turns, the oldest being dropped first. Each session has a lock so that turns of the same
+    conversation are processed one at a time.
+    """
+
+    def __init__(self, max_sessions: int = 10000, session_ttl: float = 3600.0, max_turns: Optional[int] = 50):
+        """
+        Args:
+            max_sessions: Maximum number of sessions kept in memory.
+            session_ttl: Seconds of inactivity after which a session expires.
+            max_turns: Maximum number of turns (a user message and the messages answering it) kept
+                in each history. None keeps them all.
+        """
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.max_turns = max_turns
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """
+        Returns the session with the given id, creating it if needed.
+
+        Returns:
+            dict: The session, with its `history` list and `lock`.
+        """
+        now = time.monotonic()
+        self._evict_expired(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = {"history": [], "lock": asyncio.Lock(), "updated_at": now}
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+            session["updated_at"] = now
+        return session
+
+    def add_turn(self, session: Dict[str, Any], user_message: str, messages: List[dict]) -> None:
+        """Appends a turn to the history of a session and drops its oldest turns beyond `max_turns`."""
+        history = session["history"]
+        history.append({"role": "user", "content": user_message})
+        history.extend(messages)
+        if self.max_turns is None:
+            return
+        starts = [i for i, message in enumerate(history) if isinstance(message, dict) and message.get("role") == "user"]
+        if len(starts) > self.max_turns:
+            del history[:starts[-self.max_turns]]
+
+    def _evict_expired(self, now: float) -> None:
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session["updated_at"] <= self.session_ttl or session["lock"].locked():
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+def _response_payload(session_id: str, response: Response) -> Dict[str, Any]:
+    """Converts a `Response` to a JSON-serializable payload."""
+    return {
+        "session_id": session_id,
+        "agent": response.agent.name if response.agent else None,
+        "messages": response.messages,
+        "input_tokens": response.input_tokens,
+        "memory_tokens": response.memory_tokens,
+        "output_tokens": response.output_tokens,
+        "process_tokens": response.process_tokens,
+        "stream_metrics": [metrics.model_dump() for metrics in response.stream_metrics],
+    }
+
+
+def _sse(event: str, data: Any) -> str:
+    """Formats a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def create_app(
+    managers: Union[AgentManager, List[AgentManager], Callable[[], AgentManager]],
+    num_managers: int = 1,
+    max_concurrent_runs: int = 32,
+    max_queued_runs: int = 64,
+    queue_timeout: float = 10.0,
+    max_sessions: int = 10000,
+    session_ttl: float = 3600.0,
+    max_history_turns: Optional[int] = 50,
+) -> "Starlette":
+    """
+    Creates an ASGI application serving agent runs.
+
+    Endpoints:
+        - `POST /run`: body `{"message": str, "session_id": str?}`, returns the run as JSON.
+        - `POST /run/stream`: same body, streams the run as server-sent events (`start`, `delta`,
+          `end` for each completion, then `response` and `done`).
+        - `GET /health`: admission and session statistics.
+
+    Each session is mapped to one of the managers by hashing its id, so a conversation always uses
+    the same manager while the managers themselves are shared between sessions. Runs over the
+    admission limits are answered with `503` and a `Retry-After` header. A run waits for the
+    previous run of its session before it asks for a slot, so a busy session does not take the
+    slots of the others.
+
+    Args:
+        managers: A manager, a list of managers, or a factory called `num_managers` times.
+        num_managers: Number of managers to create when `managers` is a factory.
+        max_concurrent_runs: Maximum number of runs executing at the same time.
+        max_queued_runs: Maximum number of runs waiting for a free slot.
+        queue_timeout: Maximum time in seconds a run waits for a free slot.
+        max_sessions: Maximum number of sessions kept in memory.
+        session_ttl: Seconds of inactivity after which a session expires.
+        max_history_turns: Maximum number of turns kept in the history of a session. None keeps them all.
+
+    Returns:
+        Starlette: The ASGI application.
+
+    Raises:
+        ImportError: If Starlette is not installed.
+        ValueError: If no manager is given, or a manager was created with `stream=True`.
+    """
+    if not STARLETTE_AVAILABLE:
+        raise ImportError("The MonkAI ASGI server requires starlette. Install it with `pip install monkai-agent[server]`.")
+
+    if isinstance(managers, AgentManager):
+        manager_pool = [managers]
+    elif isinstance(managers, list):
+        manager_pool = list(managers)
+    else:
+        manager_pool = [managers() for _ in range(max(1, num_managers))]
+    if not manager_pool:
+        raise ValueError("At least one AgentManager is required")
+    if any(manager.stream for manager in manager_pool):
+        # `run` returns a generator on streaming managers; streaming is served by `/run/stream`
+        raise ValueError("Served AgentManagers must be created with stream=False")
+
+    admission = AdmissionController(max_concurrent_runs, max_queued_runs, queue_timeout)
+    sessions = SessionStore(max_sessions, session_ttl, max_history_turns)
+
+    def manager_for(session_id: str) -> AgentManager:
+        return manager_pool[zlib.crc32(session_id.encode()) % len(manager_pool)]
+
+    def overloaded() -> JSONResponse:
+        return JSONResponse(
+            {"error": "Server overloaded, retry later."},
+            status_code=503,
+            headers={"Retry-After": str(max(1, int(queue_timeout)))},
+        )
+
+    async def parse_request(request: "Request"):
+        try:
+            body = await request.json()
+        except ValueError:
+            return None, JSONResponse({"error": "Request body must be JSON."}, status_code=400)
+        if not isinstance(body, dict) or not isinstance(body.get("message"), str):
+            return None, JSONResponse({"error": "Field 'message' is required."}, status_code=400)
+        body["session_id"] = str(body.get("session_id") or uuid.uuid4())
+        return body, None
+
+    async def run(request: "Request"):
+        body, error = await parse_request(request)
+        if error:
+            return error
+        session_id = body["session_id"]
+        session = sessions.get(session_id)
+        async with session["lock"]:
+            if not await admission.acquire():
+                return overloaded()
+            try:
+                response = await manager_for(session_id).run(
+                    body["message"], user_history=session["history"], session_id=session_id
+                )
+                sessions.add_turn(session, body["message"], response.messages)
+            finally:
+                admission.release()
+        return JSONResponse(_response_payload(session_id, response))
+
+    async def run_stream(request: "Request"):
+        body, error = await parse_request(request)
+        if error:
+            return error
+        session_id = body["session_id"]
+        session = sessions.get(session_id)
+        # The session lock is held until the response ends, and released with the slot
+        await session["lock"].acquire()
+        try:
+            admitted = await admission.acquire()
+        except BaseException:
+            session["lock"].release()
+            raise
+        if not admitted:
+            session["lock"].release()
+            return overloaded()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                admission.release()
+                session["lock"].release()
+
+        async def events():
+            try:
+                manager = manager_for(session_id)
+                async with aclosing(manager.run_stream(
+                    body["message"], user_history=session["history"], session_id=session_id
+                )) as stream:
+                    async for event in stream:
+                        if "delim" in event:
+                            yield _sse(event["delim"], {})
+                        elif "response" in event:
+                            response = event["response"]
+                            sessions.add_turn(session, body["message"], response.messages)
+                            yield _sse("response", _response_payload(session_id, response))
+                        else:
+                            yield _sse("delta", event)
+                yield _sse("done", {"session_id": session_id})
+            except Exception as e:
+                yield _sse("error", {"error": str(e)})
+            finally:
+                release()
+
+        return _AdmittedStreamingResponse(
+            events(),
+            release,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Session-Id": session_id},
+        )
+
+    async def health(request: "Request"):
+        return JSONResponse({
+            "status": "ok",
+            "managers": len(manager_pool),
+            "sessions": len(sessions),
+            "admission": admission.get_stats(),
+        })
+
+    app = Starlette(routes=[
+        Route("/run", run, methods=["POST"]),
+        Route("/run/stream", run_stream, methods=["POST"]),
+        Route("/health", health, methods=["GET"]),
+    ])
+    app.state.admission = admission
+    app.state.sessions = sessions
+    app.state.managers = manager_pool
+    return app
@@ -0,0 +1,186 @@
+"""
+This module provides the asynchronous streaming primitives used by the MonkAI agent.
+
+Provider streams are consumed by a background producer that feeds a bounded queue, so the event loop
+is never blocked on a chunk read, slow consumers apply backpressure to the upstream HTTP stream instead
+of growing an unbounded buffer, and closing the consumer closes the upstream stream. It also records the
+latency profile of a stream (time to first token, inter-chunk latency, generation rate).
+"""
+
+import asyncio
+import inspect
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from .types import StreamMetrics
+
+_STREAM_END = object()
+
+
+class _StreamError:
+    """Carries an exception raised by the producer over to the consumer side of the queue."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class StreamMetricsRecorder:
+    """
+    Records the timing of a streamed completion.
+
+    Create the recorder, or call `start`, right before sending the request so the time to first token
+    includes the request latency, call `record_chunk` for every chunk received and `finish` at the end
+    of the stream.
+    """
+
+    def __init__(self, started_at: Optional[float] = None):
+        """
+        Args:
+            started_at: `time.perf_counter()` value at which the request was sent. Defaults to now.
+        """
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+        self.last_chunk_at: Optional[float] = None
+        self.inter_chunk_latencies: List[float] = []
+        self.chunk_count = 0
+        self.reported_output_tokens: Optional[int] = None
+
+    def start(self) -> None:
+        """Marks the request as sent now, e.g. when it is sent again after a retry."""
+        self.started_at = time.perf_counter()
+
+    def record_chunk(self, chunk: Any) -> None:
+        """
+        Records the arrival of a chunk. Chunks without choices only carry usage and are not timed.
+
+        Args:
+            chunk: A `ChatCompletionChunk` or an object with the same shape.
+        """
+        now = time.perf_counter()
+        usage = getattr(chunk, "usage", None)
+        if usage is not None and getattr(usage, "completion_tokens", None) is not None:
+            self.reported_output_tokens = usage.completion_tokens
+        if not getattr(chunk, "choices", None):
+            return
+        if self.first_chunk_at is None:
+            self.first_chunk_at = now
+        else:
+            self.inter_chunk_latencies.append(now - self.last_chunk_at)
+        self.last_chunk_at = now
+        self.chunk_count += 1
+
+    def finish(self, output_tokens: Optional[int] = None) -> StreamMetrics:
+        """
+        Computes the metrics of the stream.
+
+        Args:
+            output_tokens: Generated tokens counted by the caller. Usage reported by the provider takes
+                precedence, and the number of deltas is used when neither is available.
+
+        Returns:
+            StreamMetrics: The metrics of the stream.
+        """
+        ended_at = time.perf_counter()
+        if self.reported_output_tokens is not None:
+            output_tokens = self.reported_output_tokens
+        elif not output_tokens:
+            output_tokens = self.chunk_count
+
+        metrics = StreamMetrics(
+            chunk_count=self.chunk_count,
+            output_tokens=output_tokens,
+            duration=ended_at - self.started_at,
+        )
+        if self.first_chunk_at is not None:
+            metrics.time_to_first_token = self.first_chunk_at - self.started_at
+            generation_time = self.last_chunk_at - self.first_chunk_at
+            if generation_time > 0:
+                metrics.tokens_per_second = output_tokens / generation_time
+        if self.inter_chunk_latencies:
+            latencies = sorted(self.inter_chunk_latencies)
+            metrics.inter_chunk_latency_mean = sum(latencies) / len(latencies)
+            metrics.inter_chunk_latency_p50 = _percentile(latencies, 0.5)
+            metrics.inter_chunk_latency_p95 = _percentile(latencies, 0.95)
+            metrics.inter_chunk_latency_max = latencies[-1]
+        return metrics
+
+
+async def close_stream(stream: Any) -> None:
+    """
+    Closes a provider stream, releasing the underlying HTTP connection.
+
+    Supports `AsyncStream` and async generators (awaitable `close`/`aclose`) as well as
+    synchronous streams and generators.
+
+    Args:
+        stream: The stream returned by the provider.
+    """
+    close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+    if close is None:
+        return
+    result = close()
+    if inspect.isawaitable(result):
+        await result
+
+
+async def stream_chunks(stream: Any, max_buffered_chunks: int = 64) -> AsyncIterator[Any]:
+    """
+    Yields the chunks of a provider stream as they arrive.
+
+    A producer task reads the upstream stream into a queue holding at most `max_buffered_chunks`
+    chunks. When the consumer falls behind the producer stops reading, which propagates the
+    backpressure to the connection. Synchronous streams are read in a worker thread so they do not
+    block the event loop. When the generator is closed before the end of the stream (e.g. because the
+    client disconnected) the producer is cancelled and the upstream stream is closed.
+
+    Args:
+        stream: An `AsyncStream`, async iterable or synchronous iterable of chunks.
+        max_buffered_chunks: Maximum number of chunks read ahead of the consumer.
+
+    Yields:
+        The chunks of the stream, in order.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_buffered_chunks))
+
+    async def produce():
+        try:
+            if hasattr(stream, "__aiter__"):
+                async for chunk in stream:
+                    await queue.put(chunk)
+            else:
+                iterator = iter(stream)
+                while True:
+                    chunk = await asyncio.to_thread(next, iterator, _STREAM_END)
+                    if chunk is _STREAM_END:
+                        break
+                    await queue.put(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(_StreamError(e))
+            return
+        await queue.put(_STREAM_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _STREAM_END:
+                break
+            if isinstance(item, _StreamError):
+                raise item.error
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+        await close_stream(stream)
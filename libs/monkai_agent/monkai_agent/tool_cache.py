@@ -0,0 +1,176 @@
+"""
+This module provides a cache of tool results.
+
+Lookups, searches and calculators are often called again with the same arguments during a conversation, and
+each call costs a local computation, a remote request or an MCP round trip. Tools opt in declaratively: local
+functions with the `cached_tool` decorator and MCP tools with a `ToolCachePolicy` in the `cache_policies` of
+their `MCPClientConfig` (or in the `policies` of the cache). The `AgentManager` looks results up before
+dispatching a tool call, keyed by the tool name and its canonicalized arguments, plus the context variables
+read by functions that take `context_variables`, and records the results of successful calls.
+
+Only results that neither switch agents nor update context variables are cached.
+"""
+
+import json
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from .types import ToolCachePolicy
+
+_POLICY_ATTRIBUTE = "__monkai_cache_policy__"
+
+
+def cached_tool(ttl: Optional[float] = 300.0, scope: str = "session", max_result_size: Optional[int] = None,
+                context_keys: Optional[Iterable[str]] = None) -> Callable:
+    """
+    Marks an agent function whose results can be reused for identical arguments.
+
+    The function itself is returned unchanged; the `AgentManager` applies the policy when the
+    function is called as a tool.
+
+    Args:
+        ttl: Seconds a result stays valid. None keeps it until it is evicted.
+        scope: `"session"` to share results within a conversation, `"global"` to share them between conversations.
+        max_result_size: Results longer than this many characters are not cached. None means no limit.
+        context_keys: For functions taking `context_variables`, the context variables they read, whose
+            values are part of the cache key. None keys the results by all the context variables.
+    """
+    policy = ToolCachePolicy(ttl=ttl, scope=scope, max_result_size=max_result_size,
+                             context_keys=list(context_keys) if context_keys is not None else None)
+
+    def decorator(func: Callable) -> Callable:
+        setattr(func, _POLICY_ATTRIBUTE, policy)
+        return func
+    return decorator
+
+
+def get_cache_policy(func: Callable) -> Optional[ToolCachePolicy]:
+    """Returns the policy set on a function by `cached_tool`, or None."""
+    return getattr(func, _POLICY_ATTRIBUTE, None)
+
+
+def canonical_arguments(arguments: Dict[str, Any]) -> str:
+    """
+    Serializes tool arguments so that equivalent argument sets give the same key, whatever the
+    order of their keys and their whitespace.
+    """
+    return json.dumps(arguments or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def context_fingerprint(context_variables: Dict[str, Any], keys: Optional[Iterable[str]] = None) -> str:
+    """
+    Serializes the context variables a tool reads, all of them when `keys` is None, so that results
+    computed for other values (e.g. another user or tenant) are not reused.
+    """
+    if keys is not None:
+        context_variables = {key: context_variables.get(key) for key in keys}
+    return canonical_arguments(dict(context_variables))
+
+
+class ToolResultCache:
+    """
+    LRU cache of tool results with per-entry expiration.
+
+    Entries of session-scoped tools are keyed by the session id as well, and are not stored for
+    runs without a session id.
+    """
+
+    def __init__(self, max_entries: int = 1024, policies: Optional[Dict[str, ToolCachePolicy]] = None):
+        """
+        Args:
+            max_entries: Maximum number of results kept; the least recently used are evicted first.
+            policies: Policies by tool name, as exposed to the model (e.g. `<server>_<tool>` for MCP tools).
+                They apply to tools without a policy of their own.
+        """
+        self.max_entries = max_entries
+        self.policies: Dict[str, ToolCachePolicy] = dict(policies or {})
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[Any, Optional[float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tool_hits: Dict[str, int] = defaultdict(int)
+        self.tool_misses: Dict[str, int] = defaultdict(int)
+
+    def policy_for(self, tool_name: str, policy: Optional[ToolCachePolicy] = None) -> Optional[ToolCachePolicy]:
+        """Returns the policy of a tool: its own if it has one, otherwise the one registered in the cache."""
+        return policy or self.policies.get(tool_name)
+
+    @staticmethod
+    def _key(tool_name: str, arguments: Dict[str, Any], policy: ToolCachePolicy,
+             session_id: Optional[str]) -> Optional[Tuple[Hashable, ...]]:
+        if policy.scope == "session":
+            if session_id is None:
+                return None
+            return ("session", session_id, tool_name, canonical_arguments(arguments))
+        return ("global", tool_name, canonical_arguments(arguments))
+
+    def get(self, tool_name: str, arguments: Dict[str, Any], policy: Optional[ToolCachePolicy],
+            session_id: Optional[str] = None) -> Tuple[bool, Any]:
+        """
+        Looks up the result of a call.
+
+        Returns:
+            Tuple[bool, Any]: Whether the result was found, and the result.
+        """
+        key = self._key(tool_name, arguments, policy, session_id) if policy else None
+        if key is None:
+            return False, None
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            self.tool_misses[tool_name] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.tool_hits[tool_name] += 1
+        return True, entry[0]
+
+    def put(self, tool_name: str, arguments: Dict[str, Any], policy: Optional[ToolCachePolicy], result: Any,
+            session_id: Optional[str] = None) -> None:
+        """Records the result of a call."""
+        key = self._key(tool_name, arguments, policy, session_id) if policy else None
+        if key is None:
+            return
+        if policy.max_result_size is not None and len(str(result)) > policy.max_result_size:
+            return
+        expires_at = time.monotonic() + policy.ttl if policy.ttl is not None else None
+        self._entries[key] = (result, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tool_name: Optional[str] = None, session_id: Optional[str] = None) -> None:
+        """
+        Removes cached results: those of a tool, those of a session, both, or all of them.
+        """
+        if tool_name is None and session_id is None:
+            self._entries.clear()
+            return
+        for key in list(self._entries):
+            key_tool = key[2] if key[0] == "session" else key[1]
+            key_session = key[1] if key[0] == "session" else None
+            if (tool_name is None or key_tool == tool_name) and (session_id is None or key_session == session_id):
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns the size of the cache, its hit and eviction counters and the hits and misses of each tool."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "tools": {
+                name: {"hits": self.tool_hits[name], "misses": self.tool_misses[name]}
+                for name in sorted(set(self.tool_hits) | set(self.tool_misses))
+            },
+        }
@@ -0,0 +1,149 @@
+"""
+This module provides relevance-based selection of the tools sent to the model.
+
+Every completion request carries the schema of every local function and of every tool of every connected MCP
+server, which costs prompt tokens and model latency on each turn. `ToolSelector` ranks the tools against the
+recent conversation with a local lexical index over their names and descriptions and keeps the best `max_tools`,
+plus pinned tools and the tools the conversation already used. When the model calls a tool that does not exist,
+presumably looking for one it was not shown, the next request sends the full set again.
+
+The selector requires NumPy (`pip install monkai-agent[routing]`).
+"""
+
+import fnmatch
+import json
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .lexical_index import HashedNgramVectorizer, LexicalIndex, _require_numpy
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used when no tokenizer is given."""
+    return max(1, len(text) // 4)
+
+
+def _tool_name(tool: dict) -> str:
+    return tool.get("function", {}).get("name", "")
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content if isinstance(content, str) else ""
+
+
+class ToolSelector:
+    """
+    Chooses the subset of tools sent with each completion request.
+    """
+
+    def __init__(self, max_tools: int = 8, pinned: Optional[Sequence[str]] = ("transfer_to_*",),
+                 history_messages: int = 4, count_tokens: Optional[Callable[[str], int]] = None,
+                 vectorizer: Optional[HashedNgramVectorizer] = None, max_indexes: int = 32):
+        """
+        Args:
+            max_tools: Number of ranked tools sent, in addition to the pinned and already used tools.
+            pinned: Names or shell-style patterns of tools that are always sent. By default the
+                transfer functions, so agents can always hand the conversation over.
+            history_messages: Number of recent user and assistant messages the tools are ranked against.
+            count_tokens: Function counting the tokens of a text, used to report the tokens saved.
+                Defaults to an estimate of four characters per token.
+            vectorizer: The vectorizer to use. Defaults to a `HashedNgramVectorizer`.
+            max_indexes: Number of tool sets whose index is kept, e.g. one per agent.
+        """
+        _require_numpy()
+        self.max_tools = max_tools
+        self.pinned = list(pinned or [])
+        self.history_messages = history_messages
+        self.count_tokens = count_tokens or _estimate_tokens
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[tuple, LexicalIndex]" = OrderedDict()
+        self._tokens: Dict[tuple, int] = {}
+        self.requests = 0
+        self.subset_requests = 0
+        self.fallbacks = 0
+        self.tools_offered = 0
+        self.tools_sent = 0
+        self.saved_tokens = 0
+
+    def _index(self, tools: List[dict]) -> LexicalIndex:
+        key = tuple((_tool_name(tool), tool.get("function", {}).get("description", "")) for tool in tools)
+        index = self._indexes.get(key)
+        if index is None:
+            documents = [f"{name.replace('_', ' ')}. {description}" for name, description in key]
+            index = self._indexes[key] = LexicalIndex(documents, self.vectorizer)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(key)
+        return index
+
+    def _tool_tokens(self, tool: dict) -> int:
+        key = (_tool_name(tool), tool.get("function", {}).get("description", ""))
+        if key not in self._tokens:
+            self._tokens[key] = self.count_tokens(json.dumps(tool))
+        return self._tokens[key]
+
+    def _is_pinned(self, name: str) -> bool:
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in self.pinned)
+
+    @staticmethod
+    def _used_tools(messages: List[dict]) -> Tuple[Set[str], Set[str]]:
+        """Returns the tools called in the conversation and the ones called in its last assistant turn."""
+        used, last = set(), set()
+        for message in messages:
+            if message.get("role") == "assistant" and message.get("tool_calls"):
+                last = {call.get("function", {}).get("name", "") for call in message["tool_calls"]}
+                used |= last
+            elif message.get("role") == "user":
+                last = set()
+        return used, last
+
+    def select(self, tools: List[dict], messages: List[dict]) -> List[dict]:
+        """
+        Returns the tools to send with a request, in their original order.
+
+        The full set is sent when the agent has few tools, when the conversation has no text to
+        rank against, and when the last assistant turn called a tool that does not exist (the
+        model was probably looking for a tool it was not shown).
+
+        Args:
+            tools: Every tool available to the agent, in the function-calling format.
+            messages: The messages of the request.
+        """
+        self.requests += 1
+        self.tools_offered += len(tools)
+        used, last_calls = self._used_tools(messages)
+        unknown = last_calls - {_tool_name(tool) for tool in tools}
+        recent = [
+            _message_text(message) for message in messages if message.get("role") in ("user", "assistant")
+        ][-self.history_messages:]
+        if unknown or len(tools) <= self.max_tools or not any(recent):
+            self.fallbacks += int(bool(unknown))
+            self.tools_sent += len(tools)
+            return tools
+
+        keep = {position for position, _ in self._index(tools).top_k(" ".join(recent), self.max_tools)}
+        keep.update(
+            position for position, tool in enumerate(tools)
+            if self._is_pinned(_tool_name(tool)) or _tool_name(tool) in used
+        )
+        selected = [tool for position, tool in enumerate(tools) if position in keep]
+        self.subset_requests += 1
+        self.tools_sent += len(selected)
+        self.saved_tokens += sum(self._tool_tokens(tool) for position, tool in enumerate(tools) if position not in keep)
+        return selected
+
+    def get_stats(self) -> Dict[str, float]:
+        """Returns how many requests were reduced, the tools offered and sent, and the prompt tokens saved."""
+        return {
+            "requests": self.requests,
+            "subset_requests": self.subset_requests,
+            "fallbacks": self.fallbacks,
+            "tools_offered": self.tools_offered,
+            "tools_sent": self.tools_sent,
+            "saved_tokens": self.saved_tokens,
+        }
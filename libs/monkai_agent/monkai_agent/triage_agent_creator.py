@@ -7,13 +7,45 @@ Key Features:
 - Centralized Decision-Making: Streamlines the process of determining agent responsibilities, reducing complexity in multi-agent systems.
 - Enhanced User Experience: Ensures users are directed to the correct agent promptly, minimizing delays and miscommunication.
 - Customizable and Scalable: The triage logic is flexible and can adapt to various application scenarios, making it suitable for projects of any scale.
+- Hierarchical Triage: Large catalogs can be grouped into categories, declared or clustered from the briefings, so each triage stage only carries a few briefings and transfer functions. The tokens saved by each routing decision, net of the conversation sent again to the second stage, are reported.
 This module exemplifies the innovation and practicality at the core of MonkAI, delivering a robust solution for efficient agent orchestration.
 
 """
 
 
+import json
+import math
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
 from .monkai_agent_creator import MonkaiAgentCreator, TransferTriageAgentCreator
 from .types import Agent
+from .util import function_to_json
+
+OTHER_CATEGORY = "Other"
+"""Category of the creators that are not listed in any declared category."""
+
+# Tokens of the conversation sent with the last category triage request of the current run
+_stage_conversation_tokens: ContextVar[int] = ContextVar("triage_stage_conversation_tokens", default=0)
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) used when no tokenizer is given."""
+    return max(1, len(text) // 4)
+
+
+def _triage_instructions(briefing: str) -> str:
+    return f"""
+            You are a triage agent who, given an initial conversation with the user, determines which agent is the most suitable to handle the user's request and transfers the conversation to that agent.
+            Do not share your reasoning process with the user! Do not make irrational assumptions on behalf of the user. Do not share the agent transfer process with the user. 
+            
+            Briefing:
+ 
+                {briefing}
+            Guardrails:
+                - Do not respond to questions that are outside the established context.    
+            """
 
 class TriageAgentCreator(MonkaiAgentCreator):
     """
@@ -24,32 +56,132 @@ class TriageAgentCreator(MonkaiAgentCreator):
     provides methods to create the triage agent and to provide a description of
     its capabilities.
 
+    The triage agent is built on first use. The agent and briefing of each creator are
+    fetched once and cached, so adding or removing creators only fetches the new ones.
+
     """
-    def __init__(self, agents_creator:list[MonkaiAgentCreator]):
+    def __init__(self, agents_creator:list[MonkaiAgentCreator], categories: Optional[Dict[str, List[MonkaiAgentCreator]]] = None,
+                 max_agents_per_stage: Optional[int] = None, count_tokens: Optional[Callable[[str], int]] = None,
+                 max_routing_reports: int = 1000):
+       """
+       Args:
+           agents_creator: The creators the triage agent transfers to.
+           categories: Optional grouping of the creators by category name. When given, triage runs in two
+               stages: a root agent picks the category and the category agent picks the specialist.
+               Creators not listed in any category are grouped in the `OTHER_CATEGORY` category.
+           max_agents_per_stage: When set and there are more creators than this and no `categories`, the
+               creators are clustered by briefing into categories of about this size (requires numpy).
+           count_tokens: Function counting the tokens of a text, used for the token savings report.
+               Defaults to an estimate of four characters per token.
+           max_routing_reports: Number of routing decisions kept in `routing_reports`.
+       """
        super().__init__()
-       self.agents_creator = agents_creator
-       self.__build_agent()
-       for creator in self.agents_creator:
-           if creator.predecessor_agent is None:
-                creator.predecessor_agent = self.triage_agent
-           if isinstance(creator, TransferTriageAgentCreator):
-               creator.triage_agent = self.triage_agent
-       
-    def __create_transfer_function(self, agent_creator:MonkaiAgentCreator):
+       self.agents_creator = list(agents_creator)
+       self.categories = {name: list(creators) for name, creators in categories.items()} if categories else None
+       self.max_agents_per_stage = max_agents_per_stage
+       self.count_tokens = count_tokens or _estimate_tokens
+       self.category_agents: Dict[str, Agent] = {}
+       self.routing_reports = deque(maxlen=max_routing_reports)
+       self.saved_tokens = 0
+       self.__entries: Dict[int, Optional[dict]] = {}
+       self.__triage_agent: Optional[Agent] = None
+       self.__stale = True
+       self.__prompt_tokens: Optional[Dict[str, int]] = None
+       for agent_creator in self.agents_creator:
+           self.__register(agent_creator)
+
+    @property
+    def triage_agent(self) -> Agent:
+        """
+        The triage agent, built or updated on access when the creators changed.
+        """
+        if self.__stale:
+            self.__build_agent()
+        return self.__triage_agent
+
+    @triage_agent.setter
+    def triage_agent(self, agent: Agent) -> None:
+        """
+        Replaces the triage agent and points the creators to it. It is updated in place when the
+        creators change.
+        """
+        previous, self.__triage_agent = self.__triage_agent, agent
+        self.__stale = False
+        for entry in self.__entries.values():
+            if entry is None:
+                continue
+            agent_creator = entry["creator"]
+            if previous is not None and agent_creator.predecessor_agent is previous:
+                agent_creator.predecessor_agent = None
+            self.__link_creator(agent_creator)
+
+    def __register(self, agent_creator: MonkaiAgentCreator) -> None:
+        """Lets creators that transfer back to triage resolve the triage agent before it is built."""
+        if isinstance(agent_creator, TransferTriageAgentCreator) and agent_creator.triage_agent_creator is None:
+            agent_creator.triage_agent_creator = self
+
+    def __entry(self, agent_creator: MonkaiAgentCreator) -> Optional[dict]:
+        """
+        Returns the cached agent, briefing and transfer function of a creator, fetching them on
+        first use. Creators that do not return an `Agent` are cached as None and skipped.
+        """
+        key = id(agent_creator)
+        if key not in self.__entries:
+            self.__register(agent_creator)
+            agent = agent_creator.get_agent()
+            if not isinstance(agent, Agent):
+                self.__entries[key] = None
+            else:
+                briefing = agent_creator.get_agent_briefing()
+                self.__entries[key] = {
+                    "creator": agent_creator,
+                    "agent": agent,
+                    "briefing": briefing,
+                    "line": f"- **Transfer to `{agent.name}`** if the user's query is about: {briefing}\n\n",
+                    "transfer": self.__create_transfer_function(agent_creator, agent.name),
+                }
+        return self.__entries[key]
+
+    def __create_transfer_function(self, agent_creator:MonkaiAgentCreator, agent_name: str):
         """
         Creates a transfer function for the given agent creator.
 
         Args:
             agent_creator (MonkaiAgentCreator): The agent creator for which to create the transfer function.
+            agent_name (str): The name of the creator's agent.
 
         Returns:
             Callable: A function that transfers the conversation to the specified agent.
         """
         def transfer_function():
-            return agent_creator.get_agent()
-        transfer_function.__name__ = f"transfer_to_{agent_creator.get_agent().name.replace(' ', '_')}"
+            entry = self.__entries.get(id(agent_creator))
+            agent = entry["agent"] if entry else agent_creator.get_agent()
+            category = entry.get("category") if entry else None
+            if category is not None:
+                self.__record_routing(category, agent.name)
+            return agent
+        transfer_function.__name__ = f"transfer_to_{agent_name.replace(' ', '_')}"
         return transfer_function
- 
+
+    def __link_creator(self, agent_creator: MonkaiAgentCreator) -> None:
+        """Points the creator back to the triage agent."""
+        if agent_creator.predecessor_agent is None:
+            agent_creator.predecessor_agent = self.__triage_agent
+        if isinstance(agent_creator, TransferTriageAgentCreator):
+            agent_creator.triage_agent = self.__triage_agent
+            agent_creator.triage_agent_creator = self
+
+    def __update_agent(self, agent: Optional[Agent], name: str, briefing: str, functions: list) -> Agent:
+        """
+        Creates a triage agent or updates an existing one in place, so the references held by
+        creators and running conversations stay valid.
+        """
+        if agent is None:
+            return Agent(name=name, instructions=_triage_instructions(briefing), functions=functions)
+        agent.instructions = _triage_instructions(briefing)
+        agent.functions = functions
+        return agent
+
     def __build_agent(self):
         """
         Builds the triage agent by aggregating instructions and functions from all agent creators.
@@ -57,32 +189,221 @@ class TriageAgentCreator(MonkaiAgentCreator):
         This method constructs the triage agent with specific instructions on when to transfer
         the conversation to each specific agent based on the user's query.
         """
-        instructions = ""
-        functions = []
-        print("Building triage agent")
-        print(self.agents_creator)
-        for agent_creator in self.agents_creator:
-            agent = agent_creator.get_agent()
-            if not  isinstance(agent, Agent):
+        entries = [entry for entry in map(self.__entry, self.agents_creator) if entry is not None]
+        self.__prompt_tokens = None
+        if self.categories or (self.max_agents_per_stage and len(entries) > self.max_agents_per_stage):
+            self.__build_hierarchy(entries)
+        else:
+            for entry in entries:
+                entry.pop("category", None)
+            self.category_agents = {}
+            self.__triage_agent = self.__update_agent(
+                self.__triage_agent, "Triage Agent",
+                "".join(entry["line"] for entry in entries), [entry["transfer"] for entry in entries]
+            )
+        self.__stale = False
+        for entry in entries:
+            self.__link_creator(entry["creator"])
+
+    def __count_prompt_tokens(self, instructions: str, functions: list) -> int:
+        """Counts the tokens a triage stage adds to the request: its instructions and tool schemas."""
+        tools = json.dumps([function_to_json(f) for f in functions])
+        return self.count_tokens(instructions) + self.count_tokens(tools)
+
+    def __group_entries(self, entries: List[dict]) -> Dict[str, List[dict]]:
+        """
+        Returns the entries grouped by the declared categories or, without them, clustered by the
+        similarity of their briefings.
+        """
+        groups: Dict[str, List[dict]] = {}
+        if self.categories:
+            for category, creators in self.categories.items():
+                groups[category] = [entry for entry in map(self.__entry, creators) if entry is not None]
+            listed = {id(entry["creator"]) for members in groups.values() for entry in members}
+            unlisted = [entry for entry in entries if id(entry["creator"]) not in listed]
+            if unlisted:
+                groups.setdefault(OTHER_CATEGORY, []).extend(unlisted)
+            return groups
+        from .lexical_index import LexicalIndex
+        index = LexicalIndex([f"{entry['agent'].name}. {entry['briefing']}" for entry in entries])
+        labels = index.cluster(math.ceil(len(entries) / self.max_agents_per_stage))
+        for entry, label in zip(entries, labels):
+            groups.setdefault(f"Category {label + 1}", []).append(entry)
+        return groups
+
+    def __build_hierarchy(self, entries: List[dict]):
+        """
+        Builds a root triage agent that transfers to one triage agent per category, each of which
+        transfers to the specialists of its category. Each stage only carries the briefings and
+        transfer functions of its own options.
+        """
+        root_instructions = ""
+        root_functions = []
+        category_agents = {}
+        for category, members in self.__group_entries(entries).items():
+            if not members:
                 continue
-            functions.append(self.__create_transfer_function(agent_creator))
-            print(agent.name)
-            print(agent_creator.get_agent_briefing())
-            instructions += f"- **Transfer to `{agent.name}`** if the user's query is about: {agent_creator.get_agent_briefing()}\n\n"
-        self.triage_agent = Agent(
-            name="Triage Agent",
-            instructions=f"""
-            You are a triage agent who, given an initial conversation with the user, determines which agent is the most suitable to handle the user's request and transfers the conversation to that agent.
-            Do not share your reasoning process with the user! Do not make irrational assumptions on behalf of the user. Do not share the agent transfer process with the user. 
-            
-            Briefing:
- 
-                {instructions}
-            Guardrails:
-                - Do not respond to questions that are outside the established context.    
-            """,
-            functions=functions
-        )
+            summaries = []
+            for entry in members:
+                entry["category"] = category
+                summaries.append(f"{entry['agent'].name} ({' '.join(entry['briefing'].split()[:12])})")
+            category_agents[category] = self.__update_agent(
+                self.category_agents.get(category), f"{category} Triage",
+                "".join(entry["line"] for entry in members),
+                [entry["transfer"] for entry in members] + [self.__create_back_transfer_function()]
+            )
+            root_functions.append(self.__create_category_transfer_function(category, category_agents[category]))
+            root_instructions += f"- **Transfer to `{category}`** if the user's query is about: {'; '.join(summaries)}\n\n"
+        self.category_agents = category_agents
+        self.__triage_agent = self.__update_agent(self.__triage_agent, "Triage Agent", root_instructions, root_functions)
+
+    def __create_category_transfer_function(self, category: str, category_agent: Agent):
+        def transfer_function():
+            return category_agent
+        transfer_function.__name__ = f"transfer_to_{category.replace(' ', '_')}"
+        return transfer_function
+
+    def __create_back_transfer_function(self):
+        def transfer_to_triage():
+            """Transfers the conversation back to the triage agent when no agent of this category fits."""
+            return self.__triage_agent
+        return transfer_to_triage
+
+    def __get_prompt_tokens(self) -> Dict[str, int]:
+        """Counts, once per build, the prompt tokens of a flat triage agent and of each stage."""
+        if self.__prompt_tokens is None:
+            entries = [entry for entry in map(self.__entry, self.agents_creator) if entry is not None]
+            tokens = {"flat": self.__count_prompt_tokens(
+                _triage_instructions("".join(entry["line"] for entry in entries)),
+                [entry["transfer"] for entry in entries],
+            )}
+            tokens["root"] = self.__count_prompt_tokens(self.triage_agent.instructions, self.triage_agent.functions)
+            for category, agent in self.category_agents.items():
+                tokens[category] = self.__count_prompt_tokens(agent.instructions, agent.functions)
+            self.__prompt_tokens = tokens
+        return self.__prompt_tokens
+
+    def record_stage_request(self, agent: Agent, messages: List[dict]) -> None:
+        """
+        Records the size of the conversation sent with a request of a category triage agent. The
+        `AgentManager` calls it for every request; requests of other agents are ignored.
+        """
+        if any(agent is category_agent for category_agent in self.category_agents.values()):
+            conversation = [message for message in messages if message.get("role") != "system"]
+            _stage_conversation_tokens.set(self.count_tokens(json.dumps(conversation, default=str)))
+
+    def __record_routing(self, category: str, agent_name: str) -> None:
+        """
+        Records the tokens saved by a routing decision of the hierarchical triage. The second stage
+        sends the conversation again, so its tokens are counted against the savings.
+        """
+        tokens = self.__get_prompt_tokens()
+        conversation_tokens = _stage_conversation_tokens.get()
+        hierarchical_tokens = tokens["root"] + tokens[category] + conversation_tokens
+        saved = tokens["flat"] - hierarchical_tokens
+        self.saved_tokens += saved
+        self.routing_reports.append({
+            "category": category,
+            "agent": agent_name,
+            "flat_prompt_tokens": tokens["flat"],
+            "hierarchical_prompt_tokens": hierarchical_tokens,
+            "second_stage_conversation_tokens": conversation_tokens,
+            "saved_tokens": saved,
+        })
+
+    def add_creator(self, agent_creator: MonkaiAgentCreator, category: Optional[str] = None) -> None:
+        """
+        Adds an agent creator. Only the new creator's agent and briefing are fetched; the triage
+        agent is updated in place on its next use.
+
+        Args:
+            agent_creator: The creator to add.
+            category: The category of the creator when categories are declared.
+
+        Raises:
+            ValueError: If categories are declared and `category` is not given.
+        """
+        if self.categories is not None:
+            if category is None:
+                raise ValueError("A category is required when triage categories are declared")
+            self.categories.setdefault(category, []).append(agent_creator)
+        self.agents_creator.append(agent_creator)
+        self.__register(agent_creator)
+        self.__stale = True
+
+    def remove_creator(self, agent_creator: MonkaiAgentCreator) -> None:
+        """
+        Removes an agent creator and its cached agent. The triage agent is updated in place on
+        its next use.
+        """
+        self.agents_creator[:] = [c for c in self.agents_creator if c is not agent_creator]
+        if self.categories is not None:
+            for creators in self.categories.values():
+                creators[:] = [c for c in creators if c is not agent_creator]
+        self.__entries.pop(id(agent_creator), None)
+        self.__stale = True
+
+    def refresh_creator(self, agent_creator: MonkaiAgentCreator) -> None:
+        """
+        Drops the cached agent and briefing of a creator, e.g. after its prompt changed, so they
+        are fetched again on the next use of the triage agent.
+        """
+        self.__entries.pop(id(agent_creator), None)
+        self.__stale = True
+
+    def get_creator_agent(self, agent_creator: MonkaiAgentCreator) -> Optional[Agent]:
+        """
+        Returns the cached agent of a creator.
+        """
+        entry = self.__entry(agent_creator)
+        return entry["agent"] if entry else None
+
+    def get_routing_signature(self) -> tuple:
+        """
+        Returns the identity, agent name and briefing of each creator. It changes when a creator is
+        added, removed or refreshed with a different agent name or briefing.
+        """
+        signature = []
+        for agent_creator in self.agents_creator:
+            entry = self.__entry(agent_creator)
+            signature.append((id(agent_creator), entry["agent"].name, entry["briefing"]) if entry else (id(agent_creator),))
+        return tuple(signature)
+
+    def find_agent(self, name: str) -> Optional[Agent]:
+        """
+        Returns the cached agent with the given name, if one of the creators provides it.
+        """
+        for agent_creator in self.agents_creator:
+            entry = self.__entry(agent_creator)
+            if entry is not None and entry["agent"].name == name:
+                return entry["agent"]
+        return None
+
+    def is_triage_agent(self, agent: Agent) -> bool:
+        """
+        Check if the agent is the triage agent or one of the category triage agents.
+        """
+        if agent is None:
+            return False
+        names = {self.triage_agent.name, *(a.name for a in self.category_agents.values())}
+        return agent.name in names
+
+    def get_routing_stats(self) -> Dict[str, float]:
+        """
+        Returns the prompt size of each triage stage and the tokens saved by the recorded routing
+        decisions compared with a single triage prompt holding every agent.
+        """
+        tokens = self.__get_prompt_tokens()
+        decisions = len(self.routing_reports)
+        return {
+            "hierarchical": bool(self.category_agents),
+            "flat_prompt_tokens": tokens["flat"],
+            "root_prompt_tokens": tokens["root"],
+            "category_prompt_tokens": {category: tokens[category] for category in self.category_agents},
+            "decisions": decisions,
+            "saved_tokens": self.saved_tokens,
+            "mean_saved_tokens": self.saved_tokens / decisions if decisions else 0.0,
+        }
 
     def get_agent(self)->Agent:
         """
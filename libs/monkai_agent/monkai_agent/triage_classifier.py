@@ -0,0 +1,170 @@
+"""
+This module provides a local fast path for triage.
+
+The LLM triage agent built by `TriageAgentCreator` spends a full completion, with every briefing in the prompt,
+just to pick a `transfer_to_*` function. `LocalTriageClassifier` scores the user message against each creator's
+briefing with a hashed n-gram TF-IDF model and, when the best agent is a clear winner, the `AgentManager` starts
+the run at that agent directly. Ambiguous messages still go to the LLM triage agent, whose choice is recorded to
+measure the accuracy of the classifier.
+"""
+
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .lexical_index import LexicalIndex, HashedNgramVectorizer
+from .monkai_agent_creator import MonkaiAgentCreator
+from .types import Agent, TriageDecision
+
+
+class LocalTriageClassifier:
+    """
+    Routes user messages to agent creators by lexical similarity with their briefings.
+
+    A message is routed when its similarity with the best agent is at least `min_confidence`
+    and exceeds the second best by at least `min_margin`.
+    """
+
+    def __init__(self, agents_creators: List[MonkaiAgentCreator], min_confidence: float = 0.2,
+                 min_margin: float = 0.1, examples: Optional[Dict[str, List[str]]] = None,
+                 vectorizer: Optional[HashedNgramVectorizer] = None,
+                 resolve_agent: Optional[Callable[[MonkaiAgentCreator], Optional[Agent]]] = None):
+        """
+        Args:
+            agents_creators: The creators the triage agent transfers to.
+            min_confidence: Minimum similarity of the best agent to route without the LLM.
+            min_margin: Minimum difference between the best and the second best similarity.
+            examples: Optional example messages by agent name, indexed alongside the briefings.
+            vectorizer: The vectorizer to use. Defaults to a `HashedNgramVectorizer`.
+            resolve_agent: Returns the agent of a creator. The `AgentManager` sets the lookup of its
+                triage creator, so routed runs use the agents it builds once and caches. Defaults to
+                `creator.get_agent()`.
+        """
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.examples = examples or {}
+        self.vectorizer = vectorizer
+        self.resolve_agent = resolve_agent
+        self.requests = 0
+        self.routed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.shadow_evaluations = 0
+        self.shadow_correct = 0
+        self.fit(agents_creators)
+
+    def fit(self, agents_creators: List[MonkaiAgentCreator]) -> None:
+        """
+        Sets the creators to route to. The index is (re)built from their briefings on the next
+        classification, so no agent is resolved before a message is routed.
+        """
+        self._agents_creators = list(agents_creators)
+        self.creators: Dict[str, MonkaiAgentCreator] = {}
+        self._owners: List[str] = []
+        self.index: Optional[LexicalIndex] = None
+
+    def _agent_of(self, creator: MonkaiAgentCreator) -> Optional[Agent]:
+        return self.resolve_agent(creator) if self.resolve_agent is not None else creator.get_agent()
+
+    def _ensure_index(self) -> None:
+        if self.index is not None:
+            return
+        documents = []
+        for creator in self._agents_creators:
+            agent = self._agent_of(creator)
+            if not isinstance(agent, Agent):
+                continue
+            self.creators[agent.name] = creator
+            for text in [creator.get_agent_briefing(), *self.examples.get(agent.name, [])]:
+                documents.append(text)
+                self._owners.append(agent.name)
+        self.index = LexicalIndex(documents, self.vectorizer)
+
+    def classify(self, message: str) -> TriageDecision:
+        """
+        Scores a message against every agent.
+
+        Returns:
+            TriageDecision: The best agent, its confidence and whether it should be routed directly.
+        """
+        self._ensure_index()
+        started_at = time.perf_counter()
+        scores: Dict[str, float] = {}
+        for owner, score in zip(self._owners, self.index.scores(message).tolist()):
+            scores[owner] = max(score, scores.get(owner, 0.0))
+        ranking = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        decision = TriageDecision(scores=scores)
+        if ranking:
+            decision.agent_name, decision.confidence = ranking[0]
+            decision.margin = decision.confidence - (ranking[1][1] if len(ranking) > 1 else 0.0)
+            decision.routed = decision.confidence >= self.min_confidence and decision.margin >= self.min_margin
+        decision.latency = time.perf_counter() - started_at
+
+        self.requests += 1
+        self.routed += int(decision.routed)
+        self.total_latency += decision.latency
+        self.max_latency = max(self.max_latency, decision.latency)
+        return decision
+
+    def route(self, message: str) -> Tuple[Optional[Agent], TriageDecision]:
+        """
+        Classifies a message and returns the agent to start at, or None to use the LLM triage agent.
+        """
+        decision = self.classify(message)
+        if not decision.routed:
+            return None, decision
+        return self._agent_of(self.creators[decision.agent_name]), decision
+
+    def record_outcome(self, decision: TriageDecision, agent_name: Optional[str]) -> None:
+        """
+        Records the agent chosen by the LLM triage agent for a message that was not routed locally,
+        to measure how often the classifier agrees with it.
+        """
+        if decision.routed or agent_name not in self.creators:
+            return
+        self.shadow_evaluations += 1
+        self.shadow_correct += int(decision.agent_name == agent_name)
+
+    def evaluate(self, labeled_messages: Sequence[Tuple[str, str]]) -> Dict[str, float]:
+        """
+        Measures the classifier against messages labeled with the expected agent name.
+        Evaluation does not change the runtime statistics.
+
+        Returns:
+            dict: `coverage` (share routed locally), `accuracy` (share of routed messages sent to the
+            expected agent), `top1_accuracy` (share of all messages whose best agent is the expected one)
+            and `mean_latency` in seconds.
+        """
+        saved = (self.requests, self.routed, self.total_latency, self.max_latency)
+        routed = correct_routed = correct = 0
+        latency = 0.0
+        for message, expected in labeled_messages:
+            decision = self.classify(message)
+            latency += decision.latency
+            correct += int(decision.agent_name == expected)
+            if decision.routed:
+                routed += 1
+                correct_routed += int(decision.agent_name == expected)
+        self.requests, self.routed, self.total_latency, self.max_latency = saved
+        total = len(labeled_messages)
+        return {
+            "coverage": routed / total if total else 0.0,
+            "accuracy": correct_routed / routed if routed else 0.0,
+            "top1_accuracy": correct / total if total else 0.0,
+            "mean_latency": latency / total if total else 0.0,
+        }
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Returns the runtime statistics: how many messages were classified and routed locally, the
+        classification latency and the agreement with the LLM triage agent on the fallbacks.
+        """
+        return {
+            "requests": self.requests,
+            "routed": self.routed,
+            "fallbacks": self.requests - self.routed,
+            "route_rate": self.routed / self.requests if self.requests else 0.0,
+            "mean_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "max_latency": self.max_latency,
+            "shadow_evaluations": self.shadow_evaluations,
+            "shadow_accuracy": self.shadow_correct / self.shadow_evaluations if self.shadow_evaluations else 0.0,
+        }
@@ -10,7 +10,7 @@ from openai.types.chat.chat_completion_message_tool_call import (
     ChatCompletionMessageToolCall,
     Function,
 )
-from typing import Any, List, Callable, Union, Optional, Coroutine
+from typing import Any, List, Callable, Literal, Union, Optional, Coroutine
 from enum import Enum
 # Third-party imports
 from pydantic import BaseModel
@@ -128,6 +128,104 @@ class Agent(BaseModel):
     """Presence penalty for token generation"""
     
 
+class StreamMetrics(BaseModel):
+    """
+    Latency metrics of a single streamed completion. Times are in seconds.
+
+    """
+    time_to_first_token: Optional[float] = None
+    """
+    Time from sending the request to receiving the first delta
+    """
+    inter_chunk_latency_mean: Optional[float] = None
+    """
+    Mean time between consecutive deltas
+    """
+    inter_chunk_latency_p50: Optional[float] = None
+    """
+    Median time between consecutive deltas
+    """
+    inter_chunk_latency_p95: Optional[float] = None
+    """
+    95th percentile of the time between consecutive deltas
+    """
+    inter_chunk_latency_max: Optional[float] = None
+    """
+    Longest stall between consecutive deltas
+    """
+    chunk_count: int = 0
+    """
+    Number of deltas received
+    """
+    output_tokens: int = 0
+    """
+    Number of generated tokens (reported usage, tokenizer count or delta count)
+    """
+    tokens_per_second: Optional[float] = None
+    """
+    Generation rate after the first token
+    """
+    duration: Optional[float] = None
+    """
+    Time from sending the request to the end of the stream
+    """
+
+
+class TriageDecision(BaseModel):
+    """
+    Decision of the local triage classifier for a user message.
+
+    """
+    agent_name: Optional[str] = None
+    """
+    Name of the best scoring agent
+    """
+    confidence: float = 0.0
+    """
+    Similarity between the message and the best scoring agent, between 0 and 1
+    """
+    margin: float = 0.0
+    """
+    Difference between the best and the second best similarity
+    """
+    routed: bool = False
+    """
+    True if the confidence was high enough to skip the LLM triage agent
+    """
+    latency: float = 0.0
+    """
+    Classification time in seconds
+    """
+    scores: dict = {}
+    """
+    Similarity of each agent, by agent name
+    """
+
+
+class ToolCachePolicy(BaseModel):
+    """
+    Caching policy of a tool whose results can be reused for identical arguments.
+
+    """
+    ttl: Optional[float] = 300.0
+    """
+    Seconds a result stays valid. None keeps it until it is evicted
+    """
+    scope: Literal["session", "global"] = "session"
+    """
+    Whether results are shared within a conversation or between all conversations
+    """
+    max_result_size: Optional[int] = None
+    """
+    Results longer than this many characters are not cached
+    """
+    context_keys: Optional[List[str]] = None
+    """
+    Context variables read by a function that takes `context_variables`; their values are part of
+    the cache key. None keys the results by all the context variables
+    """
+
+
 class Response(BaseModel):
     """
     Represents a response from an agent.
@@ -164,6 +262,10 @@ class Response(BaseModel):
     """
     Total tokens used across ALL completions in the run (sum of all input + output from each completion)
     """
+    stream_metrics: List[StreamMetrics] = []
+    """
+    Latency metrics of each streamed completion in the run, in order. Empty for non-streaming runs.
+    """
 
 
 class Result(BaseModel):
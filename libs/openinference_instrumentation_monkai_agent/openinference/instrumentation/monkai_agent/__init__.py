@@ -11,6 +11,7 @@ from openinference.instrumentation import OITracer, TraceConfig
 from openinference.instrumentation.monkai_agent._wrappers import (
     _OpenAIProviderWrapper,
     _AzureProviderWrapper,
+    _AsyncProviderWrapper,
     _BaseProviderWrapper
 )
 from openinference.instrumentation.monkai_agent.version import __version__
@@ -23,7 +24,13 @@ _instruments = ("monkai_agent >= 0.0.33",)
 class MonkaiAgentInstrumentor(BaseInstrumentor):  # type: ignore[misc]
     """An instrumentor for the MonkAI agent framework."""
 
-    __slots__ = ("_original_openai_get_completion", "_original_azure_get_completion", "_tracer")
+    __slots__ = (
+        "_original_openai_get_completion",
+        "_original_azure_get_completion",
+        "_original_openai_get_completion_async",
+        "_original_azure_get_completion_async",
+        "_tracer",
+    )
 
     def instrumentation_dependencies(self) -> Collection[str]:
         return _instruments
@@ -41,19 +48,33 @@ class MonkaiAgentInstrumentor(BaseInstrumentor):  # type: ignore[misc]
         )
 
         # Wrap OpenAI provider
+        openai_wrapper = _OpenAIProviderWrapper(tracer=self._tracer)
         self._original_openai_get_completion = OpenAIProvider.get_completion
         wrap_function_wrapper(
             module="monkai_agent.providers",
             name="OpenAIProvider.get_completion",
-            wrapper=_OpenAIProviderWrapper(tracer=self._tracer),
+            wrapper=openai_wrapper,
+        )
+        self._original_openai_get_completion_async = OpenAIProvider.get_completion_async
+        wrap_function_wrapper(
+            module="monkai_agent.providers",
+            name="OpenAIProvider.get_completion_async",
+            wrapper=_AsyncProviderWrapper(tracer=self._tracer, provider_wrapper=openai_wrapper),
         )
 
         # Wrap Azure provider
+        azure_wrapper = _AzureProviderWrapper(tracer=self._tracer)
         self._original_azure_get_completion = AzureProvider.get_completion
         wrap_function_wrapper(
             module="monkai_agent.providers",
             name="AzureProvider.get_completion",
-            wrapper=_AzureProviderWrapper(tracer=self._tracer),
+            wrapper=azure_wrapper,
+        )
+        self._original_azure_get_completion_async = AzureProvider.get_completion_async
+        wrap_function_wrapper(
+            module="monkai_agent.providers",
+            name="AzureProvider.get_completion_async",
+            wrapper=_AsyncProviderWrapper(tracer=self._tracer, provider_wrapper=azure_wrapper),
         )
 
         # Wrap base LLM provider for any custom implementations
@@ -68,4 +89,8 @@ class MonkaiAgentInstrumentor(BaseInstrumentor):  # type: ignore[misc]
         if self._original_openai_get_completion is not None:
             monkai_module.OpenAIProvider.get_completion = self._original_openai_get_completion
         if self._original_azure_get_completion is not None:
-            monkai_module.AzureProvider.get_completion = self._original_azure_get_completion
\ No newline at end of file
+            monkai_module.AzureProvider.get_completion = self._original_azure_get_completion
+        if self._original_openai_get_completion_async is not None:
+            monkai_module.OpenAIProvider.get_completion_async = self._original_openai_get_completion_async
+        if self._original_azure_get_completion_async is not None:
+            monkai_module.AzureProvider.get_completion_async = self._original_azure_get_completion_async
@@ -1,22 +1,110 @@
 from functools import partial
 from typing import Any, Callable, Dict, Optional
 
+from monkai_agent.streaming import StreamMetricsRecorder
 from openinference.instrumentation import OITracer
+from opentelemetry.trace import Status, StatusCode
 from wrapt import ObjectProxy
 
+
+def _set_stream_attributes(span, recorder: StreamMetricsRecorder, content: str) -> None:
+    """Records the latency profile and the aggregated content of a finished stream on the span."""
+    metrics = recorder.finish()
+    span.set_attribute("ai.response.content", content)
+    span.set_attribute("ai.stream.chunk_count", metrics.chunk_count)
+    span.set_attribute("ai.stream.output_tokens", metrics.output_tokens)
+    span.set_attribute("ai.stream.duration", metrics.duration)
+    for name in (
+        "time_to_first_token",
+        "inter_chunk_latency_mean",
+        "inter_chunk_latency_p50",
+        "inter_chunk_latency_p95",
+        "inter_chunk_latency_max",
+        "tokens_per_second",
+    ):
+        value = getattr(metrics, name)
+        if value is not None:
+            span.set_attribute(f"ai.stream.{name}", value)
+
+
+class _TracedStream(ObjectProxy):
+    """Proxy over a provider stream that keeps the span open until the stream is consumed or closed."""
+
+    def __init__(self, wrapped, span, recorder: StreamMetricsRecorder):
+        super().__init__(wrapped)
+        self._self_span = span
+        self._self_recorder = recorder
+        self._self_content = []
+        self._self_finished = False
+
+    def _record(self, chunk) -> None:
+        self._self_recorder.record_chunk(chunk)
+        if getattr(chunk, "choices", None) and chunk.choices[0].delta.content:
+            self._self_content.append(chunk.choices[0].delta.content)
+
+    def _finish(self, error: Optional[BaseException] = None) -> None:
+        if self._self_finished:
+            return
+        self._self_finished = True
+        _set_stream_attributes(self._self_span, self._self_recorder, "".join(self._self_content))
+        if error is not None:
+            self._self_span.record_exception(error)
+            self._self_span.set_status(Status(StatusCode.ERROR, str(error)))
+        self._self_span.end()
+
+    def __iter__(self):
+        try:
+            for chunk in self.__wrapped__:
+                self._record(chunk)
+                yield chunk
+        except Exception as e:
+            self._finish(e)
+            raise
+        finally:
+            self._finish()
+
+    def close(self):
+        try:
+            return self.__wrapped__.close()
+        finally:
+            self._finish()
+
+
+class _TracedAsyncStream(_TracedStream):
+    """Async counterpart of `_TracedStream` for `AsyncStream` responses."""
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        try:
+            async for chunk in self.__wrapped__:
+                self._record(chunk)
+                yield chunk
+        except Exception as e:
+            self._finish(e)
+            raise
+        finally:
+            self._finish()
+
+    async def close(self):
+        try:
+            return await self.__wrapped__.close()
+        finally:
+            self._finish()
+
+
 class _BaseProviderWrapper:
     """Base wrapper for MonkAI agent LLM providers."""
 
     def __init__(self, tracer: OITracer):
         self._tracer = tracer
 
-    def __call__(
-        self,
-        wrapped: Callable,
-        instance: ObjectProxy,
-        args: tuple,
-        kwargs: Dict[str, Any],
-    ) -> Any:
+    def _provider_attributes(self, instance: Any) -> Dict[str, Any]:
+        """Provider-specific attributes added to every span."""
+        return {}
+
+    def _start_span(self, instance: Any, args: tuple, kwargs: Dict[str, Any]):
         # Extract agent information from kwargs if available
         agent = kwargs.pop('agent', None)  # Remove agent from kwargs since it's not a provider parameter
         model = kwargs.get('model', None)  # Get model but don't remove it as it's needed for the API call
@@ -24,9 +112,10 @@ class _BaseProviderWrapper:
         agent_name = agent.name if agent else "unknown"
         agent_model = agent.model if agent else model or "unknown"
 
-        with self._tracer.start_span(
+        span = self._tracer.start_span(
             name=f"{instance.__class__.__name__}.get_completion",
             attributes={
+                **self._provider_attributes(instance),
                 "ai.model": agent_model,
                 "ai.temperature": kwargs.get("temperature"),
                 "ai.max_tokens": kwargs.get("max_tokens"),
@@ -34,59 +123,108 @@ class _BaseProviderWrapper:
                 "ai.frequency_penalty": kwargs.get("frequency_penalty"),
                 "ai.presence_penalty": kwargs.get("presence_penalty"),
                 "ai.tools_choice": kwargs.get("tools_choice", ""),
+                "ai.stream": bool(kwargs.get("stream")),
                 "monkai.agent.name": agent_name,
                 "monkai.agent.functions": str([f.__name__ for f in agent.functions]) if agent and agent.functions else "[]",
                 "monkai.agent.parallel_tool_calls": str(agent.parallel_tool_calls) if agent else "unknown",
             },
-        ) as span:
-            # Record input messages
-            messages = args[0] if args else kwargs.get("messages", [])
-            for i, msg in enumerate(messages):
-                span.set_attribute(f"ai.request.messages.{i}.role", msg.get("role", ""))
-                span.set_attribute(f"ai.request.messages.{i}.content", str(msg.get("content","")))
+        )
+        # Record input messages
+        messages = args[0] if args else kwargs.get("messages", [])
+        for i, msg in enumerate(messages):
+            span.set_attribute(f"ai.request.messages.{i}.role", msg.get("role", ""))
+            span.set_attribute(f"ai.request.messages.{i}.content", str(msg.get("content","")))
+
+        tools = kwargs.get("tools", [])
+        for i, tool in enumerate(tools):
+            span.set_attribute(f"ai.tools.{i}.function", str(tool.get("function", None)))
+            span.set_attribute(f"ai.tools.{i}.tool_type", str(tool.get("type", "")))
+        return span
 
+    def _record_response(self, span, response: Any) -> None:
+        completion = response.choices[0].message
+        span.set_attribute("ai.response.role", completion.role)
+        span.set_attribute("ai.response.content", completion.content)
+        if completion.tool_calls:
+            span.set_attribute("ai.response.tool_calls", str(completion.tool_calls))
 
-            tools = kwargs.get("tools", [])
-            for i, tool in enumerate(tools):
-                span.set_attribute(f"ai.tools.{i}.function", str(tool.get("function", None)))
-                span.set_attribute(f"ai.tools.{i}.tool_type", str(tool.get("type", "")))
+        # Record usage statistics if available
+        if getattr(response, "usage", None) is not None:
+            span.set_attribute("ai.token_count.prompt", response.usage.prompt_tokens)
+            span.set_attribute("ai.token_count.completion", response.usage.completion_tokens)
+            span.set_attribute("ai.token_count.total", response.usage.total_tokens)
 
+    def _fail(self, span, error: BaseException) -> None:
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+        span.end()
+
+    def __call__(
+        self,
+        wrapped: Callable,
+        instance: ObjectProxy,
+        args: tuple,
+        kwargs: Dict[str, Any],
+    ) -> Any:
+        span = self._start_span(instance, args, kwargs)
+        # Streams are recorded while they are consumed, so the span starts before the request
+        recorder = StreamMetricsRecorder()
+        try:
             response = wrapped(*args, **kwargs)
-            # Record response
-            completion = response.choices[0].message
-            span.set_attribute("ai.response.role", completion.role)
-            span.set_attribute("ai.response.content", completion.content)
-            if completion.tool_calls:
-                span.set_attribute("ai.response.tool_calls", str(completion.tool_calls))
+        except Exception as e:
+            self._fail(span, e)
+            raise
 
-            # Record usage statistics if available
-            if hasattr(response, "usage"):
-                span.set_attribute("ai.token_count.prompt", response.usage.prompt_tokens)
-                span.set_attribute("ai.token_count.completion", response.usage.completion_tokens)
-                span.set_attribute("ai.token_count.total", response.usage.total_tokens)
+        if kwargs.get("stream"):
+            return _TracedStream(response, span, recorder)
+        self._record_response(span, response)
+        span.end()
+        return response
+
+
+class _AsyncProviderWrapper(_BaseProviderWrapper):
+    """Wrapper for the async `get_completion_async` of a provider."""
+
+    def __init__(self, tracer: OITracer, provider_wrapper: _BaseProviderWrapper):
+        super().__init__(tracer)
+        self._provider_wrapper = provider_wrapper
+
+    def _provider_attributes(self, instance: Any) -> Dict[str, Any]:
+        return self._provider_wrapper._provider_attributes(instance)
+
+    async def __call__(self, wrapped, instance, args, kwargs):
+        span = self._start_span(instance, args, kwargs)
+        recorder = StreamMetricsRecorder()
+        try:
+            response = await wrapped(*args, **kwargs)
+        except Exception as e:
+            self._fail(span, e)
+            raise
+
+        if kwargs.get("stream"):
+            if hasattr(response, "__aiter__"):
+                return _TracedAsyncStream(response, span, recorder)
+            return _TracedStream(response, span, recorder)
+        self._record_response(span, response)
+        span.end()
+        return response
 
-            return response
 
 class _OpenAIProviderWrapper(_BaseProviderWrapper):
     """Wrapper for OpenAI provider."""
-    def __call__(self, wrapped, instance, args, kwargs):
+
+    def _provider_attributes(self, instance):
         # Add OpenAI-specific instrumentation attributes
-        with self._tracer.start_span(
-            name="OpenAIProvider.get_completion",
-            attributes={"ai.provider": "openai"}
-        ) as span:
-            return super().__call__(wrapped, instance, args, kwargs)
+        return {"ai.provider": "openai"}
+
 
 class _AzureProviderWrapper(_BaseProviderWrapper):
     """Wrapper for Azure OpenAI provider."""
-    def __call__(self, wrapped, instance, args, kwargs):
+
+    def _provider_attributes(self, instance):
         # Add Azure-specific instrumentation attributes
-        with self._tracer.start_span(
-            name="AzureProvider.get_completion",
-            attributes={
-                "ai.provider": "azure",
-                "ai.azure.endpoint": instance.endpoint,
-                "ai.azure.api_version": instance.api_version
-            }
-        ) as span:
-            return super().__call__(wrapped, instance, args, kwargs)
\ No newline at end of file
+        return {
+            "ai.provider": "azure",
+            "ai.azure.endpoint": instance.endpoint,
+            "ai.azure.api_version": instance.api_version
+        }
@@ -0,0 +1,111 @@
+"""
+Minimal MCP server used by the MCP tests, run over stdio.
+
+The server name, a startup delay and a tool delay can be set with the `MCP_TEST_NAME`,
+`MCP_TEST_STARTUP_DELAY` and `MCP_TEST_TOOL_DELAY` environment variables. Setting `MCP_TEST_LARGE_SIZE`
+adds a large text resource and a binary resource of that size, and setting `MCP_TEST_CACHING` adds a
+subscribable resource and a prompt whose content changes on every read.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from mcp.server.fastmcp import Context, FastMCP
+from pydantic import AnyUrl
+
+time.sleep(float(os.environ.get("MCP_TEST_STARTUP_DELAY", "0")))
+
+server = FastMCP(os.environ.get("MCP_TEST_NAME", "test"))
+
+
+@server.tool()
+async def add(a: int, b: int) -> int:
+    """Add two numbers."""
+    await asyncio.sleep(float(os.environ.get("MCP_TEST_TOOL_DELAY", "0")))
+    return a + b
+
+
+@server.tool()
+def echo(text: str) -> str:
+    """Echo the text back."""
+    return text
+
+
+@server.tool()
+async def enable_multiply(ctx: Context) -> str:
+    """Add a multiply tool and notify the client that the tool list changed."""
+    def multiply(a: int, b: int) -> int:
+        """Multiply two numbers."""
+        return a * b
+
+    server.add_tool(multiply)
+    await ctx.session.send_tool_list_changed()
+    return "multiply enabled"
+
+
+@server.resource("test://greeting")
+def greeting() -> str:
+    """A static greeting."""
+    return "Hello from the test server"
+
+
+if os.environ.get("MCP_TEST_LARGE_SIZE"):
+    LARGE_SIZE = int(os.environ["MCP_TEST_LARGE_SIZE"])
+
+    @server.resource("test://large", mime_type="text/plain")
+    def large() -> str:
+        """A large text, of `MCP_TEST_LARGE_SIZE` characters."""
+        return ("Olá, mundo! " * (LARGE_SIZE // 12 + 1))[:LARGE_SIZE]
+
+    @server.resource("test://blob", mime_type="application/octet-stream")
+    def blob() -> bytes:
+        """A binary blob, of `MCP_TEST_LARGE_SIZE` bytes."""
+        return bytes(i % 256 for i in range(LARGE_SIZE))
+
+
+if os.environ.get("MCP_TEST_CACHING"):
+    renders = {"counter": 0, "persona": 0}
+
+    @server.resource("test://counter")
+    def counter() -> str:
+        """A resource whose content changes on every read."""
+        renders["counter"] += 1
+        return f"read {renders['counter']}"
+
+    @server.tool()
+    async def touch_counter(ctx: Context) -> str:
+        """Notify the client that the counter resource was updated."""
+        await ctx.session.send_resource_updated(AnyUrl("test://counter"))
+        return "touched"
+
+    @server.prompt()
+    def persona(role: str) -> str:
+        """Instructions for a role, numbered by render."""
+        renders["persona"] += 1
+        return json.dumps({"description": f"You are a {role} (render {renders['persona']})"})
+
+    # Accept resource subscriptions and advertise them, which FastMCP does not do by itself
+    @server._mcp_server.subscribe_resource()
+    async def subscribe(uri: AnyUrl) -> None:
+        pass
+
+    _get_capabilities = server._mcp_server.get_capabilities
+
+    def get_capabilities(*args, **kwargs):
+        capabilities = _get_capabilities(*args, **kwargs)
+        capabilities.resources.subscribe = True
+        return capabilities
+
+    server._mcp_server.get_capabilities = get_capabilities
+
+
+@server.prompt()
+def review(code: str) -> str:
+    """Review a piece of code."""
+    return f"Please review: {code}"
+
+
+if __name__ == "__main__":
+    server.run()
@@ -0,0 +1,990 @@
+"""
+Tests for AgentManager
+
+These tests drive AgentManager against a scripted in-memory provider, so no network access is needed.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../libs/monkai_agent'))
+
+import asyncio
+import json
+import threading
+import time
+import httpx
+from openai import BadRequestError, InternalServerError, RateLimitError
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from monkai_agent import AgentManager, Agent, LLMProvider, MonkaiAgentCreator, LocalTriageClassifier, RoutingCache
+from monkai_agent import TriageAgentCreator, ToolSelector, cached_tool, MCPAgent, ResourceInjector
+from monkai_agent import RetryPolicy, RetryBudget, OpenAIProvider, AzureProvider, TransferTriageAgentCreator
+from monkai_agent.streaming import StreamMetricsRecorder
+from monkai_agent.triage_agent_creator import OTHER_CATEGORY
+
+
+def make_completion(content=None, tool_calls=None):
+    """Build a non-streaming ChatCompletion."""
+    message = {"role": "assistant", "content": content}
+    if tool_calls:
+        message["tool_calls"] = [
+            {"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": arguments}}
+            for i, (name, arguments) in enumerate(tool_calls)
+        ]
+    return ChatCompletion.model_validate({
+        "id": "cmpl", "object": "chat.completion", "created": 0, "model": "gpt-4",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": message}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    })
+
+
+def make_usage_chunk(prompt_tokens, completion_tokens, cached_tokens=0):
+    """Build the final chunk of a stream requested with `include_usage`, which has no choices."""
+    return ChatCompletionChunk.model_validate({
+        "id": "chunk", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4", "choices": [],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens,
+                  "prompt_tokens_details": {"cached_tokens": cached_tokens}},
+    })
+
+
+def make_chunks(*pieces):
+    """Build the chunks of a streamed text answer."""
+    chunks = []
+    for i, piece in enumerate(pieces):
+        delta = {"content": piece}
+        if i == 0:
+            delta["role"] = "assistant"
+        chunks.append(ChatCompletionChunk.model_validate({
+            "id": "chunk", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        }))
+    return chunks
+
+
+class ScriptedStream:
+    """An async chunk stream that records how far it was consumed and whether it was closed."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed or self.consumed >= len(self.chunks):
+            raise StopAsyncIteration
+        self.consumed += 1
+        await asyncio.sleep(0)
+        return self.chunks[self.consumed - 1]
+
+    async def close(self):
+        self.closed = True
+
+
+class ScriptedProvider(LLMProvider):
+    """Provider returning pre-recorded responses in order, raising those that are exceptions."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get_client(self):
+        return None
+
+    def get_completion(self, messages: list, **kwargs):
+        kwargs.pop('agent', None)
+        self.requests.append({"messages": messages, **kwargs})
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def get_completion_async(self, messages: list, **kwargs):
+        return self.get_completion(messages, **kwargs)
+
+
+def make_manager(responses, **kwargs):
+    provider = ScriptedProvider(responses)
+    agent = Agent(name="Assistant", instructions="Be helpful.")
+    kwargs.setdefault("track_token_usage", False)
+    manager = AgentManager(provider=provider, current_agent=agent, model="gpt-4", **kwargs)
+    return manager, provider
+
+
+class StaticAgentCreator(MonkaiAgentCreator):
+    """Creator returning a fixed agent."""
+
+    def __init__(self, name, briefing):
+        super().__init__()
+        self._agent = Agent(name=name, instructions=f"You are the {name} agent.")
+        self._briefing = briefing
+        self.calls = 0
+
+    def get_agent(self):
+        self.calls += 1
+        return self._agent
+
+    def get_agent_briefing(self):
+        return self._briefing
+
+
+async def collect(generator):
+    return [event async for event in generator]
+
+
+def test_run_returns_completion():
+    """Test that a plain run returns the assistant answer."""
+    manager, provider = make_manager([make_completion("Hello!")])
+    response = asyncio.run(manager.run("Hi"))
+
+    assert response.messages[-1]["content"] == "Hello!"
+    assert response.agent.name == "Assistant"
+    assert provider.requests[0]["messages"][-1] == {"role": "user", "content": "Hi"}
+
+
+def test_run_stream_yields_deltas_and_response():
+    """Test that streaming yields deltas as they arrive and a final response."""
+    stream = ScriptedStream(make_chunks("Hel", "lo", "!"))
+    manager, provider = make_manager([stream])
+
+    events = asyncio.run(collect(manager.run_stream("Hi")))
+
+    assert events[0] == {"delim": "start"}
+    contents = [e["content"] for e in events if "content" in e]
+    assert contents == ["Hel", "lo", "!"]
+    assert events[1]["sender"] == "Assistant"
+    response = events[-1]["response"]
+    assert response.messages[-1]["content"] == "Hello!"
+    assert stream.closed
+
+
+def test_run_stream_records_latency_metrics():
+    """Test that each streamed completion reports its time to first token and generation rate."""
+    manager, provider = make_manager([ScriptedStream(make_chunks("a", "b", "c", "d"))])
+
+    events = asyncio.run(collect(manager.run_stream("Hi")))
+
+    metrics = events[-1]["response"].stream_metrics
+    assert len(metrics) == 1
+    assert metrics[0].chunk_count == 4
+    assert metrics[0].output_tokens == 4
+    assert 0 <= metrics[0].time_to_first_token <= metrics[0].duration
+    assert metrics[0].inter_chunk_latency_p50 <= metrics[0].inter_chunk_latency_max
+
+
+def test_stream_timer_starts_when_the_request_is_sent():
+    """Test that the time to first token is measured from the attempt that was sent, not from the preparation."""
+    prepared_at, sent_at = [], []
+
+    def instructions(context_variables):
+        prepared_at.append(time.perf_counter())
+        return "Be helpful."
+
+    class TimedProvider(ScriptedProvider):
+        async def get_completion_async(self, messages: list, **kwargs):
+            sent_at.append(time.perf_counter())
+            return self.get_completion(messages, **kwargs)
+
+    provider = TimedProvider([make_api_error(RateLimitError, 429), ScriptedStream(make_chunks("Hi"))])
+    manager = AgentManager(provider=provider, current_agent=Agent(name="Assistant", instructions=instructions),
+                           model="gpt-4", track_token_usage=False,
+                           retry_policy=RetryPolicy(base_delay=0, jitter=False))
+    recorder = StreamMetricsRecorder()
+
+    asyncio.run(manager.get_chat_completion_async(
+        agent=manager.agent, history=[{"role": "user", "content": "Hi"}], context_variables={},
+        max_tokens=None, top_p=None, frequency_penalty=None, presence_penalty=None,
+        stream=True, debug=False, metrics_recorder=recorder,
+    ))
+
+    assert prepared_at[0] <= sent_at[0] <= recorder.started_at <= sent_at[1]
+
+
+def test_history_is_summarized_off_the_event_loop():
+    """Test that the blocking summary completion of async runs is made in a worker thread."""
+    threads = []
+
+    class ThreadRecordingProvider(ScriptedProvider):
+        def get_completion(self, messages: list, **kwargs):
+            threads.append(threading.get_ident())
+            return super().get_completion(messages, **kwargs)
+
+    provider = ThreadRecordingProvider([make_completion("They talked about invoices."), make_completion("Done.")])
+    manager = AgentManager(provider=provider, current_agent=Agent(name="Assistant", instructions="Be helpful."),
+                           model="gpt-4", track_token_usage=False, context_window_size=1000)
+    history = [{"role": role, "content": f"Message {i}"} for i in range(6) for role in ("user", "assistant")]
+
+    response = asyncio.run(manager.run("Hi", user_history=history))
+
+    assert response.messages[-1]["content"] == "Done."
+    assert threads[0] != threading.get_ident() and threads[1] == threading.get_ident()
+    sent = provider.requests[1]["messages"]
+    assert sent[1]["content"] == "Previous conversation summary: They talked about invoices."
+    assert [m["content"] for m in sent[2:]] == ["Message 4", "Message 5", "Message 5", "Hi"]
+
+
+def test_run_stream_reports_cached_prompt_tokens():
+    """Test that streamed requests ask for usage and record the cached tokens of the final chunk."""
+    manager, provider = make_manager([ScriptedStream(make_chunks("Hel", "lo") + [make_usage_chunk(20, 2, 8)])])
+    provider.supports_stream_usage = True
+
+    events = asyncio.run(collect(manager.run_stream("Hi")))
+
+    assert provider.requests[0]["stream_options"] == {"include_usage": True}
+    assert events[-1]["response"].messages[-1]["content"] == "Hello"
+    stats = manager.get_prefix_cache_stats()["Assistant"]
+    assert stats["prompt_tokens"] == 20 and stats["cached_tokens"] == 8
+
+
+def test_run_stream_asks_for_usage_only_when_supported():
+    """Test that `stream_options` is left out for providers that do not accept it."""
+    manager, provider = make_manager([ScriptedStream(make_chunks("Hello"))])
+
+    asyncio.run(collect(manager.run_stream("Hi")))
+
+    assert "stream_options" not in provider.requests[0]
+    assert OpenAIProvider("key").supports_stream_usage
+    assert not AzureProvider("key", "https://example.azure.com").supports_stream_usage
+    assert AzureProvider("key", "https://example.azure.com", api_version="2024-10-21").supports_stream_usage
+
+
+def test_run_stream_closes_upstream_on_disconnect():
+    """Test that closing the stream early cancels reading and closes the provider stream."""
+    stream = ScriptedStream(make_chunks(*[str(i) for i in range(100)]))
+    manager, provider = make_manager([stream], stream_buffer_size=2)
+
+    async def read_first_delta():
+        generator = manager.run_stream("Count")
+        async for event in generator:
+            if "content" in event:
+                break
+        await generator.aclose()
+
+    asyncio.run(read_first_delta())
+
+    assert stream.closed
+    assert stream.consumed < 10
+
+
+def test_provider_reuses_its_async_client():
+    """Test that completions share one async client per provider until it is closed."""
+    provider = OpenAIProvider("sk-test")
+
+    async def scenario():
+        client = provider.get_async_client()
+        assert provider.get_async_client() is client
+        await provider.aclose()
+        assert client.is_closed()
+        assert provider.get_async_client() is not client
+        await provider.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_sticky_routing_skips_triage_on_follow_up():
+    """Test that follow-up turns of a sticky session go straight to the agent that answered."""
+    provider = ScriptedProvider([
+        make_completion(tool_calls=[("transfer_to_Billing", "{}")]),
+        make_completion("Your invoice is ready."),
+        make_completion("It was sent yesterday."),
+        make_completion(tool_calls=[("transfer_to_Support", "{}")]),
+        make_completion("Restart the router."),
+    ])
+    creators = [StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Support", "technical problems")]
+    manager = AgentManager(
+        provider=provider, agents_creators=creators, model="gpt-4", track_token_usage=False,
+        sticky_routing=True, topic_change_detector=lambda message, agent: "router" in message,
+    )
+
+    first = asyncio.run(manager.run("Where is my invoice?", session_id="s1"))
+    second = asyncio.run(manager.run("When was it sent?", user_history=first.messages, session_id="s1"))
+    third = asyncio.run(manager.run("My router is broken", session_id="s1"))
+
+    assert first.agent.name == "Billing"
+    assert second.agent.name == "Billing"
+    assert len(provider.requests) == 5
+    assert provider.requests[2]["messages"][0]["content"] == "You are the Billing agent."
+    assert third.agent.name == "Support"
+
+
+def test_sticky_routing_does_not_share_turns_without_session_id():
+    """Test that turns without a session id resume only from their own history."""
+    provider = ScriptedProvider([
+        make_completion(tool_calls=[("transfer_to_Billing", "{}")]),
+        make_completion("Your invoice is ready."),
+        make_completion(tool_calls=[("transfer_to_Support", "{}")]),
+        make_completion("Restart the router."),
+        make_completion("It was sent yesterday."),
+    ])
+    creators = [StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Support", "technical problems")]
+    manager = AgentManager(provider=provider, agents_creators=creators, model="gpt-4", track_token_usage=False,
+                           sticky_routing=True)
+
+    first = asyncio.run(manager.run("Where is my invoice?"))
+    other_user = asyncio.run(manager.run("My router is broken"))
+    follow_up = asyncio.run(manager.run("When was it sent?", user_history=first.messages))
+
+    assert first.agent.name == "Billing" and other_user.agent.name == "Support"
+    assert "triage" in provider.requests[2]["messages"][0]["content"]
+    assert follow_up.agent.name == "Billing"
+    assert provider.requests[4]["messages"][0]["content"] == "You are the Billing agent."
+
+
+def test_triage_classifier_routes_confident_messages_locally():
+    """Test that clear messages skip the triage completion and ambiguous ones fall back to it."""
+    provider = ScriptedProvider([
+        make_completion("Your invoice was sent."),
+        make_completion(tool_calls=[("transfer_to_Support", "{}")]),
+        make_completion("Let me help."),
+        make_completion(tool_calls=[("transfer_to_Billing", "{}")]),
+        make_completion("Your invoice was sent."),
+    ])
+    creators = [
+        StaticAgentCreator("Billing", "invoices, payments, refunds and billing questions"),
+        StaticAgentCreator("Support", "technical problems with the router, wifi and internet connection"),
+    ]
+    classifier = LocalTriageClassifier(creators)
+    manager = AgentManager(provider=provider, agents_creators=creators, model="gpt-4",
+                           track_token_usage=False, triage_classifier=classifier)
+
+    routed = asyncio.run(manager.run("I need a refund for my last invoice payment"))
+    fallback = asyncio.run(manager.run("Hello"))
+    # Later turns are routed by the triage agent, which sees the conversation
+    follow_up = asyncio.run(manager.run("I need a refund for my last invoice payment",
+                                        user_history=[{"role": "user", "content": "Hello"}]))
+
+    assert routed.agent.name == "Billing"
+    assert routed.agent is manager.triage_agent_criator.find_agent("Billing")
+    assert provider.requests[0]["messages"][0]["content"] == "You are the Billing agent."
+    assert fallback.agent.name == "Support"
+    assert follow_up.agent.name == "Billing" and "triage" in provider.requests[3]["messages"][0]["content"]
+    # Agents are built once, by the triage creator, and shared with the classifier
+    assert [creator.calls for creator in creators] == [1, 1]
+    stats = classifier.get_stats()
+    assert stats["routed"] == 1 and stats["fallbacks"] == 1
+    assert stats["shadow_evaluations"] == 1
+
+    report = classifier.evaluate([("my wifi keeps dropping", "Support"), ("refund my payment", "Billing")])
+    assert report["top1_accuracy"] == 1.0
+    assert classifier.get_stats()["requests"] == 2
+
+
+class ReturningAgentCreator(TransferTriageAgentCreator):
+    """Creator whose agent can transfer the conversation back to the triage agent."""
+
+    def __init__(self, name, briefing):
+        super().__init__()
+        self._agent = Agent(name=name, instructions=f"You are the {name} agent.", functions=[self.transfer_to_triage])
+        self._briefing = briefing
+
+    def get_agent(self):
+        return self._agent
+
+    def get_agent_briefing(self):
+        return self._briefing
+
+
+def test_specialist_started_without_triage_transfers_back():
+    """Test that a specialist chosen by the classifier, or given to the run, can transfer back to triage."""
+    provider = ScriptedProvider([
+        make_completion(tool_calls=[("transfer_to_triage", "{}")]),
+        make_completion("Which product is it about?"),
+    ])
+    billing = ReturningAgentCreator("Billing", "invoices, payments, refunds and billing questions")
+    support = ReturningAgentCreator("Support", "technical problems with the router, wifi and internet connection")
+    manager = AgentManager(provider=provider, agents_creators=[billing, support], model="gpt-4",
+                           track_token_usage=False, triage_classifier=LocalTriageClassifier([billing, support]))
+
+    response = asyncio.run(manager.run("I need a refund for my last invoice payment"))
+
+    assert provider.requests[0]["messages"][0]["content"] == "You are the Billing agent."
+    assert response.agent is manager.get_triage_agent()
+    assert billing.predecessor_agent is manager.get_triage_agent()
+
+    # Creators resolve the triage agent on demand, and follow a replaced triage agent
+    sales = ReturningAgentCreator("Sales", "new plans")
+    triage = TriageAgentCreator([sales])
+    assert sales.transfer_to_triage() is triage.get_agent()
+    custom = Agent(name="Custom Triage", instructions="Route the user.")
+    triage.triage_agent = custom
+    assert triage.get_agent() is custom and sales.transfer_to_triage() is custom
+
+
+def test_routing_cache_reuses_triage_decision():
+    """Test that repeated openers reuse the triage decision and that changing the creators clears it."""
+    provider = ScriptedProvider([
+        make_completion(tool_calls=[("transfer_to_Billing", "{}")]),
+        make_completion("Your invoice is ready."),
+        make_completion("Here it is again."),
+    ])
+    creators = [StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Support", "technical problems")]
+    cache = RoutingCache(near_duplicates=True)
+    manager = AgentManager(provider=provider, agents_creators=creators, model="gpt-4",
+                           track_token_usage=False, routing_cache=cache)
+
+    asyncio.run(manager.run("Hello, where is my last invoice?"))
+    second = asyncio.run(manager.run("hello where is my latest invoice"))
+
+    assert second.agent.name == "Billing"
+    assert len(provider.requests) == 3
+    assert cache.get_stats()["near_duplicate_hits"] == 1
+
+    manager.agents_creators.append(StaticAgentCreator("Sales", "new plans"))
+    assert manager._get_cached_route("Hello, where is my last invoice?") is None
+    assert len(cache) == 0
+
+
+def test_routing_cache_records_triage_choice_and_refreshed_creators():
+    """Test that the cache keeps the agent triage chose and is cleared when a creator's briefing changes."""
+    provider = ScriptedProvider([
+        make_completion(tool_calls=[("transfer_to_Billing", "{}")]),
+        make_completion(tool_calls=[("transfer_to_Support", "{}")]),
+        make_completion("Your router was reset."),
+    ])
+    billing, support = StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Support", "technical problems")
+
+    def transfer_to_Support():
+        return support._agent
+    billing._agent.functions = [transfer_to_Support]
+    cache = RoutingCache()
+    manager = AgentManager(provider=provider, agents_creators=[billing, support], model="gpt-4",
+                           track_token_usage=False, routing_cache=cache)
+
+    response = asyncio.run(manager.run("My invoice mentions a router"))
+
+    assert response.agent.name == "Support"
+    assert manager._get_cached_route("My invoice mentions a router") is billing._agent
+
+    billing._briefing = "invoices and payments"
+    manager.triage_agent_criator.refresh_creator(billing)
+    assert manager._get_cached_route("My invoice mentions a router") is None
+    assert len(cache) == 0
+
+
+def test_hierarchical_triage_routes_in_stages():
+    """Test that hierarchical triage picks a category first and reports the tokens saved."""
+    provider = ScriptedProvider([
+        make_completion(tool_calls=[("transfer_to_Finance", "{}")]),
+        make_completion(tool_calls=[("transfer_to_Billing", "{}")]),
+        make_completion("Your invoice is ready."),
+    ])
+    billing, refunds = StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Refunds", "refunds")
+    network, devices = StaticAgentCreator("Network", "internet connection"), StaticAgentCreator("Devices", "routers")
+    manager = AgentManager(
+        provider=provider, agents_creators=[billing, refunds, network, devices], model="gpt-4",
+        track_token_usage=False, triage_categories={"Finance": [billing, refunds], "Technical": [network, devices]},
+    )
+
+    response = asyncio.run(manager.run("Where is my invoice?"))
+
+    assert response.agent.name == "Billing"
+    root_tools = [tool["function"]["name"] for tool in provider.requests[0]["tools"]]
+    assert root_tools == ["transfer_to_Finance", "transfer_to_Technical"]
+    category_tools = [tool["function"]["name"] for tool in provider.requests[1]["tools"]]
+    assert category_tools == ["transfer_to_Billing", "transfer_to_Refunds", "transfer_to_triage"]
+    report = manager.triage_agent_criator.routing_reports[-1]
+    assert report["category"] == "Finance" and report["agent"] == "Billing"
+    conversation = [m for m in provider.requests[1]["messages"] if m.get("role") != "system"]
+    assert report["second_stage_conversation_tokens"] == \
+        manager.triage_agent_criator.count_tokens(json.dumps(conversation, default=str)) > 0
+    assert report["hierarchical_prompt_tokens"] == report["flat_prompt_tokens"] - report["saved_tokens"]
+
+
+def test_hierarchical_triage_routes_unlisted_creators():
+    """Test that creators not listed in a declared category are grouped in the "Other" category."""
+    billing, refunds = StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Refunds", "refunds")
+    network = StaticAgentCreator("Network", "internet connection")
+
+    triage = TriageAgentCreator([billing, refunds, network], categories={"Finance": [billing, refunds]})
+
+    assert [f.__name__ for f in triage.get_agent().functions] == ["transfer_to_Finance", "transfer_to_Other"]
+    assert [f.__name__ for f in triage.category_agents[OTHER_CATEGORY].functions] == \
+        ["transfer_to_Network", "transfer_to_triage"]
+
+
+def test_hierarchical_triage_clusters_large_catalogs():
+    """Test that creators are clustered into categories when there are more than a stage allows."""
+    names = ["Billing", "Refunds", "Network", "Devices"]
+    briefings = ["invoices and payment billing", "payment refunds and billing disputes",
+                 "internet network connection problems", "router devices and network hardware problems"]
+    creators = [StaticAgentCreator(name, briefing) for name, briefing in zip(names, briefings)]
+
+    triage = TriageAgentCreator(creators, max_agents_per_stage=2)
+
+    assert len(triage.get_agent().functions) == 2
+    members = [[f.__name__ for f in agent.functions] for agent in triage.category_agents.values()]
+    assert sorted(name for group in members for name in group if name != "transfer_to_triage") == \
+        sorted(f"transfer_to_{name}" for name in names)
+    assert triage.get_routing_stats()["hierarchical"]
+
+
+def test_triage_is_built_lazily_and_incrementally():
+    """Test that the triage agent is built on first use and only fetches agents of new creators."""
+    creators = [StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Support", "technical problems")]
+    AgentManager(agents_creators=creators, current_agent=Agent(name="Direct"), provider=ScriptedProvider([]),
+                 track_token_usage=False)
+    assert [creator.calls for creator in creators] == [0, 0]
+
+    manager = AgentManager(agents_creators=creators, provider=ScriptedProvider([]), track_token_usage=False)
+    assert [creator.calls for creator in creators] == [0, 0]
+    triage = manager.get_triage_agent()
+    assert [f.__name__ for f in triage.functions] == ["transfer_to_Billing", "transfer_to_Support"]
+
+    sales = StaticAgentCreator("Sales", "new plans")
+    manager.add_agent_creator(sales)
+    manager.remove_agent_creator(creators[1])
+    assert manager.get_triage_agent() is triage
+    assert [f.__name__ for f in triage.functions] == ["transfer_to_Billing", "transfer_to_Sales"]
+    assert [creator.calls for creator in creators] == [1, 1]
+    assert sales.calls == 1
+    assert creators[0].predecessor_agent is triage
+
+
+class AgentRoutingProvider(ScriptedProvider):
+    """Provider answering each agent from its own script, whatever the order of the requests."""
+
+    def __init__(self, scripts, delay=0.0):
+        super().__init__([])
+        self.scripts = {name: list(responses) for name, responses in scripts.items()}
+        self.delay = delay
+
+    def get_completion(self, messages: list, **kwargs):
+        kwargs.pop('agent', None)
+        self.requests.append({"messages": messages, **kwargs})
+        system = messages[0]["content"]
+        name = next((name for name in self.scripts if f"the {name} agent" in system), "Triage")
+        return self.scripts[name].pop(0)
+
+    async def get_completion_async(self, messages: list, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self.get_completion(messages, **kwargs)
+
+
+def test_speculative_specialist_is_adopted():
+    """Test that the specialist chosen by triage reuses its speculative completion."""
+    provider = AgentRoutingProvider({
+        "Triage": [make_completion(tool_calls=[("transfer_to_Billing", "{}")])],
+        "Billing": [make_completion("Your invoice is ready.")],
+        "Support": [make_completion("Restart the router.")],
+    }, delay=0.05)
+    creators = [StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Support", "technical problems")]
+    manager = AgentManager(provider=provider, agents_creators=creators, model="gpt-4",
+                           track_token_usage=False, speculative_agents=2)
+    manager._route_counts.update({"Billing": 2, "Support": 1})
+
+    response = asyncio.run(manager.run("Where is my invoice?"))
+
+    assert response.agent.name == "Billing"
+    assert response.messages[-1]["content"] == "Your invoice is ready."
+    assert [m["role"] for m in response.messages] == ["assistant", "tool", "assistant"]
+    # Billing answered once, from the speculative request made before the transfer was known
+    billing_requests = [r for r in provider.requests if "the Billing agent" in r["messages"][0]["content"]]
+    assert len(billing_requests) == 1 and billing_requests[0]["messages"][-1]["role"] == "user"
+    assert manager.speculation_stats == {"runs": 1, "adopted": 1, "missed": 0, "cancelled": 1}
+
+
+def test_adopted_tool_calls_are_answered_on_the_last_turn():
+    """Test that the tool calls of an adopted speculative completion run even when no turn is left."""
+    def find_invoice():
+        """Find the last invoice."""
+        return "Invoice 42"
+
+    provider = AgentRoutingProvider({
+        "Triage": [make_completion(tool_calls=[("transfer_to_Billing", "{}")])],
+        "Billing": [make_completion(tool_calls=[("find_invoice", "{}")])],
+        "Support": [make_completion("Restart the router.")],
+    })
+    creators = [StaticAgentCreator("Billing", "invoices"), StaticAgentCreator("Support", "technical problems")]
+    creators[0]._agent.functions = [find_invoice]
+    manager = AgentManager(provider=provider, agents_creators=creators, model="gpt-4",
+                           track_token_usage=False, speculative_agents=2)
+    manager._route_counts.update({"Billing": 2, "Support": 1})
+
+    response = asyncio.run(manager.run("Where is my invoice?", max_turn=2))
+
+    assert [m["role"] for m in response.messages] == ["assistant", "tool", "assistant", "tool"]
+    assert response.messages[-1]["content"] == "Invoice 42"
+    # No turn was left to send the tool result back
+    assert all(request["messages"][-1]["role"] != "tool" for request in provider.requests)
+
+
+def test_cached_tool_results_are_reused_within_a_session():
+    """Test that cacheable tools run once per session for equivalent arguments."""
+    calls = []
+
+    @cached_tool(ttl=60)
+    def lookup_weather(city: str, units: str = "c"):
+        """Look up the weather of a city."""
+        calls.append((city, units))
+        return f"Sunny in {city}"
+
+    def turn(arguments, answer):
+        return [make_completion(tool_calls=[("lookup_weather", arguments)]), make_completion(answer)]
+
+    provider = ScriptedProvider(
+        turn('{"city": "Paris", "units": "c"}', "It is sunny.")
+        + turn('{ "units":"c","city":"Paris" }', "Still sunny.")
+        + turn('{"city": "Paris", "units": "c"}', "Sunny for you too.")
+    )
+    agent = Agent(name="Assistant", instructions="Be helpful.", functions=[lookup_weather])
+    manager = AgentManager(provider=provider, current_agent=agent, model="gpt-4", track_token_usage=False)
+
+    async def conversation():
+        first = await manager.run("Weather in Paris?", session_id="s1")
+        second = await manager.run("And now?", session_id="s1")
+        other = await manager.run("Weather in Paris?", session_id="s2")
+        return first, second, other
+
+    first, second, other = asyncio.run(conversation())
+
+    assert calls == [("Paris", "c"), ("Paris", "c")]
+    assert second.messages[1]["content"] == "Sunny in Paris"
+    stats = manager.tool_cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2
+    assert stats["tools"]["lookup_weather"] == {"hits": 1, "misses": 2}
+
+
+def test_cached_tool_results_are_keyed_by_context_variables():
+    """Test that cached results are not reused under other values of the context variables a tool reads."""
+    calls = []
+
+    @cached_tool(ttl=60)
+    def get_plan(context_variables):
+        """Get the plan of the current tenant."""
+        calls.append(context_variables["tenant"])
+        return f"Plan of {context_variables['tenant']}"
+
+    @cached_tool(ttl=60, context_keys=["tenant"])
+    def get_quota(context_variables):
+        """Get the quota of the current tenant."""
+        calls.append(("quota", context_variables["tenant"]))
+        return f"Quota of {context_variables['tenant']}"
+
+    def turn(name, answer):
+        return [make_completion(tool_calls=[(name, "{}")]), make_completion(answer)]
+
+    provider = ScriptedProvider(
+        turn("get_plan", "Acme plan.") + turn("get_plan", "Globex plan.")
+        + turn("get_quota", "Acme quota.") + turn("get_quota", "Same quota.")
+    )
+    agent = Agent(name="Assistant", instructions="Be helpful.", functions=[get_plan, get_quota])
+    manager = AgentManager(provider=provider, current_agent=agent, model="gpt-4", track_token_usage=False)
+
+    async def conversation():
+        manager.context_variables = {"tenant": "acme", "request": 1}
+        acme = await manager.run("Which plan?", session_id="s1")
+        manager.context_variables = {"tenant": "globex", "request": 2}
+        globex = await manager.run("Which plan?", session_id="s1")
+        manager.context_variables = {"tenant": "acme", "request": 3}
+        await manager.run("Which quota?", session_id="s1")
+        manager.context_variables = {"tenant": "acme", "request": 4}
+        await manager.run("Which quota?", session_id="s1")
+        return acme, globex
+
+    acme, globex = asyncio.run(conversation())
+
+    assert acme.messages[1]["content"] == "Plan of acme"
+    assert globex.messages[1]["content"] == "Plan of globex"
+    # get_quota only reads the tenant, so another request id reuses its result
+    assert calls == ["acme", "globex", ("quota", "acme")]
+
+
+def test_tool_selector_sends_relevant_tools():
+    """Test that only the relevant tools are sent, and the full set after a call to an unknown tool."""
+    def get_weather(city: str):
+        """Get the current weather forecast for a city."""
+        return "Sunny"
+
+    def convert_currency(amount: float, currency: str):
+        """Convert an amount of money to another currency."""
+        return "10 EUR"
+
+    def send_email(to: str, body: str):
+        """Send an email message to a recipient."""
+        return "Sent"
+
+    def create_invoice(customer: str):
+        """Create an invoice for a customer."""
+        return "Invoice created"
+
+    def search_flights(origin: str, destination: str):
+        """Search flights between two airports."""
+        return "No flights"
+
+    provider = ScriptedProvider([
+        make_completion(tool_calls=[("get_weather_report", '{"city": "Paris"}')]),
+        make_completion("It is sunny in Paris."),
+    ])
+    functions = [convert_currency, send_email, get_weather, create_invoice, search_flights]
+    agent = Agent(name="Assistant", instructions="Be helpful.", functions=functions)
+    selector = ToolSelector(max_tools=2)
+    manager = AgentManager(provider=provider, current_agent=agent, model="gpt-4", track_token_usage=False,
+                           tool_selector=selector)
+
+    asyncio.run(manager.run("What is the weather forecast in Paris?"))
+
+    def names(request):
+        return [tool["function"]["name"] for tool in request["tools"]]
+
+    assert len(names(provider.requests[0])) == 2
+    assert "get_weather" in names(provider.requests[0])
+    assert names(provider.requests[1]) == sorted(f.__name__ for f in functions)
+    stats = selector.get_stats()
+    assert stats["subset_requests"] == 1 and stats["fallbacks"] == 1
+    assert stats["saved_tokens"] > 0
+
+
+def test_mcp_resources_are_sent_once_after_the_instructions():
+    """Test that resources are deduplicated, placed after the instructions and capped in tokens."""
+    provider = ScriptedProvider([make_completion("First answer."), make_completion("Second answer.")])
+    agent = MCPAgent(name="Assistant", instructions="Be helpful.", model="gpt-4",
+                     resources=["Store hours: 9 to 5.", "Store hours: 9 to 5.", "Catalog: " + "item " * 500,
+                                "Returns within 30 days.", {"temperature": 0.2}])
+    injector = ResourceInjector(max_tokens=100, count_tokens=lambda text: len(text.split()))
+    manager = AgentManager(provider=provider, current_agent=agent, model="gpt-4", track_token_usage=False,
+                           resource_injector=injector)
+
+    response = asyncio.run(manager.run("When are you open?"))
+    asyncio.run(manager.run("And returns?", user_history=response.messages))
+
+    for request in provider.requests:
+        assert [message["role"] for message in request["messages"][:2]] == ["system", "system"]
+        assert request["messages"][1]["content"] == "Store hours: 9 to 5.\n\nReturns within 30 days."
+        assert sum("Store hours" in str(message.get("content")) for message in request["messages"]) == 1
+    stats = injector.get_stats()
+    assert stats["requests"] == 2 and stats["duplicates"] == 2 and stats["dropped"] == 2
+    assert stats["last_tokens"] == 9
+
+
+def test_requests_keep_a_stable_prefix_and_report_cached_tokens():
+    """Test that tools are sent sorted, the prefix is stable across turns and cached tokens are recorded per agent."""
+    def with_cached_tokens(completion, cached):
+        completion.usage = completion.usage.model_copy(
+            update={"prompt_tokens_details": {"cached_tokens": cached}}
+        )
+        return completion
+
+    def search_orders(query: str):
+        """Search orders."""
+        return "No orders"
+
+    def cancel_order(order_id: str):
+        """Cancel an order."""
+        return "Cancelled"
+
+    provider = ScriptedProvider([
+        with_cached_tokens(make_completion("First answer."), 0),
+        with_cached_tokens(make_completion("Second answer."), 8),
+    ])
+    agent = Agent(name="Assistant", instructions="Be helpful.", functions=[search_orders, cancel_order])
+    manager = AgentManager(provider=provider, current_agent=agent, model="gpt-4", track_token_usage=False)
+
+    response = asyncio.run(manager.run("Where is my order?"))
+    asyncio.run(manager.run("Cancel it", user_history=response.messages))
+
+    first, second = provider.requests
+    assert [tool["function"]["name"] for tool in first["tools"]] == ["cancel_order", "search_orders"]
+    assert first["tools"] == second["tools"] and first["messages"][0] == second["messages"][0]
+    stats = manager.get_prefix_cache_stats()["Assistant"]
+    assert stats["requests"] == 2 and stats["prefix_changes"] == 0
+    assert stats["prompt_tokens"] == 20 and stats["cached_tokens"] == 8 and stats["cache_hit_rate"] == 0.4
+
+
+def test_dynamic_instructions_are_rendered_once_per_context():
+    """Test that instruction callables run again only when the context variables they read change."""
+    renders = []
+
+    def instructions(context_variables):
+        renders.append(context_variables["user_name"])
+        return f"Help {context_variables['user_name']}."
+
+    def lookup_order(order_id: str):
+        """Look an order up."""
+        return "Shipped"
+
+    provider = ScriptedProvider([
+        make_completion(tool_calls=[("lookup_order", '{"order_id": "42"}')]),
+        make_completion("It shipped."),
+        make_completion("Hello again."),
+        make_completion("Hello Bob."),
+    ])
+    agent = Agent(name="Assistant", instructions=instructions, functions=[lookup_order])
+    manager = AgentManager(provider=provider, current_agent=agent, model="gpt-4", track_token_usage=False,
+                           context_variables={"user_name": "Ana", "locale": "pt"}, memoize_instructions=True)
+
+    asyncio.run(manager.run("Where is order 42?"))
+    manager.context_variables["locale"] = "en"
+    asyncio.run(manager.run("Hi"))
+    manager.context_variables["user_name"] = "Bob"
+    asyncio.run(manager.run("Hi"))
+
+    assert renders == ["Ana", "Bob"]
+    assert [request["messages"][0]["content"] for request in provider.requests] == [
+        "Help Ana.", "Help Ana.", "Help Ana.", "Help Bob."
+    ]
+    stats = manager.instructions_cache.get_stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2
+
+    # Memoization is opt-in: by default the callable runs before every completion
+    default_manager, default_provider = make_manager([make_completion("Hello.")])
+    assert default_manager.instructions_cache is None
+
+
+def make_api_error(error_class, status_code, headers=None, code=None):
+    """Build an OpenAI API error carrying an HTTP response."""
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    return error_class("error", response=response, body={"code": code} if code else None)
+
+
+def test_provider_errors_are_retried_with_backoff_and_retry_after():
+    """Test that transient errors are retried after the requested delay, and client errors are not."""
+    manager, provider = make_manager([
+        make_api_error(RateLimitError, 429, headers={"retry-after-ms": "50"}),
+        make_api_error(RateLimitError, 429),
+        make_completion("Done."),
+        make_api_error(BadRequestError, 400),
+        make_api_error(RateLimitError, 429),
+    ], retry_policy=RetryPolicy(max_attempts=3, base_delay=0, jitter=False))
+
+    response = asyncio.run(manager.run("Hi"))
+    assert response.messages[-1]["content"] == "Done."
+    response = asyncio.run(manager.run("Again"))
+    assert response.messages[-1]["content"].startswith("I apologize")
+
+    # The provider's Retry-After wins over the backoff
+    assert len(provider.requests) == 4
+    stats = manager.retry_policy.get_stats()
+    assert stats["retries"] == {"rate_limit": 2} and stats["given_up"] == 1
+    assert stats["total_delay"] == 0.05
+
+    # The retry settings of the manager are those of its policy
+    manager.max_retries = 1
+    assert manager.retry_policy.max_attempts == 1
+    response = asyncio.run(manager.run("Once more"))
+    assert response.messages[-1]["content"].startswith("I apologize")
+    assert len(provider.requests) == 5 and manager.retry_policy.get_stats()["given_up"] == 2
+
+
+def test_retry_policy_limits_retries():
+    """Test the jittered backoff bounds, the per-class limits and the global retry budget."""
+    policy = RetryPolicy(base_delay=1.0, max_delay=4.0, max_attempts=10)
+    assert all(0 <= policy.backoff(attempt) <= min(4.0, 2 ** (attempt - 1)) for attempt in range(1, 8))
+
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 < RetryPolicy.retry_after(make_api_error(RateLimitError, 429, headers={"retry-after": date})) <= 30
+    assert policy.next_delay(make_api_error(RateLimitError, 429, headers={"retry-after": "120"}), 1) is None
+
+    retries = {}
+    content_filter = make_api_error(BadRequestError, 400, code="content_filter")
+    assert policy.next_delay(content_filter, 1, retries) is not None
+    assert policy.next_delay(content_filter, 2, retries) is None
+
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0.1, window=10.0)
+    policy = RetryPolicy(max_attempts=10, budget=budget)
+    for _ in range(4):
+        policy.record_request()
+    server_error = make_api_error(InternalServerError, 503)
+    delays = [policy.next_delay(server_error, 1) for _ in range(5)]
+    assert sum(delay is not None for delay in delays) == 3
+    assert policy.get_stats()["budget_exhausted"] == 2
+
+
+def run_tests():
+    """Run all tests."""
+    print("Running AgentManager tests...")
+
+    test_run_returns_completion()
+    print("✓ Run test passed")
+
+    test_run_stream_yields_deltas_and_response()
+    print("✓ Streaming test passed")
+
+    test_run_stream_closes_upstream_on_disconnect()
+    print("✓ Stream cancellation test passed")
+
+    test_run_stream_records_latency_metrics()
+    print("✓ Stream metrics test passed")
+
+    test_stream_timer_starts_when_the_request_is_sent()
+    print("✓ Stream timer test passed")
+
+    test_sticky_routing_skips_triage_on_follow_up()
+    print("✓ Sticky routing test passed")
+
+    test_triage_classifier_routes_confident_messages_locally()
+    print("✓ Triage classifier test passed")
+
+    test_specialist_started_without_triage_transfers_back()
+    print("✓ Transfer back to triage test passed")
+
+    test_routing_cache_reuses_triage_decision()
+    print("✓ Routing cache test passed")
+
+    test_routing_cache_records_triage_choice_and_refreshed_creators()
+    print("✓ Routing cache invalidation test passed")
+
+    test_hierarchical_triage_routes_in_stages()
+    print("✓ Hierarchical triage test passed")
+
+    test_hierarchical_triage_routes_unlisted_creators()
+    print("✓ Unlisted triage creators test passed")
+
+    test_hierarchical_triage_clusters_large_catalogs()
+    print("✓ Triage clustering test passed")
+
+    test_triage_is_built_lazily_and_incrementally()
+    print("✓ Lazy triage test passed")
+
+    test_speculative_specialist_is_adopted()
+    print("✓ Speculative execution test passed")
+
+    test_cached_tool_results_are_reused_within_a_session()
+    print("✓ Tool result cache test passed")
+
+    test_cached_tool_results_are_keyed_by_context_variables()
+    print("✓ Tool result cache context variables test passed")
+
+    test_tool_selector_sends_relevant_tools()
+    print("✓ Tool selector test passed")
+
+    test_mcp_resources_are_sent_once_after_the_instructions()
+    print("✓ Resource injection test passed")
+
+    test_requests_keep_a_stable_prefix_and_report_cached_tokens()
+    print("✓ Request assembly test passed")
+
+    test_dynamic_instructions_are_rendered_once_per_context()
+    print("✓ Instructions cache test passed")
+
+    test_provider_errors_are_retried_with_backoff_and_retry_after()
+    print("✓ Retry test passed")
+
+    test_retry_policy_limits_retries()
+    print("✓ Retry policy test passed")
+
+    test_provider_reuses_its_async_client()
+    print("✓ Async client reuse test passed")
+
+    test_adopted_tool_calls_are_answered_on_the_last_turn()
+    print("✓ Speculative tool call test passed")
+
+    test_sticky_routing_does_not_share_turns_without_session_id()
+    print("✓ Anonymous sticky routing test passed")
+
+    test_history_is_summarized_off_the_event_loop()
+    print("✓ Async summarization test passed")
+
+    test_run_stream_reports_cached_prompt_tokens()
+    print("✓ Streamed cached tokens test passed")
+
+    test_run_stream_asks_for_usage_only_when_supported()
+    print("✓ Stream usage support test passed")
+
+    print("\nAll tests passed! ✓")
+
+
+if __name__ == "__main__":
+    run_tests()
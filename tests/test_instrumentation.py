@@ -0,0 +1,147 @@
+"""
+Tests for the MonkAI OpenInference instrumentation
+
+These tests drive the provider wrappers with scripted streams and check the spans they record in memory.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../libs/monkai_agent'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import asyncio
+import openinference.instrumentation
+# The wrappers ship as a subpackage of the installed `openinference.instrumentation` package
+openinference.instrumentation.__path__.append(
+    os.path.join(os.path.dirname(__file__), '../libs/openinference_instrumentation_monkai_agent/openinference/instrumentation')
+)
+
+from openinference.instrumentation import OITracer, TraceConfig
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import StatusCode
+from monkai_agent import OpenAIProvider
+from openinference.instrumentation.monkai_agent._wrappers import _AsyncProviderWrapper, _OpenAIProviderWrapper
+from test_agent_manager import make_chunks, make_usage_chunk, ScriptedStream
+
+
+class FailingStream(ScriptedStream):
+    """A scripted stream that fails after its chunks."""
+
+    async def __anext__(self):
+        if self.consumed >= len(self.chunks):
+            raise ConnectionError("stream dropped")
+        return await super().__anext__()
+
+
+def make_wrappers():
+    exporter = InMemorySpanExporter()
+    tracer_provider = TracerProvider()
+    tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = OITracer(tracer_provider.get_tracer(__name__), config=TraceConfig())
+    sync_wrapper = _OpenAIProviderWrapper(tracer)
+    return sync_wrapper, _AsyncProviderWrapper(tracer, sync_wrapper), exporter
+
+
+def traced_call(wrapper, stream):
+    """Calls a wrapper around a provider method returning the given stream."""
+    provider = OpenAIProvider.__new__(OpenAIProvider)
+    kwargs = {"messages": [{"role": "user", "content": "Hi"}], "model": "gpt-4", "stream": True}
+    if isinstance(wrapper, _AsyncProviderWrapper):
+        async def wrapped(*args, **kwargs):
+            return stream
+        return asyncio.run(wrapper(wrapped, provider, (), kwargs))
+    return wrapper(lambda *args, **kwargs: stream, provider, (), kwargs)
+
+
+def test_sync_stream_span_records_stream_metrics():
+    """Test that a consumed stream ends its span with the content and latency profile."""
+    sync_wrapper, _, exporter = make_wrappers()
+    stream = traced_call(sync_wrapper, iter(make_chunks("Hel", "lo", "!")))
+
+    assert not exporter.get_finished_spans()
+    assert "".join(chunk.choices[0].delta.content for chunk in stream) == "Hello!"
+
+    span, = exporter.get_finished_spans()
+    assert span.attributes["ai.provider"] == "openai"
+    assert span.attributes["ai.stream"] is True
+    assert span.attributes["ai.response.content"] == "Hello!"
+    assert span.attributes["ai.stream.chunk_count"] == 3
+    assert span.attributes["ai.stream.output_tokens"] == 3
+    assert 0 <= span.attributes["ai.stream.time_to_first_token"] <= span.attributes["ai.stream.duration"]
+    assert span.attributes["ai.stream.inter_chunk_latency_p50"] <= span.attributes["ai.stream.inter_chunk_latency_max"]
+
+
+def test_async_stream_span_records_reported_usage():
+    """Test that an async stream is traced to its end, with the output tokens of the usage chunk."""
+    _, async_wrapper, exporter = make_wrappers()
+    upstream = ScriptedStream(make_chunks("Hel", "lo") + [make_usage_chunk(5, 7)])
+    stream = traced_call(async_wrapper, upstream)
+
+    async def consume():
+        return [chunk async for chunk in stream]
+
+    assert len(asyncio.run(consume())) == 3
+
+    span, = exporter.get_finished_spans()
+    assert span.attributes["ai.response.content"] == "Hello"
+    assert span.attributes["ai.stream.chunk_count"] == 2
+    assert span.attributes["ai.stream.output_tokens"] == 7
+    assert span.status.status_code != StatusCode.ERROR
+
+
+def test_async_stream_span_ends_on_close_and_on_error():
+    """Test that closing a stream early ends its span once, and that a failing stream marks it as an error."""
+    _, async_wrapper, exporter = make_wrappers()
+    upstream = ScriptedStream(make_chunks("a", "b", "c"))
+    stream = traced_call(async_wrapper, upstream)
+
+    async def read_one_and_close():
+        iterator = stream.__aiter__()
+        await iterator.__anext__()
+        await stream.close()
+        await iterator.aclose()
+
+    asyncio.run(read_one_and_close())
+
+    span, = exporter.get_finished_spans()
+    assert upstream.closed
+    assert span.attributes["ai.stream.chunk_count"] == 1
+    assert span.attributes["ai.response.content"] == "a"
+
+    exporter.clear()
+    stream = traced_call(async_wrapper, FailingStream(make_chunks("a")))
+
+    async def consume():
+        return [chunk async for chunk in stream]
+
+    try:
+        asyncio.run(consume())
+        assert False, "The stream error should propagate"
+    except ConnectionError:
+        pass
+
+    span, = exporter.get_finished_spans()
+    assert span.status.status_code == StatusCode.ERROR
+    assert span.attributes["ai.stream.chunk_count"] == 1
+
+
+def run_tests():
+    """Run all tests."""
+    print("Running instrumentation tests...")
+
+    test_sync_stream_span_records_stream_metrics()
+    print("✓ Sync stream span test passed")
+
+    test_async_stream_span_records_reported_usage()
+    print("✓ Async stream span test passed")
+
+    test_async_stream_span_ends_on_close_and_on_error()
+    print("✓ Stream span close and error test passed")
+
+    print("\nAll tests passed! ✓")
+
+
+if __name__ == "__main__":
+    run_tests()
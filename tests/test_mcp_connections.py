@@ -0,0 +1,467 @@
+"""
+Tests for MCP connection handling
+
+These tests run a small MCP server over stdio (`mcp_test_server.py`), so no network access is needed.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../libs/monkai_agent'))
+
+import asyncio
+import json
+import tempfile
+import time
+from mcp.types import Tool
+from monkai_agent import MCPAgent, MCPCapabilityCache, MCPClientConnection, MCPReadCache, MCPSessionPool, MCPServerSupervisor
+from monkai_agent import create_stdio_mcp_config, ToolCachePolicy
+
+SERVER = os.path.join(os.path.dirname(__file__), "mcp_test_server.py")
+
+
+def server_config(name, startup_delay=0.0, tool_delay=0.0, **kwargs):
+    """Build a stdio configuration for the test server."""
+    env = dict(os.environ, MCP_TEST_NAME=name, MCP_TEST_STARTUP_DELAY=str(startup_delay),
+               MCP_TEST_TOOL_DELAY=str(tool_delay))
+    return create_stdio_mcp_config(name=name, command=sys.executable, args=[SERVER], env=env, **kwargs)
+
+
+def test_connect_all_clients_connects_concurrently():
+    """Test that servers are connected in parallel and report their timings."""
+    async def scenario():
+        agent = MCPAgent(name="Test Agent", model="gpt-4", auto_discover_capabilities=False)
+        for i in range(3):
+            await agent.add_mcp_client(server_config(f"slow{i}", startup_delay=1.5))
+        agent.auto_discover_capabilities = True
+        started_at = time.perf_counter()
+        results = await agent.connect_all_clients()
+        elapsed = time.perf_counter() - started_at
+        status = agent.get_connection_status()
+        tools = [tool.name for tool in agent.list_available_tools("slow0")]
+        await agent.disconnect_all_clients()
+        return results, elapsed, status, tools
+
+    results, elapsed, status, tools = asyncio.run(scenario())
+
+    assert results == {"slow0": True, "slow1": True, "slow2": True}
+    assert elapsed < 4.5
+    assert all(entry["connect_time"] >= 1.5 for entry in status.values())
+    assert all(entry["discovery_time"] is not None for entry in status.values())
+    assert sorted(tools) == ["add", "echo", "enable_multiply"]
+
+
+def test_connect_all_clients_applies_per_server_timeout():
+    """Test that a hanging server fails on its own timeout without failing the others."""
+    async def scenario():
+        agent = MCPAgent(name="Test Agent", model="gpt-4", auto_discover_capabilities=False)
+        await agent.add_mcp_client(server_config("fast"))
+        await agent.add_mcp_client(server_config("hanging", startup_delay=30, timeout=1.0))
+        agent.auto_discover_capabilities = True
+        started_at = time.perf_counter()
+        results = await agent.connect_all_clients()
+        elapsed = time.perf_counter() - started_at
+        status = agent.get_connection_status()
+        await agent.disconnect_all_clients()
+        return results, elapsed, status
+
+    results, elapsed, status = asyncio.run(scenario())
+
+    assert results == {"fast": True, "hanging": False}
+    assert elapsed < 10
+    assert status["hanging"]["last_error"]
+    assert status["fast"]["resources_count"] == 1 and status["fast"]["prompts_count"] == 1
+
+
+def test_ensure_connected_reuses_and_reconnects_sessions():
+    """Test that healthy connections are reused and failed ones are reconnected."""
+    async def scenario():
+        agent = MCPAgent(name="Test Agent", model="gpt-4", reconnect_delay=0)
+        connection = await agent.add_mcp_client(server_config("lifecycle"))
+        await agent.ensure_connected()
+        session = connection.session
+        await agent.ensure_connected()
+        reused = connection.session is session
+
+        connection.last_activity -= agent.health_check_interval
+        await agent.ensure_connected()
+        pinged = connection.session is session and connection.reconnect_count == 0
+
+        await connection._runner.close()
+        result = await agent.call_mcp_tool("add", {"a": 2, "b": 3})
+        status = agent.get_connection_status()["lifecycle"]
+        await agent.disconnect_all_clients()
+        return reused, pinged, connection.reconnect_count, MCPAgent.extract_tool_result_content(result), status
+
+    reused, pinged, reconnects, result, status = asyncio.run(scenario())
+
+    assert reused and pinged
+    assert reconnects == 1
+    assert result == "5"
+    assert status["reconnect_count"] == 1
+
+
+class DroppingSession:
+    """Session whose tool calls reach the server, then lose the transport before the result arrives."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.session = connection.session
+        self.calls = 0
+
+    async def call_tool(self, name, arguments):
+        self.calls += 1
+        await self.session.call_tool(name=name, arguments=arguments)
+        await self.connection._runner.close()
+        raise ConnectionError("transport closed")
+
+
+def test_calls_lost_with_the_connection_are_resent_only_when_idempotent():
+    """Test that a call interrupted by a transport failure is not sent again unless the tool is idempotent."""
+    async def call_while_connection_drops(**kwargs):
+        agent = MCPAgent(name="Test Agent", model="gpt-4", reconnect_delay=0)
+        connection = await agent.add_mcp_client(server_config("dropping", **kwargs))
+        await agent.ensure_connected()
+        dropping = connection.session = DroppingSession(connection)
+        try:
+            outcome = MCPAgent.extract_tool_result_content(await agent.call_mcp_tool("add", {"a": 2, "b": 3}))
+        except ConnectionError as e:
+            outcome = e
+        reconnected = connection.reconnect_count == 1 and connection.is_alive
+        await agent.disconnect_all_clients()
+        return outcome, dropping.calls, reconnected
+
+    async def scenario():
+        return (await call_while_connection_drops(),
+                await call_while_connection_drops(cache_policies={"add": ToolCachePolicy()}))
+
+    (unsafe, unsafe_calls, unsafe_reconnected), (safe, safe_calls, safe_reconnected) = asyncio.run(scenario())
+
+    # The interrupted call is surfaced, and the connection is ready for the next calls
+    assert isinstance(unsafe, ConnectionError) and unsafe_calls == 1 and unsafe_reconnected
+    # Idempotent tools are sent again on the new session
+    assert safe == "5" and safe_calls == 1 and safe_reconnected
+
+
+def test_session_pool_shares_sessions_between_agents():
+    """Test that agents using the same pool share one session per server and release it when idle."""
+    async def scenario():
+        pool = MCPSessionPool(max_concurrent_requests=2, idle_timeout=0.2)
+        config = server_config("pooled", tool_delay=0.3)
+        agents = [MCPAgent(name=f"Agent {i}", model="gpt-4", session_pool=pool) for i in range(3)]
+        for agent in agents:
+            await agent.add_mcp_client(config.model_copy())
+        shared = len({id(agent.mcp_clients[0].session) for agent in agents}) == 1
+
+        started_at = time.perf_counter()
+        results = await asyncio.gather(*(
+            agent.call_mcp_tool("add", {"a": i, "b": 1}) for i, agent in enumerate(agents)
+        ))
+        elapsed = time.perf_counter() - started_at
+        in_use = pool.get_stats()
+
+        for agent in agents:
+            await agent.disconnect_all_clients()
+        idle = pool.get_stats()
+        await asyncio.sleep(0.5)
+        return shared, [MCPAgent.extract_tool_result_content(r) for r in results], elapsed, in_use, idle, pool.get_stats()
+
+    shared, results, elapsed, in_use, idle, evicted = asyncio.run(scenario())
+
+    assert shared
+    assert results == ["1", "2", "3"]
+    assert elapsed >= 0.6
+    assert in_use["sessions"] == 1 and in_use["references"] == 3
+    assert in_use["created"] == 1 and in_use["reused"] == 2
+    assert idle["sessions"] == 1 and idle["idle_sessions"] == 1
+    assert evicted["sessions"] == 0 and evicted["evicted"] == 1
+
+
+def test_tool_index_follows_tool_list_changes():
+    """Test that tool names resolve through the index and that announced tool changes are picked up."""
+    async def scenario():
+        agent = MCPAgent(name="Test Agent", model="gpt-4")
+        await agent.add_mcp_client(server_config("first"))
+        await agent.add_mcp_client(server_config("second"))
+        prefixed = agent.resolve_tool("second_add")
+        bare = agent.resolve_tool("add")
+        missing = agent.resolve_tool("multiply")
+
+        await agent.call_mcp_tool("enable_multiply", server_name="second")
+        for _ in range(50):
+            if agent.resolve_tool("second_multiply"):
+                break
+            await asyncio.sleep(0.05)
+        result = await agent.call_mcp_tool("multiply", {"a": 6, "b": 7})
+        await agent.disconnect_all_clients()
+        return prefixed, bare, missing, MCPAgent.extract_tool_result_content(result), agent.resolve_tool("add")
+
+    prefixed, bare, missing, result, after_disconnect = asyncio.run(scenario())
+
+    assert prefixed[0].config.name == "second" and prefixed[1].name == "add"
+    assert bare[0].config.name == "first"
+    assert missing is None
+    assert result == "42"
+    assert after_disconnect is None
+
+
+def test_tool_schemas_are_cached_until_tools_change():
+    """Test that converted tool schemas are reused and rebuilt only when discovery results change."""
+    def tool(name):
+        return Tool(name=name, description=f"The {name} tool", inputSchema={"type": "object", "properties": {}})
+
+    connection = MCPClientConnection(config=server_config("calc"), is_connected=True, available_tools=[tool("add")])
+    agent = MCPAgent(name="Test Agent", model="gpt-4", mcp_clients=[connection])
+
+    first = agent.get_tools_json()
+    second = agent.get_tools_json()
+    connection.available_tools = [tool("add"), tool("sub")]
+    changed = agent.get_tools_json()
+
+    assert [t["function"]["name"] for t in first] == ["calc_add"]
+    assert first[0] is second[0]
+    assert [t["function"]["name"] for t in changed] == ["calc_add", "calc_sub"]
+    assert changed[0] is not first[0]
+
+
+def test_capability_cache_serves_discovery_from_disk():
+    """Test that a second process serves cached capabilities at once and refreshes them in the background."""
+    async def connect(path):
+        cache = MCPCapabilityCache(path)
+        agent = MCPAgent(name="Test Agent", model="gpt-4", capability_cache=cache)
+        connection = await agent.add_mcp_client(server_config("cached"))
+        served = (connection.capabilities_from_cache, [tool.name for tool in connection.available_tools])
+        if connection._refresh_task is not None:
+            await connection._refresh_task
+        await agent.disconnect_all_clients()
+        return served, connection.capabilities_from_cache, cache.get_stats()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "capabilities.json")
+        first, _, first_stats = asyncio.run(connect(path))
+        second, refreshed_from_cache, second_stats = asyncio.run(connect(path))
+        with open(path) as file:
+            entries = json.load(file)["entries"]
+
+    assert first[0] is False and second[0] is True
+    assert sorted(second[1]) == sorted(first[1])
+    assert refreshed_from_cache is False
+    assert first_stats["misses"] == 1 and second_stats["hits"] == 1
+    assert len(entries) == 1
+    assert next(iter(entries.values()))["resources"][0]["uri"] == "test://greeting"
+
+
+def test_supervisor_hands_out_warm_sessions_and_replaces_dead_ones():
+    """Test that connecting takes a pre-spawned session and that exited warm sessions are replaced."""
+    async def wait_for_warm(supervisor, name):
+        for _ in range(100):
+            if supervisor.get_stats()["servers"].get(name):
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    async def scenario():
+        supervisor = MCPServerSupervisor(warm_sessions=1, health_check_interval=0.2)
+        config = server_config("warm", startup_delay=1.0)
+        supervisor.register(config)
+        assert await wait_for_warm(supervisor, "warm")
+
+        agent = MCPAgent(name="Test Agent", model="gpt-4", supervisor=supervisor)
+        connection = await agent.add_mcp_client(config)
+        result = await agent.call_mcp_tool("add", {"a": 1, "b": 2})
+
+        assert await wait_for_warm(supervisor, "warm")
+        warm_runner = next(iter(supervisor._warm.values()))[0]
+        await warm_runner.close()
+        replaced = await wait_for_warm(supervisor, "warm")
+        stats = supervisor.get_stats()
+        await agent.disconnect_all_clients()
+        await supervisor.close()
+        return connection.connect_time, MCPAgent.extract_tool_result_content(result), replaced, stats
+
+    connect_time, result, replaced, stats = asyncio.run(scenario())
+
+    assert connect_time < 0.5
+    assert result == "3"
+    assert replaced
+    assert stats["warm_hits"] == 1 and stats["cold_starts"] == 0
+    assert stats["restarts"] == 1 and stats["started"] == 3
+
+
+def test_tool_calls_are_limited_per_server_and_time_out():
+    """Test that calls beyond the server limit wait in a queue and that slow calls are cancelled at their deadline."""
+    async def scenario():
+        agent = MCPAgent(name="Test Agent", model="gpt-4")
+        await agent.add_mcp_client(server_config("limited", tool_delay=0.5, max_concurrent_calls=1,
+                                                 tool_timeouts={"add": 0.8}))
+        started_at = time.perf_counter()
+        results = await asyncio.gather(
+            *(agent.call_mcp_tool("add", {"a": i, "b": 1}) for i in range(3)), return_exceptions=True
+        )
+        elapsed = time.perf_counter() - started_at
+        echoed = await agent.call_mcp_tool("echo", {"text": "still connected"})
+        stats = agent.get_connection_status()["limited"]["calls"]
+        await agent.disconnect_all_clients()
+        return results, elapsed, MCPAgent.extract_tool_result_content(echoed), stats
+
+    results, elapsed, echoed, stats = asyncio.run(scenario())
+
+    assert MCPAgent.extract_tool_result_content(results[0]) == "1"
+    assert all(isinstance(result, TimeoutError) for result in results[1:])
+    assert elapsed < 1.5
+    assert echoed == "still connected"
+    assert stats["max_waiting"] == 2 and stats["timeouts"] == 2
+    assert stats["calls"] == 3 and stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_large_resources_are_spilled_to_temporary_files():
+    """Test that large resource parts are written to files, streamed back and handed to the model by reference."""
+    size = 300_000
+    expected_text = ("Olá, mundo! " * (size // 12 + 1))[:size]
+
+    async def scenario():
+        config = server_config("large")
+        config.env["MCP_TEST_LARGE_SIZE"] = str(size)
+        agent = MCPAgent(name="Test Agent", model="gpt-4", resource_spill_threshold=64 * 1024,
+                         resource_preview_chars=100)
+        await agent.add_mcp_client(config)
+
+        await agent.get_mcp_resource("test://large", search_by="uri")
+        await agent.get_mcp_resource("test://blob", search_by="uri")
+        await agent.get_mcp_resource("test://greeting", search_by="uri")
+        text_part = agent.get_resource_parts("test://large")[0]
+        blob_part = agent.get_resource_parts("test://blob")[0]
+        spilled_paths = [text_part.path, blob_part.path]
+        spilled_text = "".join(text_part.iter_text(10_000))
+        with blob_part.open() as blob_view:
+            blob_bytes = bytes(blob_view)
+            blob_map = blob_view.obj
+        map_closed = blob_map.closed
+
+        chunks = [chunk async for chunk in agent.stream_mcp_resource("test://large", chunk_size=50_000)]
+        await agent.disconnect_all_clients()
+        return agent.resources, spilled_paths, spilled_text, blob_bytes, blob_part.size, chunks, map_closed
+
+    resources, spilled_paths, spilled_text, blob_bytes, blob_size, chunks, map_closed = asyncio.run(scenario())
+
+    assert resources[0].startswith("[Resource test://large (text/plain,")
+    assert spilled_paths[0] in resources[0] and f"Beginning of the resource:\n{expected_text[:50]}" in resources[0]
+    assert resources[1] == f"[Resource test://blob (application/octet-stream, {size} bytes); stored at {spilled_paths[1]}]"
+    assert resources[2] == "Hello from the test server"
+    assert spilled_text == expected_text
+    assert blob_size == size and blob_bytes == bytes(i % 256 for i in range(size))
+    assert map_closed
+    assert len(chunks) > 1 and "".join(chunks) == expected_text
+    assert not any(os.path.exists(path) for path in spilled_paths)
+
+
+def test_read_cache_skips_spilled_resources():
+    """Test that resources handed to the model by reference to a temporary file are not cached."""
+    async def scenario():
+        config = server_config("large")
+        config.env["MCP_TEST_LARGE_SIZE"] = "100000"
+        cache = MCPReadCache()
+        agent = MCPAgent(name="Test Agent", model="gpt-4", read_cache=cache, resource_spill_threshold=64 * 1024)
+        await agent.add_mcp_client(config)
+        connection = agent.mcp_clients[0]
+
+        await agent.extract_resource(connection, "test://greeting")
+        await agent.extract_resource(connection, "test://large")
+        agent.release_resources()
+        content = await agent.extract_resource(connection, "test://large")
+        path = agent.get_resource_parts("test://large")[0].path
+        exists = path in content and os.path.exists(path)
+        await agent.disconnect_all_clients()
+        return exists, cache.get_stats()
+
+    exists, stats = asyncio.run(scenario())
+
+    assert exists
+    assert stats["entries"] == 1 and stats["hits"] == 0
+
+
+def test_read_cache_serves_resources_and_prompts_until_they_change():
+    """Test that cached resources are dropped on update notifications and cached prompts after their TTL."""
+    async def scenario():
+        config = server_config("cached")
+        config.env["MCP_TEST_CACHING"] = "1"
+        cache = MCPReadCache(ttl=0.5)
+        agent = MCPAgent(name="Test Agent", model="gpt-4", read_cache=cache)
+        await agent.add_mcp_client(config)
+        connection = agent.mcp_clients[0]
+
+        reads = [await agent.extract_resource(connection, "test://counter") for _ in range(2)]
+        await agent.call_mcp_tool("touch_counter")
+        for _ in range(50):
+            if not cache.get_stats()["entries"]:
+                break
+            await asyncio.sleep(0.02)
+        reads.append(await agent.extract_resource(connection, "test://counter"))
+        await asyncio.sleep(0.6)
+        reads.append(await agent.extract_resource(connection, "test://counter"))
+
+        instructions = []
+        for delay in (0, 0, 0.6):
+            await asyncio.sleep(delay)
+            await agent.get_mcp_prompt("persona", {"role": "reviewer"})
+            instructions.append(agent.instructions)
+        stats = cache.get_stats()
+        await agent.disconnect_all_clients()
+        return reads, instructions, stats
+
+    reads, instructions, stats = asyncio.run(scenario())
+
+    # Subscribed resources do not expire, they are refreshed when the server reports an update
+    assert reads == ["read 1", "read 1", "read 2", "read 2"]
+    assert instructions == ["You are a reviewer (render 1)", "You are a reviewer (render 1)",
+                            "You are a reviewer (render 2)"]
+    assert stats["hits"] == 3 and stats["invalidations"] >= 1
+
+
+def run_tests():
+    """Run all tests."""
+    print("Running MCP connection tests...")
+
+    test_connect_all_clients_connects_concurrently()
+    print("✓ Concurrent connection test passed")
+
+    test_connect_all_clients_applies_per_server_timeout()
+    print("✓ Per-server timeout test passed")
+
+    test_ensure_connected_reuses_and_reconnects_sessions()
+    print("✓ Connection lifecycle test passed")
+
+    test_calls_lost_with_the_connection_are_resent_only_when_idempotent()
+    print("✓ Lost call resend test passed")
+
+    test_session_pool_shares_sessions_between_agents()
+    print("✓ Session pool test passed")
+
+    test_tool_index_follows_tool_list_changes()
+    print("✓ Tool index test passed")
+
+    test_tool_schemas_are_cached_until_tools_change()
+    print("✓ Tool schema cache test passed")
+
+    test_capability_cache_serves_discovery_from_disk()
+    print("✓ Capability cache test passed")
+
+    test_supervisor_hands_out_warm_sessions_and_replaces_dead_ones()
+    print("✓ Server supervisor test passed")
+
+    test_tool_calls_are_limited_per_server_and_time_out()
+    print("✓ Tool call limits test passed")
+
+    test_large_resources_are_spilled_to_temporary_files()
+    print("✓ Large resource test passed")
+
+    test_read_cache_skips_spilled_resources()
+    print("✓ Spilled resources read cache test passed")
+
+    test_read_cache_serves_resources_and_prompts_until_they_change()
+    print("✓ Read cache test passed")
+
+    print("\nAll tests passed! ✓")
+
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,188 @@
+"""
+Tests for the MonkAI ASGI server
+
+These tests exercise the HTTP endpoints with Starlette's test client and a scripted provider.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../libs/monkai_agent'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import asyncio
+import json
+import httpx
+from starlette.testclient import TestClient
+from monkai_agent.server import create_app, AdmissionController, SessionStore
+from test_agent_manager import make_manager, make_completion, make_chunks, ScriptedStream
+
+
+def parse_sse(text):
+    """Parse a server-sent events body into (event, data) pairs."""
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_run_endpoint_keeps_session_history():
+    """Test that consecutive runs of a session share the conversation history."""
+    manager, provider = make_manager([make_completion("Hi there"), make_completion("Still here")])
+    client = TestClient(create_app(manager))
+
+    first = client.post("/run", json={"message": "Hello", "session_id": "s1"}).json()
+    second = client.post("/run", json={"message": "Again", "session_id": "s1"}).json()
+
+    assert first["messages"][-1]["content"] == "Hi there"
+    assert second["session_id"] == "s1"
+    sent = [m["content"] for m in provider.requests[1]["messages"] if m["role"] != "system"]
+    assert sent == ["Hello", "Hi there", "Again"]
+
+
+def test_run_endpoint_validates_body():
+    """Test that requests without a message are rejected."""
+    manager, provider = make_manager([])
+    client = TestClient(create_app(manager))
+
+    assert client.post("/run", json={"session_id": "s1"}).status_code == 400
+
+
+def test_stream_endpoint_sends_server_sent_events():
+    """Test that streaming runs are delivered as server-sent events."""
+    manager, provider = make_manager([ScriptedStream(make_chunks("Hel", "lo"))])
+    client = TestClient(create_app(manager))
+
+    result = client.post("/run/stream", json={"message": "Hi"})
+    events = parse_sse(result.text)
+
+    assert result.headers["content-type"].startswith("text/event-stream")
+    assert [name for name, _ in events] == ["start", "delta", "delta", "end", "response", "done"]
+    assert events[4][1]["messages"][-1]["content"] == "Hello"
+
+
+def test_stream_endpoint_releases_slot_when_client_disconnects():
+    """Test that the run slot of a stream is freed when the response fails before its body is read."""
+    manager, provider = make_manager([ScriptedStream(make_chunks("Hel", "lo"))])
+    app = create_app(manager, max_concurrent_runs=1)
+    body = json.dumps({"message": "Hi"}).encode()
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+             "method": "POST", "scheme": "http", "path": "/run/stream", "raw_path": b"/run/stream",
+             "query_string": b"", "root_path": "", "headers": [(b"content-type", b"application/json")],
+             "server": ("test", 80), "client": ("test", 1234)}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        raise OSError("client disconnected")
+
+    async def scenario():
+        try:
+            await app(scope, receive, send)
+        except Exception:
+            pass
+
+    asyncio.run(scenario())
+
+    assert app.state.admission.get_stats()["active"] == 0
+    assert not any(session["lock"].locked() for session in app.state.sessions._sessions.values())
+    assert provider.requests == []
+
+
+def test_busy_session_does_not_take_the_slots_of_others():
+    """Test that queued turns of a busy session wait for it without holding run slots."""
+    manager, provider = make_manager([make_completion(f"Answer {i}") for i in range(4)])
+    original = provider.get_completion_async
+
+    async def slow_completion(messages, **kwargs):
+        await asyncio.sleep(0.1)
+        return await original(messages, **kwargs)
+    provider.get_completion_async = slow_completion
+    app = create_app(manager, max_concurrent_runs=2, max_queued_runs=0)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            tasks = []
+            for session_id in ("busy", "busy", "busy", "other"):
+                tasks.append(asyncio.create_task(client.post("/run", json={"message": "Hi", "session_id": session_id})))
+                await asyncio.sleep(0.02)
+            return [response.status_code for response in await asyncio.gather(*tasks)]
+
+    assert asyncio.run(scenario()) == [200, 200, 200, 200]
+    assert app.state.admission.get_stats()["rejected"] == 0
+
+
+def test_session_history_keeps_the_last_turns():
+    """Test that session histories drop their oldest turns beyond the limit."""
+    sessions = SessionStore(max_turns=2)
+    session = sessions.get("s1")
+    for i in range(3):
+        sessions.add_turn(session, f"Question {i}", [
+            {"role": "assistant", "content": None, "tool_calls": []},
+            {"role": "tool", "content": "result"},
+            {"role": "assistant", "content": f"Answer {i}"},
+        ])
+
+    assert [m["content"] for m in session["history"] if m["role"] == "user"] == ["Question 1", "Question 2"]
+    assert len(session["history"]) == 8
+
+
+def test_create_app_rejects_streaming_managers():
+    """Test that managers whose run returns a generator cannot be served."""
+    manager, provider = make_manager([], stream=True)
+    try:
+        create_app(manager)
+        assert False, "streaming managers must be rejected"
+    except ValueError:
+        pass
+
+
+def test_admission_controller_rejects_when_queue_is_full():
+    """Test that runs beyond the concurrency and queue bounds are rejected."""
+    async def scenario():
+        admission = AdmissionController(max_concurrent_runs=1, max_queued_runs=0, queue_timeout=0.1)
+        assert await admission.acquire()
+        assert not await admission.acquire()
+        admission.release()
+        assert await admission.acquire()
+        return admission.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["admitted"] == 2
+
+
+def run_tests():
+    """Run all tests."""
+    print("Running server tests...")
+
+    test_run_endpoint_keeps_session_history()
+    print("✓ Run endpoint test passed")
+
+    test_run_endpoint_validates_body()
+    print("✓ Request validation test passed")
+
+    test_stream_endpoint_sends_server_sent_events()
+    print("✓ Streaming endpoint test passed")
+
+    test_stream_endpoint_releases_slot_when_client_disconnects()
+    print("✓ Stream slot release test passed")
+
+    test_busy_session_does_not_take_the_slots_of_others()
+    print("✓ Busy session admission test passed")
+
+    test_session_history_keeps_the_last_turns()
+    print("✓ Session history limit test passed")
+
+    test_create_app_rejects_streaming_managers()
+    print("✓ Streaming manager rejection test passed")
+
+    test_admission_controller_rejects_when_queue_is_full()
+    print("✓ Admission control test passed")
+
+    print("\nAll tests passed! ✓")
+
+
+if __name__ == "__main__":
+    run_tests()